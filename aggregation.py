@@ -0,0 +1,49 @@
+"""Aggregation of the items received in a time window by key.
+
+It is used to handle the OpenFlow errors of a switch with the same type and
+code together, since a request with many invalid flows makes the switch send
+an error for each of them.
+"""
+from threading import Lock, Timer
+
+
+class Aggregator:
+    """Group the items added in a window and pass each group to a handler.
+
+    The window of a key starts when its first item is added. The handler is
+    called with the key and the list of items, in a timer thread. With a
+    window of 0, the handler is called for each item, in the calling thread.
+    """
+
+    def __init__(self, window, handler):
+        """Create an aggregator of the items added in ``window`` seconds."""
+        self.window = window
+        self._handler = handler
+        self._pending = {}
+        self._lock = Lock()
+
+    def add(self, key, item):
+        """Add an item to the group of its key."""
+        if not self.window:
+            self._handler(key, [item])
+            return
+        with self._lock:
+            items = self._pending.get(key)
+            if items is None:
+                items = self._pending[key] = []
+                timer = Timer(self.window, self.flush, (key,))
+                timer.daemon = True
+                timer.start()
+            items.append(item)
+
+    def flush(self, key=None):
+        """Handle the items of a key, or of all keys, added so far."""
+        with self._lock:
+            if key is None:
+                pending, self._pending = self._pending, {}
+            elif key in self._pending:
+                pending = {key: self._pending.pop(key)}
+            else:
+                pending = {}
+        for pending_key, items in pending.items():
+            self._handler(pending_key, items)
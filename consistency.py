@@ -0,0 +1,92 @@
+"""Helpers to compare the flows installed in a switch with the stored flows.
+
+The identity of a flow is made of the fields that the Flow objects of of_core
+compare: ``table_id``, ``priority``, ``cookie``, ``idle_timeout``,
+``hard_timeout``, ``match`` and ``actions``, so flows with the same identity
+are equal Flow objects, except for unlikely hash collisions of the match and
+actions. When NumPy is available, the identities can be encoded in fixed-width
+structured arrays, so the comparison of large lists of flows is done with
+vectorized operations instead of comparing Flow objects one by one. The
+identities are still built in Python, from the dictionary of each Flow. Flows
+with integer fields that do not fit in the array can only be compared one by
+one.
+"""
+import json
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+HAS_NUMPY = np is not None
+
+FLOW_KEY_DTYPE = [('table_id', 'u1'),
+                  ('priority', 'u2'),
+                  ('cookie', 'u8'),
+                  ('idle_timeout', 'u2'),
+                  ('hard_timeout', 'u2'),
+                  ('match', 'i8'),
+                  ('actions', 'i8')]
+# Largest value of each integer field of FLOW_KEY_DTYPE
+FLOW_KEY_MAX_VALUES = (0xff, 0xffff, 0xffffffffffffffff, 0xffff, 0xffff)
+
+
+def _int_or_str(value):
+    """Convert a value to int, or to str if it is not a number.
+
+    It converts the UBInt values, not JSON serializable, and keeps the
+    identity of flows with invalid integer fields hashable.
+    """
+    try:
+        return int(value)
+    except (TypeError, ValueError, OverflowError):
+        return str(value)
+
+
+def _hash_field(value):
+    """Return a hash of a match or actions field."""
+    return hash(json.dumps(value, sort_keys=True, default=_int_or_str))
+
+
+def flow_identity(flow_dict):
+    """Return a hashable identity of a flow dictionary."""
+    return (_int_or_str(flow_dict.get('table_id', 0)),
+            _int_or_str(flow_dict.get('priority', 0)),
+            _int_or_str(flow_dict.get('cookie', 0)),
+            _int_or_str(flow_dict.get('idle_timeout', 0)),
+            _int_or_str(flow_dict.get('hard_timeout', 0)),
+            _hash_field(flow_dict.get('match', {})),
+            _hash_field(flow_dict.get('actions', [])))
+
+
+def _fits_flow_key(identity):
+    """Return True if the integer fields of an identity fit in an array."""
+    return all(isinstance(value, int) and 0 <= value <= max_value
+               for value, max_value in zip(identity, FLOW_KEY_MAX_VALUES))
+
+
+def flow_keys(flows):
+    """Return a structured array with the identities of Flow objects.
+
+    Raise ValueError if an integer field of a flow is not an integer or is
+    out of the range of its type.
+    """
+    identities = [flow_identity(flow.as_dict()) for flow in flows]
+    for identity in identities:
+        if not _fits_flow_key(identity):
+            raise ValueError(f'Flow identity {identity} does not fit in the '
+                             'flow keys.')
+    return np.array(identities, dtype=FLOW_KEY_DTYPE)
+
+
+def vectorized_flows_in(flows, other_flows):
+    """Return a boolean array telling which flows are in ``other_flows``.
+
+    Raise ValueError if the identity of a flow does not fit in the arrays.
+    """
+    keys = flow_keys(flows)
+    other_keys = flow_keys(other_flows)
+    # Compare the records as raw bytes, which is supported by every NumPy
+    # version, unlike sorting structured arrays.
+    void = np.dtype((np.void, keys.dtype.itemsize))
+    return np.isin(keys.view(void), other_keys.view(void))
@@ -0,0 +1,55 @@
+"""Encodings used to persist the list of stored flows of each switch.
+
+The ``dict`` encoding keeps the list of flows as plain dictionaries, which is
+the original format saved by this NApp. The ``zlib_json`` encoding serializes
+the list as compact JSON, compresses it with zlib and stores it as a base64
+string, shrinking the repeated keys of every stored flow.
+"""
+import base64
+import json
+import zlib
+
+DICT_ENCODING = 'dict'
+ZLIB_JSON_ENCODING = 'zlib_json'
+ENCODINGS = (DICT_ENCODING, ZLIB_JSON_ENCODING)
+
+
+def encode_flow_list(flow_list, encoding=DICT_ENCODING):
+    """Return the persisted entry of a switch for the given flow list."""
+    if encoding == DICT_ENCODING:
+        return {'flow_list': flow_list}
+    if encoding == ZLIB_JSON_ENCODING:
+        data = json.dumps(flow_list, separators=(',', ':')).encode('utf-8')
+        packed = base64.b64encode(zlib.compress(data)).decode('ascii')
+        return {'encoding': encoding, 'flow_list': packed}
+    raise ValueError(f'Unknown flow list encoding "{encoding}", '
+                     f'expected one of {ENCODINGS}')
+
+
+def decode_flow_list(entry):
+    """Return the flow list of a persisted switch entry.
+
+    Entries without the ``encoding`` key were saved in the ``dict`` format,
+    so they are returned unchanged. This is what makes the migration from
+    the original format transparent.
+    """
+    encoding = entry.get('encoding', DICT_ENCODING)
+    if encoding == DICT_ENCODING:
+        return entry.get('flow_list', [])
+    if encoding == ZLIB_JSON_ENCODING:
+        data = zlib.decompress(base64.b64decode(entry['flow_list']))
+        return json.loads(data.decode('utf-8'))
+    raise ValueError(f'Unknown flow list encoding "{encoding}", '
+                     f'expected one of {ENCODINGS}')
+
+
+def encode_stored_flows(stored_flows, encoding=DICT_ENCODING):
+    """Encode the flow list of every switch in ``stored_flows``."""
+    return {dpid: encode_flow_list(entry.get('flow_list', []), encoding)
+            for dpid, entry in stored_flows.items()}
+
+
+def decode_stored_flows(data):
+    """Decode the persisted flow lists into the ``stored_flows`` format."""
+    return {dpid: {'flow_list': decode_flow_list(entry)}
+            for dpid, entry in data.items()}
@@ -3,3 +3,11 @@
 
 class InvalidCommandError(Exception):
     """Command has an invalid value."""
+
+
+class InvalidFlowStreamError(Exception):
+    """Line of a stream of flows is not a flow."""
+
+
+class BodyTooLargeError(Exception):
+    """Decoded request body, or line of a stream, is too large."""
@@ -0,0 +1,235 @@
+"""Jobs of the flows installed or deleted by a request.
+
+A job is created for each asynchronous request, and for each request when
+barrier tracking is enabled. The flows of asynchronous requests are sent by a
+background worker, and the flows of a request body read as a stream are
+counted by its job while they are read. The job reports how many FlowMods are
+still queued, were sent to the switches, were confirmed or failed with an
+OpenFlow error.
+
+A FlowMod is confirmed when the switch replies to a BarrierRequest sent after
+it without an error for its xid, since the switch must process the messages
+received before the BarrierRequest, and send their errors, before replying.
+The replies and the errors are handled by different threads, so an error
+handled after the reply still turns a confirmed FlowMod into an errored one.
+"""
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from queue import Queue
+from threading import Lock, Thread
+from uuid import uuid4
+
+from kytos.core import log
+
+QUEUED = 'queued'
+RUNNING = 'running'
+FINISHED = 'finished'
+FAILED = 'failed'
+
+
+class Job:
+    """Progress of an asynchronous request."""
+
+    def __init__(self, command, dpid, flows):
+        """Create a job to send ``flows`` FlowMods with ``command``."""
+        self.id = uuid4().hex  # pylint: disable=invalid-name
+        self.command = command
+        self.dpid = dpid
+        self.flows = flows
+        self.status = QUEUED
+        self.sent = 0
+        self.skipped = 0
+        self.confirmed = 0
+        self.errored = 0
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        # FlowMods sent after the last BarrierRequest, as (xid, sent time)
+        self.unconfirmed = []
+        self.errored_xids = set()
+        # Seconds to confirm each confirmed FlowMod, by xid
+        self.latencies = {}
+
+    def latency(self):
+        """Return percentiles of the time, in seconds, to confirm FlowMods."""
+        if not self.latencies:
+            return None
+        latencies = sorted(self.latencies.values())
+        last = len(latencies) - 1
+        return {f'p{percentile}': latencies[round(last * percentile / 100)]
+                for percentile in (50, 90, 99, 100)}
+
+    def as_dict(self):
+        """Return the job status as a dictionary."""
+        return {'id': self.id,
+                'command': self.command,
+                'dpid': self.dpid,
+                'status': self.status,
+                'flows': self.flows,
+                'queued': self.flows - self.sent - self.skipped,
+                'sent': self.sent,
+                'skipped': self.skipped,
+                'confirmed': self.confirmed,
+                'errored': self.errored,
+                'latency': self.latency(),
+                'error': self.error,
+                'created_at': self.created_at,
+                'finished_at': self.finished_at}
+
+
+class JobManager:
+    """Run the jobs in a background worker and keep their status.
+
+    The jobs are run in order by ``handler``, called with the arguments given
+    to ``submit`` and the job as the ``job`` keyword argument.
+    """
+
+    def __init__(self, handler, max_jobs, max_xids):
+        """Create a manager that keeps the last ``max_jobs`` jobs."""
+        self._handler = handler
+        self._max_jobs = max_jobs
+        self._max_xids = max_xids
+        self._jobs = OrderedDict()
+        self._xid_jobs = OrderedDict()
+        self._barrier_requests = OrderedDict()
+        self._queue = Queue()
+        self._lock = Lock()
+        self._thread = None
+
+    def _add(self, job):
+        """Keep the status of a job, discarding the oldest job if needed."""
+        if len(self._jobs) >= self._max_jobs:
+            self._jobs.popitem(last=False)
+        self._jobs[job.id] = job
+
+    def run(self, job, *args):
+        """Run a job in the current thread with the given arguments.
+
+        Unlike the jobs run by the worker, the errors are raised again.
+        """
+        with self.running(job):
+            self._handler(*args, job=job)
+
+    @contextmanager
+    def running(self, job):
+        """Keep a job run by the caller and update its status.
+
+        The errors raised while the job runs are raised again.
+        """
+        with self._lock:
+            self._add(job)
+        with self._job_status(job):
+            yield job
+
+    def submit(self, job, *args):
+        """Queue a job to be run by the worker with the given arguments."""
+        with self._lock:
+            self._add(job)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = Thread(target=self._run, daemon=True,
+                                      name='flow_manager_jobs')
+                self._thread.start()
+        self._queue.put((job, args))
+
+    def get(self, job_id):
+        """Return the job with the given id, or None if it is not kept."""
+        return self._jobs.get(job_id)
+
+    def stop(self):
+        """Stop the worker after the jobs already queued."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                self._queue.put(None)
+
+    def _run(self):
+        """Run the queued jobs until the manager is stopped."""
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            self._run_job(*item)
+
+    def _run_job(self, job, args):
+        """Run the handler of a job queued for the worker."""
+        try:
+            with self._job_status(job):
+                self._handler(*args, job=job)
+        # pylint: disable=broad-except
+        except Exception:
+            pass
+
+    @staticmethod
+    @contextmanager
+    def _job_status(job):
+        """Update the status of a job while it runs."""
+        job.status = RUNNING
+        try:
+            yield
+        except Exception as error:
+            log.error(f'Error running the flows job {job.id}: {error}')
+            job.error = str(error)
+            job.status = FAILED
+            raise
+        else:
+            job.status = FINISHED
+        finally:
+            job.finished_at = time.time()
+
+    def flows_queued(self, job, count):
+        """Count more FlowMods of a job, read after it was created."""
+        with self._lock:
+            job.flows += count
+
+    def flow_mod_sent(self, job, xid):
+        """Count a FlowMod of a job sent to a switch."""
+        with self._lock:
+            job.sent += 1
+            job.unconfirmed.append((xid, time.monotonic()))
+            if len(self._xid_jobs) >= self._max_xids:
+                self._xid_jobs.popitem(last=False)
+            self._xid_jobs[xid] = job
+
+    def flow_mods_skipped(self, job, count):
+        """Count FlowMods of a job not sent, since their flows exist."""
+        with self._lock:
+            job.skipped += count
+
+    def flow_mod_errored(self, xid):
+        """Count a FlowMod that failed, if it was sent by a job.
+
+        If the FlowMod was already confirmed, by a BarrierReply handled
+        before the error, it is not confirmed anymore.
+        """
+        with self._lock:
+            job = self._xid_jobs.get(xid)
+            if job:
+                job.errored += 1
+                job.errored_xids.add(xid)
+                if job.latencies.pop(xid, None) is not None:
+                    job.confirmed -= 1
+
+    def barrier_request_sent(self, job, xid):
+        """Track a BarrierRequest sent after the unconfirmed FlowMods."""
+        with self._lock:
+            if len(self._barrier_requests) >= self._max_xids:
+                self._barrier_requests.popitem(last=False)
+            self._barrier_requests[xid] = (job, job.unconfirmed)
+            job.unconfirmed = []
+
+    def barrier_replied(self, xid):
+        """Confirm the FlowMods sent before a BarrierRequest that succeeded.
+
+        Return False if the BarrierRequest was not sent by a job.
+        """
+        replied_at = time.monotonic()
+        with self._lock:
+            try:
+                job, flow_mods = self._barrier_requests.pop(xid)
+            except KeyError:
+                return False
+            for flow_mod_xid, sent_at in flow_mods:
+                if flow_mod_xid not in job.errored_xids:
+                    job.confirmed += 1
+                    job.latencies[flow_mod_xid] = replied_at - sent_at
+        return True
@@ -0,0 +1,25 @@
+"""Locks of the state kept for each switch.
+
+The stored flows of a switch are changed by REST handlers, event handlers and
+consistency checks, which may run at the same time in different threads. Each
+switch has its own lock, so the changes of different switches do not wait for
+each other.
+"""
+from threading import Lock, RLock
+
+
+class SwitchLocks:
+    """Reentrant lock of each dpid, created when first requested."""
+
+    def __init__(self):
+        """Create an empty set of locks."""
+        self._locks = {}
+        self._lock = Lock()
+
+    def get(self, dpid):
+        """Return the lock of ``dpid``."""
+        with self._lock:
+            lock = self._locks.get(dpid)
+            if lock is None:
+                lock = self._locks[dpid] = RLock()
+            return lock
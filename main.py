@@ -1,23 +1,82 @@
 """kytos/flow_manager NApp installs, lists and deletes switch flows."""
+import json
+import time
 from collections import OrderedDict
-from copy import deepcopy
+from contextlib import ExitStack, contextmanager
+from copy import copy
+from random import randint
+from threading import Lock
 
-from flask import jsonify, request
+from flask import Response, jsonify, request
 from pyof.foundation.base import UBIntBase
+from pyof.foundation.constants import UBINT32_MAX_VALUE
 from pyof.v0x01.asynchronous.error_msg import BadActionCode
 from pyof.v0x01.common.phy_port import PortConfig
-from werkzeug.exceptions import BadRequest, NotFound, UnsupportedMediaType
+from pyof.v0x01.controller2switch.barrier_request import \
+    BarrierRequest as BarrierRequest10
+from pyof.v0x04.controller2switch.barrier_request import \
+    BarrierRequest as BarrierRequest13
+from werkzeug.exceptions import (BadRequest, NotFound, RequestEntityTooLarge,
+                                 UnsupportedMediaType)
 
 from kytos.core import KytosEvent, KytosNApp, log, rest
-from kytos.core.helpers import listen_to
+from kytos.core.helpers import listen_to, run_on_thread
+from napps.kytos.flow_manager.aggregation import Aggregator
+from napps.kytos.flow_manager.consistency import (HAS_NUMPY, flow_identity,
+                                                  vectorized_flows_in)
+from napps.kytos.flow_manager.encoding import (ENCODINGS, decode_stored_flows,
+                                               encode_stored_flows)
+from napps.kytos.flow_manager.jobs import Job, JobManager
+from napps.kytos.flow_manager.locks import SwitchLocks
 from napps.kytos.flow_manager.match import match_flow
+from napps.kytos.flow_manager.metrics import (CONSISTENCY_CHECK_SECONDS,
+                                              CONSISTENCY_REPAIRS,
+                                              CONSISTENCY_REPAIRS_AVOIDED,
+                                              ERRORS_RECEIVED, FLOW_MODS_SENT,
+                                              FLOW_MODS_SKIPPED,
+                                              HANDLE_ERRORS_SECONDS,
+                                              INSTALL_FLOWS_SECONDS,
+                                              LIST_SECONDS, REGISTRY,
+                                              STORE_CHANGED_FLOWS_SECONDS)
+from napps.kytos.flow_manager.profiler import SamplingProfiler
+from napps.kytos.flow_manager.scheduler import ConsistencyScheduler
+from napps.kytos.flow_manager.serializers.base import PackedFlowMods
+from napps.kytos.flow_manager.serializers.v0x01 import FlowSerializer10
+from napps.kytos.flow_manager.serializers.v0x04 import FlowSerializer13
+from napps.kytos.flow_manager.snapshot import FlowSnapshot
+from napps.kytos.flow_manager.stored_flow import (StoredFlow,
+                                                  stored_flows_as_dict,
+                                                  stored_flows_from_dict)
 from napps.kytos.flow_manager.storehouse import StoreHouse
+from napps.kytos.flow_manager.streaming import (GZIP_ENCODING, GZIP_ERRORS,
+                                                NDJSON_CONTENT_TYPE, batches,
+                                                decoded_stream, gzip_chunks,
+                                                json_object_chunks,
+                                                read_limited,
+                                                read_ndjson_flows)
+from napps.kytos.flow_manager.workers import SwitchWorkers
 from napps.kytos.of_core.flow import FlowFactory
 
-from .exceptions import InvalidCommandError
-from .settings import (CONSISTENCY_COOKIE_IGNORED_RANGE,
+from .exceptions import (BodyTooLargeError, InvalidCommandError,
+                         InvalidFlowStreamError)
+from .settings import (BULK_PACKING_MIN_FLOWS,
+                       CONSISTENCY_COOKIE_IGNORED_RANGE,
+                       CONSISTENCY_GRACE_WINDOW,
+                       CONSISTENCY_LARGE_SWITCH_FLOWS,
+                       CONSISTENCY_MAX_INTERVAL,
                        CONSISTENCY_TABLE_ID_IGNORED_RANGE,
-                       ENABLE_CONSISTENCY_CHECK, FLOWS_DICT_MAX_SIZE)
+                       CONSISTENCY_TIME_BUDGET, ENABLE_ADAPTIVE_CONSISTENCY,
+                       ENABLE_BARRIER_TRACKING, ENABLE_BATCHED_NAPP_EVENTS,
+                       ENABLE_BULK_PACKING, ENABLE_CONSISTENCY_CHECK,
+                       ENABLE_FAN_OUT, ENABLE_FLOW_NAPP_EVENTS,
+                       ENABLE_IDEMPOTENT_ADD, ENABLE_VECTORIZED_CONSISTENCY,
+                       ERRORS_AGGREGATION_WINDOW, FLOW_LIST_ENCODING,
+                       FLOW_SNAPSHOT_PATH, FLOWS_DICT_MAX_SIZE,
+                       GZIP_COMPRESS_LEVEL, GZIP_MAX_DECOMPRESSED_SIZE,
+                       JOBS_MAX_SIZE, NDJSON_BATCH_SIZE, PROFILER_INTERVAL,
+                       PROFILER_MAX_DURATION, STATS_INTERVAL, SWITCH_WORKERS)
+
+BARRIER_REQUESTS = {0x01: BarrierRequest10, 0x04: BarrierRequest13}
 
 
 def cast_fields(flow_dict):
@@ -30,6 +89,11 @@ def cast_fields(flow_dict):
     return flow_dict
 
 
+def _int_value(field):
+    """Return the integer value of a pyof field or enum."""
+    return int(getattr(field, 'value', field))
+
+
 def _validate_range(values):
     """Check that the range of flows ignored by the consistency is valid."""
     if len(values) != 2:
@@ -80,12 +144,39 @@ class Main(KytosNApp):
         log.debug("flow-manager starting")
         self._flow_mods_sent = OrderedDict()
         self._flow_mods_sent_max_size = FLOWS_DICT_MAX_SIZE
+        self._flow_mods_sent_lock = Lock()
+        # OpenFlow errors grouped by switch, type and code
+        self.error_aggregator = Aggregator(ERRORS_AGGREGATION_WINDOW,
+                                           self._handle_aggregated_errors)
+        # Serializers used to pack FlowMods in bulk, by OpenFlow version
+        self._packers = {0x01: FlowSerializer10(), 0x04: FlowSerializer13()}
+        self._xid_lock = Lock()
+        self._next_xid = randint(0, UBINT32_MAX_VALUE)
         self.cookie_ignored_range = []
         self.tab_id_ignored_range = []
         if _valid_consistency_ignored(CONSISTENCY_COOKIE_IGNORED_RANGE):
             self.cookie_ignored_range = CONSISTENCY_COOKIE_IGNORED_RANGE
         if _valid_consistency_ignored(CONSISTENCY_TABLE_ID_IGNORED_RANGE):
             self.tab_id_ignored_range = CONSISTENCY_TABLE_ID_IGNORED_RANGE
+        self.flow_list_encoding = 'dict'
+        if FLOW_LIST_ENCODING in ENCODINGS:
+            self.flow_list_encoding = FLOW_LIST_ENCODING
+        else:
+            log.warn('Unknown flow list encoding, it will be ignored: %s',
+                     FLOW_LIST_ENCODING)
+        self.vectorized_consistency = False
+        if ENABLE_VECTORIZED_CONSISTENCY:
+            if HAS_NUMPY:
+                self.vectorized_consistency = True
+            else:
+                log.warn('NumPy is not installed, the vectorized consistency '
+                         'check will be disabled.')
+
+        # When the consistency of each switch is checked
+        self.consistency_scheduler = ConsistencyScheduler(
+            STATS_INTERVAL, CONSISTENCY_MAX_INTERVAL,
+            CONSISTENCY_LARGE_SWITCH_FLOWS, CONSISTENCY_TIME_BUDGET,
+            enabled=ENABLE_ADAPTIVE_CONSISTENCY)
 
         # Storehouse client to save and restore flow data:
         self.storehouse = StoreHouse(self.controller)
@@ -94,8 +185,39 @@ class Main(KytosNApp):
         # {'flow_persistence': {'dpid_str': {'flow_list': [
         #                                     {'command': '<add|delete>',
         #                                      'flow': {flow_dict}}]}}}
+        # The flows are kept as StoredFlow in memory:
+        # {'dpid_str': {'flow_list': [StoredFlow]}}
+        # The dictionary and the flow lists are replaced, never changed, so
+        # they can be read without locks.
         self.stored_flows = {}
+        # The stored flows and the resent flows of each switch are changed
+        # holding the lock of the switch, and saved holding the global lock.
+        self.switch_locks = SwitchLocks()
+        self._stored_flows_lock = Lock()
+        # Number of batches being processed, which persist the flows stored
+        # meanwhile at once when they finish.
+        self._deferred_batches = 0
+        self._save_pending = False
         self.resent_flows = set()
+        # Identities of the last list of flows installed in each switch
+        self._installed_identities_cache = {}
+        # List of flows of each switch when it connected, which still has
+        # the flows installed before a reboot until the next flow stats reply
+        self._stale_switch_flows = {}
+        # Number of times the stored flows were saved, used to validate the
+        # local snapshot of stored flows against storehouse.
+        self.generation = 0
+        self.snapshot = None
+        if FLOW_SNAPSHOT_PATH:
+            self.snapshot = FlowSnapshot(FLOW_SNAPSHOT_PATH)
+        self.profiler = SamplingProfiler()
+        # Jobs of the asynchronous requests, run by a background worker
+        self.jobs = JobManager(self._install_flows, JOBS_MAX_SIZE,
+                               FLOWS_DICT_MAX_SIZE)
+        # Queues of flows to be installed by a pool of threads, by switch
+        self.switch_workers = None
+        if SWITCH_WORKERS > 0:
+            self.switch_workers = SwitchWorkers(SWITCH_WORKERS)
 
     def execute(self):
         """Run once on NApp 'start' or in a loop.
@@ -108,26 +230,32 @@ class Main(KytosNApp):
     def shutdown(self):
         """Shutdown routine of the NApp."""
         log.debug("flow-manager stopping")
+        self.profiler.stop()
+        self.jobs.stop()
+        self.error_aggregator.flush()
+        if self.switch_workers:
+            self.switch_workers.shutdown()
 
     @listen_to('kytos/of_core.handshake.completed')
     def resend_stored_flows(self, event):
         """Resend stored Flows."""
+        switch = event.content['switch']
+        self._stale_switch_flows[switch.dpid] = switch.flows
         # if consistency check is enabled, it should take care of this
         if ENABLE_CONSISTENCY_CHECK:
             return
-        switch = event.content['switch']
         dpid = str(switch.dpid)
-        # This can be a problem because this code is running a thread
-        if dpid in self.resent_flows:
-            log.debug(f'Flow already resent to the switch {dpid}')
-            return
-        if dpid in self.stored_flows:
-            flow_list = self.stored_flows[dpid]['flow_list']
-            for flow in flow_list:
-                command = flow['command']
-                flows_dict = {"flows": [flow['flow']]}
-                self._install_flows(command, flows_dict, [switch])
-            self.resent_flows.add(dpid)
+        entry = self.stored_flows.get(dpid)
+        with self.switch_locks.get(dpid):
+            if dpid in self.resent_flows:
+                log.debug(f'Flow already resent to the switch {dpid}')
+                return
+            if entry:
+                self.resent_flows.add(dpid)
+        if entry:
+            for flow in entry['flow_list']:
+                flows_dict = {"flows": [flow.flow]}
+                self._install_flows(flow.command, flows_dict, [switch])
             log.info(f'Flows resent to Switch {dpid}')
 
     @staticmethod
@@ -169,84 +297,242 @@ class Main(KytosNApp):
         if not ENABLE_CONSISTENCY_CHECK:
             return
         switch = event.content['switch']
-        if switch.is_enabled():
-            self.check_storehouse_consistency(switch)
+        if not switch.is_enabled():
+            return
+        if not self.consistency_scheduler.is_due(switch.dpid):
+            return
+        if self.switch_workers:
+            # Checked after the flows already queued to the switch
+            self.switch_workers.submit(switch.dpid, self._check_consistency,
+                                       switch).result()
+        else:
+            self._check_consistency(switch)
+
+    def _check_consistency(self, switch):
+        """Check the consistency of a switch holding its lock.
+
+        The repairs are based on the stored flows of the switch, so they must
+        not change while the switch is checked.
+        """
+        started_at = time.monotonic()
+        with self.switch_locks.get(switch.id):
+            with CONSISTENCY_CHECK_SECONDS.time(check='storehouse',
+                                                dpid=switch.dpid):
+                repairs = self.check_storehouse_consistency(switch)
             if switch.dpid in self.stored_flows:
-                self.check_switch_consistency(switch)
+                with CONSISTENCY_CHECK_SECONDS.time(check='switch',
+                                                    dpid=switch.dpid):
+                    repairs += self.check_switch_consistency(switch)
+        self.consistency_scheduler.checked(switch.dpid,
+                                           time.monotonic() - started_at,
+                                           len(switch.flows), repairs)
+
+    def _flows_in(self, flows, other_flows):
+        """Return whether each flow of ``flows`` is in ``other_flows``.
+
+        The flows with fields that do not fit in the arrays of the vectorized
+        comparison, like invalid stored flows, are compared one by one.
+        """
+        if self.vectorized_consistency and flows and other_flows:
+            try:
+                return vectorized_flows_in(flows, other_flows)
+            except ValueError as error:
+                log.debug(f'Flows not compared with arrays: {error}')
+        return [flow in other_flows for flow in flows]
 
     def check_switch_consistency(self, switch):
-        """Check consistency of installed flows for a specific switch."""
+        """Check consistency of installed flows for a specific switch.
+
+        Return the number of flows repaired.
+        """
         dpid = switch.dpid
 
         # Flows stored in storehouse
         stored_flows = self.stored_flows[dpid]['flow_list']
 
         serializer = FlowFactory.get_class(switch)
+        stored_flows_list = [serializer.from_dict(stored_flow.flow, switch)
+                             for stored_flow in stored_flows]
+        installed = self._flows_in(stored_flows_list, switch.flows)
 
-        for stored_flow in stored_flows:
-            command = stored_flow['command']
-            stored_flow_obj = serializer.from_dict(stored_flow['flow'], switch)
-
-            flow = {'flows': [stored_flow['flow']]}
-
-            if stored_flow_obj not in switch.flows:
+        missing_flows = []
+        deleted_flows = []
+        for stored_flow, flow, is_installed in zip(stored_flows,
+                                                   stored_flows_list,
+                                                   installed):
+            command = stored_flow.command
+            if not is_installed:
                 if command == 'add':
-                    log.info('A consistency problem was detected in '
-                             f'switch {dpid}.')
-                    self._install_flows(command, flow, [switch])
-                    log.info(f'Flow forwarded to switch {dpid} to be '
-                             'installed.')
+                    missing_flows.append((stored_flow.flow, flow))
             elif command == 'delete':
-                log.info('A consistency problem was detected in '
-                         f'switch {dpid}.')
-                command = 'delete_strict'
-                self._install_flows(command, flow, [switch])
-                log.info(f'Flow forwarded to switch {dpid} to be deleted.')
+                deleted_flows.append((stored_flow.flow, flow))
+        missing_flows = self._without_recent_flows(missing_flows, switch,
+                                                   'switch')
+        deleted_flows = self._without_recent_flows(deleted_flows, switch,
+                                                   'switch')
+
+        if missing_flows:
+            self._repair_flows('add', missing_flows, switch, 'switch')
+        if deleted_flows:
+            self._repair_flows('delete_strict', deleted_flows, switch,
+                               'switch')
+        return len(missing_flows) + len(deleted_flows)
 
     def check_storehouse_consistency(self, switch):
-        """Check consistency of installed flows for a specific switch."""
+        """Check consistency of installed flows for a specific switch.
+
+        Return the number of flows repaired.
+        """
         dpid = switch.dpid
 
-        for installed_flow in switch.flows:
+        # Check if the flow is in the ignored flow list
+        installed_flows = [installed_flow for installed_flow in switch.flows
+                           if not self.consistency_ignored_check(
+                               installed_flow)]
 
-            # Check if the flow is in the ignored flow list
-            if self.consistency_ignored_check(installed_flow):
-                continue
+        if dpid not in self.stored_flows:
+            stored = [False] * len(installed_flows)
+        else:
+            serializer = FlowFactory.get_class(switch)
+            stored_flows = self.stored_flows[dpid]['flow_list']
+            stored_flows_list = [serializer.from_dict(stored_flow.flow,
+                                                      switch)
+                                 for stored_flow in stored_flows]
+            stored = self._flows_in(installed_flows, stored_flows_list)
+
+        alien_flows = [(installed_flow.as_dict(), installed_flow)
+                       for installed_flow, is_stored in zip(installed_flows,
+                                                            stored)
+                       if not is_stored]
+        alien_flows = self._without_recent_flows(alien_flows, switch,
+                                                 'storehouse')
+        if alien_flows:
+            self._repair_flows('delete_strict', alien_flows, switch,
+                               'storehouse')
+        return len(alien_flows)
+
+    def _send_flows(self, command, flows, switch):
+        """Send the FlowMods of the flows without storing them.
+
+        They are sent like the FlowMods of any request, packed in a single
+        message only with bulk packing. The flows are not stored, so the
+        caller must keep the stored flows of the switch up to date.
+        """
+        if flows:
+            self._install_built_flows(command, flows, switch, store=False)
 
-            if dpid not in self.stored_flows:
-                log.info('A consistency problem was detected in '
-                         f'switch {dpid}.')
-                flow = {'flows': [installed_flow.as_dict()]}
-                command = 'delete_strict'
-                self._install_flows(command, flow, [switch])
-                log.info(f'Flow forwarded to switch {dpid} to be deleted.')
-            else:
-                serializer = FlowFactory.get_class(switch)
-                stored_flows = self.stored_flows[dpid]['flow_list']
-                stored_flows_list = [serializer.from_dict(stored_flow['flow'],
-                                                          switch)
-                                     for stored_flow in stored_flows]
-
-                if installed_flow not in stored_flows_list:
-                    log.info('A consistency problem was detected in '
-                             f'switch {dpid}.')
-                    flow = {'flows': [installed_flow.as_dict()]}
-                    command = 'delete_strict'
-                    self._install_flows(command, flow, [switch])
-                    log.info(f'Flow forwarded to switch {dpid} to be deleted.')
+    def _recent_flows(self, switch):
+        """Return the flows of the FlowMods sent to a switch recently.
+
+        These are the FlowMods sent within the consistency grace window,
+        which may not be reflected yet in the flow stats of the switch.
+        """
+        if not CONSISTENCY_GRACE_WINDOW:
+            return []
+        sent_after = time.monotonic() - CONSISTENCY_GRACE_WINDOW
+        flows = []
+        with self._flow_mods_sent_lock:
+            for flow, _, sent_at in reversed(self._flow_mods_sent.values()):
+                if sent_at < sent_after:
+                    break
+                if flow.switch.dpid == switch.dpid:
+                    flows.append(flow)
+        return flows
+
+    def _without_recent_flows(self, repairs, switch, check):
+        """Return the flows to be repaired, except the ones sent recently.
+
+        ``repairs`` is a list of (flow dictionary, Flow object) pairs, and
+        the flow dictionaries of the flows without FlowMods sent in the
+        grace window are returned.
+        """
+        recent_flows = self._recent_flows(switch) if repairs else []
+        if not recent_flows:
+            return [flow_dict for flow_dict, _ in repairs]
+        is_recent = self._flows_in([flow for _, flow in repairs],
+                                   recent_flows)
+        flows = [flow_dict for (flow_dict, _), recent in zip(repairs,
+                                                             is_recent)
+                 if not recent]
+        avoided = len(repairs) - len(flows)
+        if avoided:
+            CONSISTENCY_REPAIRS_AVOIDED.inc(avoided, check=check,
+                                            dpid=switch.dpid)
+        return flows
+
+    def _repair_flows(self, command, flows, switch, check):
+        """Send the FlowMods that repair the consistency of a switch.
+
+        The FlowMods of all flows are sent at once and the flows are not
+        stored, since they are already stored or must not be stored.
+        """
+        dpid = switch.dpid
+        log.info(f'{len(flows)} consistency problems were detected by the '
+                 f'{check} check in switch {dpid}.')
+        self._send_flows(command, flows, switch)
+        CONSISTENCY_REPAIRS.inc(len(flows), check=check, dpid=dpid)
+        log.info(f'{len(flows)} flows forwarded to switch {dpid} to be '
+                 f'repaired with the {command} command.')
 
     # pylint: disable=attribute-defined-outside-init
     def _load_flows(self):
-        """Load stored flows."""
+        """Load stored flows.
+
+        If there is a valid local snapshot, the flows are loaded from it and
+        reconciled with storehouse in background.
+        """
+        snapshot = self.snapshot.load() if self.snapshot else None
+        if snapshot:
+            self.generation, checksum, flows = snapshot
+            self.stored_flows = stored_flows_from_dict(flows)
+            log.info('Flows loaded from the local snapshot.')
+            self._reconcile_snapshot(self.generation, checksum)
+            return
+        persisted = self._get_persisted_flows()
+        if persisted:
+            self.generation, _, flows = persisted
+            self.stored_flows = stored_flows_from_dict(flows)
+            log.info('Flows loaded.')
+
+    def _get_persisted_flows(self):
+        """Return the generation, checksum and flows saved in storehouse."""
         try:
-            data = self.storehouse.get_data()['flow_persistence']
-            if 'id' in data:
-                del data['id']
-            self.stored_flows = data
+            data = dict(self.storehouse.get_data()['flow_persistence'])
         except (KeyError, FileNotFoundError) as error:
             log.debug(f'There are no flows to load: {error}')
-        else:
-            log.info('Flows loaded.')
+            return None
+        data.pop('id', None)
+        generation = data.pop('generation', 0)
+        checksum = data.pop('checksum', None)
+        return generation, checksum, decode_stored_flows(data)
+
+    @run_on_thread
+    def _reconcile_snapshot(self, generation, checksum):
+        """Replace the flows loaded from the snapshot if they are outdated.
+
+        The locks of the switches are held, so the flows of a switch being
+        changed meanwhile are replaced only after they are saved, and then
+        they are not replaced at all.
+        """
+        persisted = self._get_persisted_flows()
+        if not persisted:
+            return
+        stored_generation, stored_checksum, stored_flows = persisted
+        if (stored_generation, stored_checksum) == (generation, checksum):
+            log.debug('Flows snapshot is consistent with storehouse.')
+            return
+        with ExitStack() as stack:
+            for dpid in sorted(set(self.stored_flows) | set(stored_flows)):
+                stack.enter_context(self.switch_locks.get(dpid))
+            with self._stored_flows_lock:
+                if self.generation != generation or self._save_pending:
+                    # Flows changed since the snapshot was loaded were saved,
+                    # or will be saved at the end of a batch
+                    return
+                self.generation = stored_generation
+                self.stored_flows = stored_flows_from_dict(stored_flows)
+                self.snapshot.save(stored_generation, stored_flows)
+        log.info('Flows reloaded from storehouse, the snapshot was outdated.')
 
     def _store_changed_flows(self, command, flow, switch):
         """Store changed flows.
@@ -256,62 +542,96 @@ class Main(KytosNApp):
             flow: Flows to be stored
             switch: Switch target
         """
-        stored_flows_box = deepcopy(self.stored_flows)
         # if the flow has a destination dpid it can be stored.
         if not switch:
             log.info('The Flow cannot be stored, the destination switch '
                      f'have not been specified: {switch}')
             return
-        installed_flow = {}
-        flow_list = []
-        installed_flow['command'] = command
-        installed_flow['flow'] = flow
-        deleted_flows = []
+        with STORE_CHANGED_FLOWS_SECONDS.time(dpid=switch.id), \
+                self.switch_locks.get(switch.id):
+            entry = self.stored_flows.get(switch.id)
+            stored_flows = list(entry['flow_list']) if entry else []
+            installed_flow = StoredFlow(command, flow)
+            deleted_flows = []
 
-        serializer = FlowFactory.get_class(switch)
-        installed_flow_obj = serializer.from_dict(flow, switch)
+            serializer = FlowFactory.get_class(switch)
+            installed_flow_obj = serializer.from_dict(flow, switch)
+            version = switch.connection.protocol.version
 
-        if switch.id not in stored_flows_box:
-            # Switch not stored, add to box.
-            flow_list.append(installed_flow)
-            stored_flows_box[switch.id] = {'flow_list': flow_list}
-        else:
-            stored_flows = stored_flows_box[switch.id].get('flow_list', [])
             # Check if flow already stored
             for stored_flow in stored_flows:
-                stored_flow_obj = serializer.from_dict(stored_flow['flow'],
+                stored_flow_obj = serializer.from_dict(stored_flow.flow,
                                                        switch)
 
-                version = switch.connection.protocol.version
-
-                if installed_flow['command'] == 'delete':
+                if installed_flow.command == 'delete':
                     # No strict match
-                    if match_flow(flow, version, stored_flow['flow']):
+                    if match_flow(flow, version, stored_flow.flow):
                         deleted_flows.append(stored_flow)
 
                 elif installed_flow_obj == stored_flow_obj:
-                    if stored_flow['command'] == installed_flow['command']:
+                    if stored_flow.command == installed_flow.command:
                         log.debug('Data already stored.')
                         return
-                    # Flow with inconsistency in "command" fields : Remove the
-                    # old instruction. This happens when there is a stored
-                    # instruction to install the flow, but the new instruction
-                    # is to remove it. In this case, the old instruction is
-                    # removed and the new one is stored.
-                    stored_flow['command'] = installed_flow.get('command')
+                    # Flow with inconsistency in "command" fields : Remove
+                    # the old instruction. This happens when there is a
+                    # stored instruction to install the flow, but the new
+                    # instruction is to remove it. In this case, the old
+                    # instruction is removed and the new one is stored.
                     deleted_flows.append(stored_flow)
                     break
 
-            # if installed_flow['command'] != 'delete':
+            # if installed_flow.command != 'delete':
             stored_flows.append(installed_flow)
             for i in deleted_flows:
                 stored_flows.remove(i)
-            stored_flows_box[switch.id]['flow_list'] = stored_flows
+            self._save_switch_flows(switch.id, stored_flows)
+
+    def _save_switch_flows(self, dpid, flow_list):
+        """Replace the stored flows of a switch and persist all of them.
+
+        The caller must hold the lock of the switch, so the flows of the other
+        switches are not changed by this replacement.
+        """
+        with self._stored_flows_lock:
+            stored_flows_box = dict(self.stored_flows)
+            stored_flows_box[dpid] = {'flow_list': flow_list}
+            if self._deferred_batches:
+                self.stored_flows = stored_flows_box
+                self._save_pending = True
+            else:
+                self._save_stored_flows(stored_flows_box)
+        self.consistency_scheduler.changed(dpid)
 
-        stored_flows_box['id'] = 'flow_persistence'
-        self.storehouse.save_flow(stored_flows_box)
-        del stored_flows_box['id']
-        self.stored_flows = deepcopy(stored_flows_box)
+    @contextmanager
+    def _deferred_saves(self):
+        """Persist the flows stored inside the context once, at its end.
+
+        The flows are still changed in memory immediately. The flows stored
+        by other threads meanwhile are persisted with them.
+        """
+        with self._stored_flows_lock:
+            self._deferred_batches += 1
+        try:
+            yield
+        finally:
+            with self._stored_flows_lock:
+                self._deferred_batches -= 1
+                if not self._deferred_batches and self._save_pending:
+                    self._save_pending = False
+                    self._save_stored_flows(self.stored_flows)
+
+    def _save_stored_flows(self, stored_flows_box):
+        """Persist the stored flows of all switches and keep them in memory."""
+        self.generation += 1
+        flows = stored_flows_as_dict(stored_flows_box)
+        persisted_box = encode_stored_flows(flows, self.flow_list_encoding)
+        persisted_box['id'] = 'flow_persistence'
+        persisted_box['generation'] = self.generation
+        if self.snapshot:
+            persisted_box['checksum'] = self.snapshot.save(self.generation,
+                                                           flows)
+        self.storehouse.save_flow(persisted_box)
+        self.stored_flows = stored_flows_box
 
     @rest('v2/flows')
     @rest('v2/flows/<dpid>')
@@ -320,22 +640,93 @@ class Main(KytosNApp):
 
         If no dpid is specified, return all flows from all switches.
         """
+        started_at = time.monotonic()
         if dpid is None:
-            switches = self.controller.switches.values()
+            switches = list(self.controller.switches.values())
         else:
             switches = [self.controller.get_switch_by_dpid(dpid)]
 
             if not any(switches):
                 raise NotFound("Switch not found")
 
-        switch_flows = {}
+        switch_flows = ((switch.dpid,
+                         {'flows': [cast_fields(flow.as_dict())
+                                    for flow in switch.flows]})
+                        for switch in switches)
+
+        if GZIP_COMPRESS_LEVEL and request.accept_encodings[GZIP_ENCODING]:
+            # The flows of each switch are converted and compressed while
+            # the response is sent
+            chunks = gzip_chunks(json_object_chunks(switch_flows),
+                                 GZIP_COMPRESS_LEVEL)
+            return Response(self._timed_chunks(chunks, started_at),
+                            mimetype='application/json',
+                            headers={'Content-Encoding': GZIP_ENCODING,
+                                     'Vary': 'Accept-Encoding'})
+        response = jsonify(dict(switch_flows))
+        LIST_SECONDS.observe(time.monotonic() - started_at)
+        return response
 
-        for switch in switches:
-            flows_dict = [cast_fields(flow.as_dict())
-                          for flow in switch.flows]
-            switch_flows[switch.dpid] = {'flows': flows_dict}
+    @staticmethod
+    def _timed_chunks(chunks, started_at):
+        """Yield the chunks of a response, timing the list until the end.
 
-        return jsonify(switch_flows)
+        The time is observed when the response is sent or closed, since the
+        flows are converted while the chunks are generated.
+        """
+        try:
+            yield from chunks
+        finally:
+            LIST_SECONDS.observe(time.monotonic() - started_at)
+
+    @rest('v2/metrics')
+    def metrics(self):
+        """Return the metrics of this NApp in the Prometheus text format."""
+        return Response(REGISTRY.render(),
+                        mimetype='text/plain; version=0.0.4')
+
+    @rest('v2/consistency/schedule')
+    def consistency_schedule(self):
+        """Return when the consistency of each switch is checked."""
+        return jsonify(self.consistency_scheduler.as_dict())
+
+    @rest('v2/profiler/start', methods=['POST'])
+    def start_profiler(self):
+        """Start sampling the stacks of the threads running this NApp.
+
+        The optional JSON body may have the ``interval`` between samples and
+        the ``duration`` of the capture, in seconds.
+        """
+        options = request.get_json(silent=True) or {}
+        try:
+            interval = float(options.get('interval', PROFILER_INTERVAL))
+            duration = float(options.get('duration', PROFILER_MAX_DURATION))
+        except (AttributeError, TypeError, ValueError) as error:
+            msg = 'The interval and duration must be numbers.'
+            raise BadRequest(msg) from error
+        if interval <= 0 or duration <= 0:
+            raise BadRequest('The interval and duration must be positive.')
+        duration = min(duration, PROFILER_MAX_DURATION)
+
+        if not self.profiler.start(interval, duration):
+            return jsonify({"response": 'profiler already running.'}), 409
+        return jsonify({"response": "Profiler started",
+                        "interval": interval, "duration": duration})
+
+    @rest('v2/profiler/stop', methods=['POST'])
+    def stop_profiler(self):
+        """Stop the profiler and return the samples of the last capture.
+
+        The samples are aggregated by function, or returned as collapsed
+        stacks if the ``format`` argument is ``collapsed``.
+        """
+        self.profiler.stop()
+        if self.profiler.started_at is None:
+            return jsonify({"response": 'profiler not started.'}), 404
+        if request.args.get('format') == 'collapsed':
+            return Response(self.profiler.collapsed(), mimetype='text/plain')
+        limit = request.args.get('limit', type=int)
+        return jsonify(self.profiler.stats(limit))
 
     @listen_to('kytos.flow_manager.flows.(install|delete)')
     def event_flows_install_delete(self, event):
@@ -366,6 +757,53 @@ class Main(KytosNApp):
             log.error("Error installing or deleting Flow through"
                       f" Kytos Event: {error}")
 
+    @listen_to('kytos.flow_manager.flows.batch.(install|delete)')
+    def event_flows_batch_install_delete(self, event):
+        """Install or delete the flows of many switches through one event.
+
+        The flows of all switches are stored with a single persistence commit.
+        The result is passed to the ``callback`` of the event and sent in the
+        ``reply_event``, if they are given, also when the batch fails.
+        """
+        if event.name == 'kytos.flow_manager.flows.batch.install':
+            command = 'add'
+        elif event.name == 'kytos.flow_manager.flows.batch.delete':
+            command = 'delete'
+        else:
+            msg = (f'Invalid event "{event.name}", should be '
+                   'batch.install|batch.delete')
+            raise ValueError(msg)
+
+        result = {'id': event.content.get('id'), 'command': command,
+                  'flows': {}, 'missing': [], 'error': None}
+        try:
+            switches_flows = []
+            for dpid, flow_dict in event.content['flow_dicts'].items():
+                switch = self.controller.get_switch_by_dpid(dpid)
+                if not switch:
+                    result['missing'].append(dpid)
+                    continue
+                flows = flow_dict.get('flows', [])
+                switches_flows.append((switch, flows))
+                result['flows'][dpid] = len(flows)
+            with self._deferred_saves():
+                self._install_switches_flows(command, switches_flows)
+        # pylint: disable=broad-except
+        except Exception as error:
+            log.error("Error installing or deleting Flows through"
+                      f" Kytos Event: {error!r}")
+            result['error'] = str(error)
+        self._reply_batch(event, result)
+
+    def _reply_batch(self, event, result):
+        """Send the result of a batch to its callback and reply event."""
+        callback = event.content.get('callback')
+        if callback:
+            callback(result)
+        reply_event = event.content.get('reply_event')
+        if reply_event:
+            self.controller.buffers.app.put(KytosEvent(reply_event, result))
+
     @rest('v2/flows', methods=['POST'])
     @rest('v2/flows/<dpid>', methods=['POST'])
     def add(self, dpid=None):
@@ -386,81 +824,510 @@ class Main(KytosNApp):
         """
         return self._send_flow_mods_from_request(dpid, "delete")
 
+    @rest('v2/flows/<dpid>', methods=['PUT'])
+    def replace(self, dpid):
+        """Make the flows of a switch be the flows of the request.
+
+        Only the FlowMods that turn the installed and stored flows into the
+        requested flows are sent, then the stored flows of the switch are
+        replaced by the requested flows.
+        """
+        flows_dict = self._flows_dict_from_request(allow_empty=True)
+        switch = self.controller.get_switch_by_dpid(dpid)
+        if not switch:
+            return jsonify({"response": 'dpid not found.'}), 404
+        if switch.is_enabled() is False:
+            return jsonify({"response": 'switch is disabled.'}), 404
+
+        flows = flows_dict['flows']
+        if self.switch_workers:
+            # Replaced after the flows already queued to the switch
+            diff = self.switch_workers.submit(
+                switch.dpid, self._replace_switch_flows, switch,
+                flows).result()
+        else:
+            diff = self._replace_switch_flows(switch, flows)
+        return jsonify(dict(diff, response="FlowMod Messages Sent"))
+
+    def _replace_switch_flows(self, switch, flows):
+        """Send the difference to the flows of a switch and store them.
+
+        The flows are compared by the identities of their Flow objects, which
+        include the timeouts. The installed flows and the flows stored with
+        the add command that are not requested are deleted, and the requested
+        flows not installed are added, so a flow installed with other
+        timeouts is deleted and added again. Return the number of flows
+        added, deleted and unchanged.
+        """
+        serializer = FlowFactory.get_class(switch)
+
+        def identity(flow_dict):
+            return flow_identity(serializer.from_dict(flow_dict,
+                                                      switch).as_dict())
+
+        desired = OrderedDict()
+        for flow_dict in flows:
+            desired.setdefault(identity(flow_dict), flow_dict)
+
+        with self.switch_locks.get(switch.id):
+            installed = {}
+            for flow in switch.flows:
+                if not self.consistency_ignored_check(flow):
+                    flow_dict = flow.as_dict()
+                    installed[flow_identity(flow_dict)] = flow_dict
+            current = {}
+            entry = self.stored_flows.get(switch.id)
+            for stored_flow in entry['flow_list'] if entry else []:
+                if stored_flow.command == 'add':
+                    current[identity(stored_flow.flow)] = stored_flow.flow
+            current.update(installed)
+
+            deleted_flows = [flow_dict for key, flow_dict in current.items()
+                             if key not in desired]
+            added_flows = [flow_dict for key, flow_dict in desired.items()
+                           if key not in installed]
+            if deleted_flows:
+                self._send_flows('delete_strict', deleted_flows, switch)
+            if added_flows:
+                self._send_flows('add', added_flows, switch)
+            self._save_switch_flows(switch.id,
+                                    [StoredFlow('add', flow_dict)
+                                     for flow_dict in desired.values()])
+        return {'added': len(added_flows), 'deleted': len(deleted_flows),
+                'unchanged': len(desired) - len(added_flows)}
+
     def _get_all_switches_enabled(self):
         """Get a list of all switches enabled."""
         switches = self.controller.switches.values()
         return [switch for switch in switches if switch.is_enabled()]
 
-    def _send_flow_mods_from_request(self, dpid, command, flows_dict=None):
-        """Install FlowsMods from request."""
-        if flows_dict is None:
-            flows_dict = request.get_json() or {}
-            content_type = request.content_type
-            # Get flow to check if the request is well-formed
-            flows = flows_dict.get('flows', [])
+    @staticmethod
+    def _flows_dict_from_request(allow_empty=False):
+        """Return the flows dictionary of the request body.
 
-            if content_type is None:
-                result = 'The request body is empty'
-                raise BadRequest(result)
+        If ``allow_empty`` is True, the list of flows may be empty.
+        """
+        if request.content_encoding:
+            flows_dict = None
+            if request.mimetype == 'application/json':
+                try:
+                    flows_dict = json.loads(read_limited(
+                        Main._request_stream(), GZIP_MAX_DECOMPRESSED_SIZE))
+                except BodyTooLargeError as error:
+                    result = ('The decompressed request body is too large: '
+                              f'{error}.')
+                    raise RequestEntityTooLarge(result) from error
+                except GZIP_ERRORS + (ValueError,) as error:
+                    result = 'The request body is not well-formed.'
+                    raise BadRequest(result) from error
+        else:
+            flows_dict = request.get_json()
+        flows_dict = flows_dict or {}
+        content_type = request.content_type
+        # Get flow to check if the request is well-formed
+        flows = flows_dict.get('flows', [])
+
+        if content_type is None:
+            result = 'The request body is empty'
+            raise BadRequest(result)
+
+        if content_type != 'application/json':
+            result = ('The content type must be application/json '
+                      f'(received {content_type}).')
+            raise UnsupportedMediaType(result)
+
+        if allow_empty:
+            well_formed = isinstance(flows_dict.get('flows'), list)
+        else:
+            well_formed = any(flows_dict) and any(flows)
+        if not well_formed:
+            result = 'The request body is not well-formed.'
+            raise BadRequest(result)
+        return flows_dict
 
-            if content_type != 'application/json':
-                result = ('The content type must be application/json '
-                          f'(received {content_type}).')
-                raise UnsupportedMediaType(result)
+    def _send_flow_mods_from_request(self, dpid, command, flows_dict=None):
+        """Install FlowsMods from request.
 
-            if not any(flows_dict) or not any(flows):
-                result = 'The request body is not well-formed.'
-                raise BadRequest(result)
+        If the ``async`` argument of the request is true, the FlowMods are
+        sent by a background job and its id is returned. The id of the job is
+        also returned when barrier tracking is enabled. A request body with
+        the application/x-ndjson content type is sent while it is read.
+        """
+        run_async = stream = False
+        if flows_dict is None:
+            stream = request.mimetype == NDJSON_CONTENT_TYPE
+            if not stream:
+                flows_dict = self._flows_dict_from_request()
+            run_async = request.args.get('async', '').lower() == 'true'
 
         if dpid:
             switch = self.controller.get_switch_by_dpid(dpid)
             if not switch:
                 return jsonify({"response": 'dpid not found.'}), 404
-            elif switch.is_enabled() is False:
-                if command == "delete":
-                    self._install_flows(command, flows_dict, [switch])
-                else:
-                    return jsonify({"response": 'switch is disabled.'}), 404
-            else:
-                self._install_flows(command, flows_dict, [switch])
+            if switch.is_enabled() is False and command != "delete":
+                return jsonify({"response": 'switch is disabled.'}), 404
+            switches = [switch]
         else:
-            self._install_flows(command, flows_dict,
-                                self._get_all_switches_enabled())
+            switches = self._get_all_switches_enabled()
+
+        if stream:
+            if run_async:
+                raise BadRequest('The async argument is not supported with '
+                                 f'the {NDJSON_CONTENT_TYPE} content type.')
+            return self._send_flow_mods_from_stream(command, switches, dpid)
+
+        if not run_async and not ENABLE_BARRIER_TRACKING:
+            self._install_flows(command, flows_dict, switches)
+            return jsonify({"response": "FlowMod Messages Sent"})
+
+        flows = flows_dict.get('flows', [])
+        job = Job(command, dpid, len(flows) * len(switches))
+        if run_async:
+            self.jobs.submit(job, command, flows_dict, switches)
+            return jsonify({"response": "FlowMod Messages Queued",
+                            "job_id": job.id}), 202
+        self.jobs.run(job, command, flows_dict, switches)
+        return jsonify({"response": "FlowMod Messages Sent",
+                        "job_id": job.id})
 
-        return jsonify({"response": "FlowMod Messages Sent"})
-
-    def _install_flows(self, command, flows_dict, switches=[]):
+    @staticmethod
+    def _request_stream():
+        """Return the request body as a stream, decoding its encoding."""
+        try:
+            return decoded_stream(request.stream, request.content_encoding)
+        except ValueError as error:
+            raise UnsupportedMediaType(str(error)) from error
+
+    def _send_flow_mods_from_stream(self, command, switches, dpid=None):
+        """Install the FlowMods of an NDJSON request body in batches.
+
+        Each batch of NDJSON_BATCH_SIZE flows is installed in the switches
+        once it is read, and the flows it stored are persisted at once. The
+        saves are not deferred while the next batch is received, since that
+        depends on the client. The flows of the lines before an invalid line,
+        or a line too large once decompressed, are installed anyway, so the
+        response has the number of flows sent.
+
+        With barrier tracking, the batches are sent by a job that grows with
+        each batch, and a BarrierRequest confirms the FlowMods of each batch.
+        The job fails if the body can not be read until the end.
+        """
+        sent = 0
+        max_line_size = None
+        if request.content_encoding:
+            max_line_size = GZIP_MAX_DECOMPRESSED_SIZE
+        flows = read_ndjson_flows(self._request_stream(), max_line_size)
+        job = Job(command, dpid, 0) if ENABLE_BARRIER_TRACKING else None
+        job_id = {"job_id": job.id} if job else {}
+        try:
+            with ExitStack() as stack:
+                if job:
+                    stack.enter_context(self.jobs.running(job))
+                for batch in batches(flows, NDJSON_BATCH_SIZE):
+                    if job:
+                        self.jobs.flows_queued(job,
+                                               len(batch) * len(switches))
+                    with self._deferred_saves():
+                        self._install_flows(command, {'flows': batch},
+                                            switches, job)
+                    sent += len(batch)
+        except BodyTooLargeError as error:
+            result = f'The decompressed request body is too large: {error}.'
+            return jsonify({"response": result, "flows": sent,
+                            **job_id}), 413
+        except (InvalidFlowStreamError,) + GZIP_ERRORS as error:
+            result = f'The request body is not well-formed: {error}.'
+            return jsonify({"response": result, "flows": sent,
+                            **job_id}), 400
+        if not sent:
+            raise BadRequest('The request body is empty')
+        return jsonify({"response": "FlowMod Messages Sent", "flows": sent,
+                        **job_id})
+
+    @rest('v2/jobs/<job_id>')
+    def get_job(self, job_id):
+        """Return the progress of the job of an asynchronous request."""
+        job = self.jobs.get(job_id)
+        if not job:
+            return jsonify({"response": 'job not found.'}), 404
+        return jsonify(job.as_dict())
+
+    def _install_flows(self, command, flows_dict, switches=[], job=None):
         """Execute all procedures to install flows in the switches.
 
         Args:
             command: Flow command to be installed
             flows_dict: Dictionary with flows to be installed in the switches.
             switches: A list of switches
+            job: Job that counts the FlowMods sent, if any
         """
+        flows = flows_dict.get('flows', [])
+        templates = self._build_fan_out_templates(command, flows, switches)
+        self._install_switches_flows(command,
+                                     [(switch, flows) for switch in switches],
+                                     job, templates)
+
+    def _install_switches_flows(self, command, switches_flows, job=None,
+                                templates=None):
+        """Install a list of flows in each switch of ``switches_flows``.
+
+        Args:
+            command: Flow command to be installed
+            switches_flows: List of (switch, flows) pairs.
+            job: Job that counts the FlowMods sent, if any
+            templates: FlowMods already built for each OpenFlow version
+        """
+        if not self.switch_workers:
+            for switch, flows in switches_flows:
+                self._install_switch_flows(command, flows, switch, job,
+                                           templates)
+            return
+        # The flows are installed in parallel in the switches, but in order
+        # in each switch, after the flows already queued to it.
+        futures = [self.switch_workers.submit(switch.dpid,
+                                              self._install_switch_flows,
+                                              command, flows, switch, job,
+                                              templates)
+                   for switch, flows in switches_flows]
+        for future in futures:
+            future.result()
+
+    def _build_fan_out_templates(self, command, flows, switches):
+        """Build the FlowMods of the flows once per OpenFlow version.
+
+        Return a dictionary with the Flow objects and the FlowMods built for
+        the first switch of each version, keyed by version. It is empty if
+        the flows are sent to a single switch or fan-out is disabled.
+        """
+        if not ENABLE_FAN_OUT or not flows or len(switches) < 2:
+            return {}
+        templates = {}
         for switch in switches:
-            serializer = FlowFactory.get_class(switch)
-            flows = flows_dict.get('flows', [])
-            for flow_dict in flows:
-                flow = serializer.from_dict(flow_dict, switch)
-                if command == "delete":
-                    flow_mod = flow.as_of_delete_flow_mod()
-                elif command == "delete_strict":
-                    flow_mod = flow.as_of_strict_delete_flow_mod()
-                elif command == "add":
-                    flow_mod = flow.as_of_add_flow_mod()
-                else:
-                    raise InvalidCommandError
-                self._send_flow_mod(flow.switch, flow_mod)
-                self._add_flow_mod_sent(flow_mod.header.xid, flow, command)
+            version = switch.connection.protocol.version
+            if version not in templates:
+                templates[version] = self._build_flow_mods(command, flows,
+                                                           switch)
+        return templates
+
+    def _build_flow_mods(self, command, flows, switch):
+        """Return the Flow objects and the FlowMods packed for a switch."""
+        serializer = FlowFactory.get_class(switch)
+        flow_objs = [serializer.from_dict(flow_dict, switch)
+                     for flow_dict in flows]
+        packer = self._get_packer(switch, flows)
+        if packer:
+            if command not in packer.COMMANDS:
+                raise InvalidCommandError
+            packed_flows = self._packed_flows(flows, flow_objs, packer)
+            flow_mods = packer.pack_flow_mods(packed_flows, command,
+                                              [0] * len(flows))
+        else:
+            flow_mods = PackedFlowMods.from_messages(
+                switch.connection.protocol.version,
+                [self._flow_mod_of(flow, command) for flow in flow_objs])
+        return flow_objs, flow_mods
+
+    def _install_switch_flows(self, command, flows, switch, job=None,
+                              templates=None):
+        """Install flows in a single switch.
+
+        If there are FlowMods already built for the version of the switch in
+        ``templates``, they are sent with new xids.
+        """
+        with INSTALL_FLOWS_SECONDS.time(dpid=switch.dpid, command=command):
+            if command == 'add' and ENABLE_IDEMPOTENT_ADD:
+                new_flows = self._new_flows(flows, switch, job)
+                if len(new_flows) != len(flows):
+                    # The templates were built for all the flows
+                    flows, templates = new_flows, None
+            template = None
+            if templates:
+                template = templates.get(switch.connection.protocol.version)
+            if template:
+                self._install_fan_out_flows(command, flows, switch, template,
+                                            job)
+            else:
+                self._install_built_flows(command, flows, switch, job)
+            if job and ENABLE_BARRIER_TRACKING:
+                self._send_barrier_request(switch, job)
+
+    def _new_flows(self, flows, switch, job=None):
+        """Return the flows not already installed and stored in a switch.
+
+        A flow is skipped if its Flow object has the identity of a flow
+        installed in the switch and the same flow is stored with the add
+        command, so it would be sent again only to be stored again.
+
+        No flow is skipped while the flows of the switch are the ones it had
+        when it connected, since they may be gone if the switch rebooted.
+        """
+        entry = self.stored_flows.get(switch.id)
+        if (not entry or not switch.flows or
+                switch.flows is self._stale_switch_flows.get(switch.dpid)):
+            return flows
+        stored_flows = set(entry['flow_list'])
+        installed = self._installed_identities(switch)
+        serializer = FlowFactory.get_class(switch)
+        new_flows = [flow_dict for flow_dict in flows
+                     if StoredFlow('add', flow_dict) not in stored_flows or
+                     flow_identity(serializer.from_dict(flow_dict, switch)
+                                   .as_dict()) not in installed]
+        skipped = len(flows) - len(new_flows)
+        if skipped:
+            FLOW_MODS_SKIPPED.inc(skipped, dpid=switch.dpid)
+            if job:
+                self.jobs.flow_mods_skipped(job, skipped)
+        return new_flows
+
+    def _installed_identities(self, switch):
+        """Return the identities of the flows installed in a switch.
+
+        They are computed again only when the list of flows of the switch is
+        replaced, which is done for each flow stats reply.
+        """
+        flows = switch.flows
+        cached = self._installed_identities_cache.get(switch.dpid)
+        if cached and cached[0] is flows and cached[1] == len(flows):
+            return cached[2]
+        identities = {flow_identity(flow.as_dict()) for flow in flows}
+        self._installed_identities_cache[switch.dpid] = (flows, len(flows),
+                                                         identities)
+        return identities
+
+    def _install_built_flows(self, command, flows, switch, job=None,
+                             store=True):
+        """Build the FlowMods of the flows for a switch and send them."""
+        serializer = FlowFactory.get_class(switch)
+        packer = self._get_packer(switch, flows)
+        if packer:
+            self._install_packed_flows(command, flows, switch, serializer,
+                                       packer, job, store)
+        else:
+            self._install_flow_mods(command, flows, switch, serializer, job,
+                                    store)
+
+    def _install_flow_mods(self, command, flows, switch, serializer,
+                           job=None, store=True):
+        """Send a FlowMod created from the Flow object of each flow."""
+        flow_objs = []
+        for flow_dict in flows:
+            flow = serializer.from_dict(flow_dict, switch)
+            flow_mod = self._flow_mod_of(flow, command)
+            self._send_flow_mod(flow.switch, flow_mod)
+            self._add_flow_mod_sent(flow_mod.header.xid, flow, command)
+            if job:
+                self.jobs.flow_mod_sent(job, flow_mod.header.xid)
+
+            if ENABLE_FLOW_NAPP_EVENTS:
+                self._send_napp_event(switch, flow, command)
+            if store:
+                self._store_changed_flows(command, flow_dict, switch)
+            flow_objs.append(flow)
+        self._send_batched_napp_event(switch, flow_objs, command)
+
+    @staticmethod
+    def _flow_mod_of(flow, command):
+        """Return the FlowMod of a Flow object with the given command."""
+        if command == "delete":
+            return flow.as_of_delete_flow_mod()
+        if command == "delete_strict":
+            return flow.as_of_strict_delete_flow_mod()
+        if command == "add":
+            return flow.as_of_add_flow_mod()
+        raise InvalidCommandError
+
+    def _install_fan_out_flows(self, command, flows, switch, template,
+                               job=None):
+        """Send the FlowMods built for another switch with new xids.
+
+        The Flow objects are shallow copies of the template ones, since only
+        their switch changes.
+        """
+        flow_objs, flow_mods = template
+        flow_objs = [copy(flow) for flow in flow_objs]
+        for flow in flow_objs:
+            flow.switch = switch
+        xids = self._allocate_xids(len(flows))
+        self._send_packed_flows(command, flows, switch, flow_objs,
+                                flow_mods.with_xids(xids), job)
+
+    def _send_barrier_request(self, switch, job):
+        """Send a BarrierRequest after the FlowMods of a job.
+
+        The reply of the switch confirms the FlowMods of the job sent before
+        the request that did not fail.
+        """
+        barrier_request = BARRIER_REQUESTS[switch.connection.protocol.version]
+        xid, = self._allocate_xids(1)
+        self.jobs.barrier_request_sent(job, xid)
+        event_name = 'kytos/flow_manager.messages.out.ofpt_barrier_request'
+        content = {'destination': switch.connection,
+                   'message': barrier_request(xid=xid)}
+        event = KytosEvent(name=event_name, content=content)
+        self.controller.buffers.msg_out.put(event)
+
+    def _get_packer(self, switch, flows):
+        """Return the serializer to pack the flows in bulk, if possible."""
+        if not ENABLE_BULK_PACKING or len(flows) < BULK_PACKING_MIN_FLOWS:
+            return None
+        packer = self._packers.get(switch.connection.protocol.version)
+        if packer and all(packer.can_pack(flow) for flow in flows):
+            return packer
+        return None
+
+    def _install_packed_flows(self, command, flows, switch, serializer,
+                              packer, job=None, store=True):
+        """Send the FlowMods of all flows packed in a single buffer.
+
+        The FlowMods are packed from the flow dictionaries, with the default
+        values of the flow fields taken from the Flow objects.
+        """
+        if command not in packer.COMMANDS:
+            raise InvalidCommandError
+        flow_objs = [serializer.from_dict(flow_dict, switch)
+                     for flow_dict in flows]
+        packed_flows = self._packed_flows(flows, flow_objs, packer)
+        xids = self._allocate_xids(len(flows))
+        flow_mods = packer.pack_flow_mods(packed_flows, command, xids)
+        self._send_packed_flows(command, flows, switch, flow_objs, flow_mods,
+                                job, store)
 
+    @staticmethod
+    def _packed_flows(flows, flow_objs, packer):
+        """Return the flow dictionaries with the defaults of the Flows."""
+        return [dict(flow_dict, **{field: int(getattr(flow, field))
+                                   for field in packer.flow_attributes})
+                for flow_dict, flow in zip(flows, flow_objs)]
+
+    def _send_packed_flows(self, command, flows, switch, flow_objs,
+                           flow_mods, job=None, store=True):
+        """Send packed FlowMods to a switch and keep track of their flows."""
+        self._send_flow_mod(switch, flow_mods)
+
+        for xid, flow_dict, flow in zip(flow_mods.xids, flows, flow_objs):
+            self._add_flow_mod_sent(xid, flow, command)
+            if job:
+                self.jobs.flow_mod_sent(job, xid)
+            if ENABLE_FLOW_NAPP_EVENTS:
                 self._send_napp_event(switch, flow, command)
+            if store:
                 self._store_changed_flows(command, flow_dict, switch)
+        self._send_batched_napp_event(switch, flow_objs, command)
+
+    def _allocate_xids(self, count):
+        """Return a list of count consecutive xids."""
+        with self._xid_lock:
+            first = self._next_xid
+            self._next_xid = (first + count) % (UBINT32_MAX_VALUE + 1)
+        return [(first + i) % (UBINT32_MAX_VALUE + 1) for i in range(count)]
 
     def _add_flow_mod_sent(self, xid, flow, command):
         """Add the flow mod to the list of flow mods sent."""
-        if len(self._flow_mods_sent) >= self._flow_mods_sent_max_size:
-            self._flow_mods_sent.popitem(last=False)
-        self._flow_mods_sent[xid] = (flow, command)
+        with self._flow_mods_sent_lock:
+            if len(self._flow_mods_sent) >= self._flow_mods_sent_max_size:
+                self._flow_mods_sent.popitem(last=False)
+            self._flow_mods_sent[xid] = (flow, command, time.monotonic())
+        FLOW_MODS_SENT.inc(dpid=flow.switch.dpid, command=command)
 
     def _send_flow_mod(self, switch, flow_mod):
         event_name = 'kytos/flow_manager.messages.out.ofpt_flow_mod'
@@ -471,6 +1338,24 @@ class Main(KytosNApp):
         event = KytosEvent(name=event_name, content=content)
         self.controller.buffers.msg_out.put(event)
 
+    def _send_batched_napp_event(self, switch, flows, command):
+        """Send an Event to other apps with the FlowMods sent to a switch.
+
+        A single event is sent with the flows of a request, if batched napp
+        events are enabled.
+        """
+        if not ENABLE_BATCHED_NAPP_EVENTS or not flows:
+            return
+        if command == 'add':
+            name = 'kytos/flow_manager.flows.added'
+        elif command in ('delete', 'delete_strict'):
+            name = 'kytos/flow_manager.flows.removed'
+        else:
+            raise InvalidCommandError
+        content = {'datapath': switch,
+                   'flows': flows}
+        self.controller.buffers.app.put(KytosEvent(name, content))
+
     def _send_napp_event(self, switch, flow, command, **kwargs):
         """Send an Event to other apps informing about a FlowMod."""
         if command == 'add':
@@ -487,7 +1372,14 @@ class Main(KytosNApp):
         event_app = KytosEvent(name, content)
         self.controller.buffers.app.put(event_app)
 
+    @listen_to('.*.of_core.*.ofpt_barrier_reply')
+    def handle_barrier_reply(self, event):
+        """Confirm the FlowMods of a job sent before a BarrierRequest."""
+        message = event.content["message"]
+        self.jobs.barrier_replied(message.header.xid.value)
+
     @listen_to('.*.of_core.*.ofpt_error')
+    @HANDLE_ERRORS_SECONDS.time()
     def handle_errors(self, event):
         """Receive OpenFlow error and send a event.
 
@@ -498,37 +1390,79 @@ class Main(KytosNApp):
 
         connection = event.source
         switch = connection.switch
+        ERRORS_RECEIVED.inc(dpid=switch.dpid)
 
         xid = message.header.xid.value
-        error_type = message.error_type
-        error_code = message.code
-        error_data = message.data.pack()
+        self.jobs.flow_mod_errored(xid)
+        with self._flow_mods_sent_lock:
+            flow_mod_sent = self._flow_mods_sent.get(xid)
+        key = (switch.dpid, _int_value(message.error_type),
+               _int_value(message.code))
+        self.error_aggregator.add(key, (connection, message, flow_mod_sent))
+
+    def _handle_aggregated_errors(self, key, errors):
+        """Handle the errors of a switch with the same type and code.
+
+        Each error is a (connection, message, flow mod sent) tuple. With an
+        aggregation window, a single event is sent with the flows of all the
+        errors, otherwise an event is sent for the flow of each error.
+        """
+        _, error_type, error_code = key
+        connection, message, _ = errors[0]
+        if message.code == BadActionCode.OFPBAC_BAD_OUT_PORT:
+            self._disable_bad_out_ports(connection,
+                                        [message for _, message, _ in errors])
+
+        if not self.error_aggregator.window:
+            for _, message, flow_mod_sent in errors:
+                if flow_mod_sent:
+                    flow, error_command, _ = flow_mod_sent
+                    self._send_napp_event(flow.switch, flow, 'error',
+                                          error_command=error_command,
+                                          error_type=message.error_type,
+                                          error_code=message.code)
+            return
 
-        # Get the packet responsible for the error
-        error_packet = connection.protocol.unpack(error_data)
+        flows = [{'flow': flow_mod_sent[0], 'error_command': flow_mod_sent[1]}
+                 for _, _, flow_mod_sent in errors if flow_mod_sent]
+        if flows:
+            content = {'datapath': connection.switch,
+                       'error_type': error_type,
+                       'error_code': error_code,
+                       'errors': len(errors),
+                       'flows': flows}
+            self.controller.buffers.app.put(
+                KytosEvent('kytos/flow_manager.flows.error', content))
 
-        if message.code == BadActionCode.OFPBAC_BAD_OUT_PORT:
-            actions = []
+    @staticmethod
+    def _disable_bad_out_ports(connection, messages):
+        """Drop the packets forwarded to the output ports of failed flows.
+
+        The FlowMods that differ only by their header are unpacked once, and
+        each output port is configured once.
+        """
+        switch = connection.switch
+        error_packets = {}
+        for message in messages:
+            error_data = message.data.pack()
+            error_packets.setdefault(error_data[8:], error_data)
+
+        ports = set()
+        for error_data in error_packets.values():
+            # Get the packet responsible for the error
+            error_packet = connection.protocol.unpack(error_data)
             if hasattr(error_packet, 'actions'):
                 # Get actions from the flow mod (OF 1.0)
                 actions = error_packet.actions
             else:
                 # Get actions from the list of flow mod instructions (OF 1.3)
-                for instruction in error_packet.instructions:
-                    actions.extend(instruction.actions)
-
-            for action in actions:
-                iface = switch.get_interface_by_port_no(action.port)
+                actions = [action for instruction in error_packet.instructions
+                           for action in instruction.actions]
+            ports.update(_int_value(action.port) for action in actions)
 
-                # Set interface to drop packets forwarded to it
-                if iface:
-                    iface.config = PortConfig.OFPPC_NO_FWD
+        for port in ports:
+            iface = switch.get_interface_by_port_no(port)
 
-        try:
-            flow, error_command = self._flow_mods_sent[xid]
-        except KeyError:
-            pass
-        else:
-            self._send_napp_event(flow.switch, flow, 'error',
-                                  error_command=error_command,
-                                  error_type=error_type, error_code=error_code)
+            # Set interface to drop packets forwarded to it
+            if iface:
+                iface.config = PortConfig.OFPPC_NO_FWD
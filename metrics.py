@@ -0,0 +1,225 @@
+"""Counters and histograms of the time spent in the flow_manager hot paths.
+
+The metrics are kept in memory and rendered in the Prometheus text format by
+the ``v2/metrics`` endpoint. Updating a metric only takes a lock and a few
+dictionary operations, so they are always enabled.
+"""
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from threading import Lock
+
+# Upper bounds, in seconds, of the buckets of the duration histograms
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_value(value):
+    """Return a sample value in the Prometheus text format."""
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _format_labels(labels):
+    """Return the labels of a sample in the Prometheus text format."""
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', r'\\').replace('"', r'\"')
+               .replace('\n', r'\n') for _, value in labels)
+    pairs = (f'{name}="{value}"' for (name, _), value in zip(labels, escaped))
+    return '{' + ','.join(pairs) + '}'
+
+
+class Metric:
+    """Base class of the metrics, with one value for each set of labels."""
+
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        """Create a metric with the given name and label names."""
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = Lock()
+
+    def _key(self, labels):
+        """Return the key of the value of a set of labels."""
+        if labels.keys() != set(self.labelnames):
+            raise ValueError(f'Expected the labels {self.labelnames} for '
+                             f'{self.name}, received {tuple(labels)}')
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def clear(self):
+        """Remove the values of all labels."""
+        with self._lock:
+            self._values.clear()
+
+    def samples(self):
+        """Return a list of (name, labels, value) of the metric values."""
+        raise NotImplementedError
+
+    def render(self):
+        """Return the metric in the Prometheus text format."""
+        lines = [f'# HELP {self.name} {self.documentation}',
+                 f'# TYPE {self.name} {self.type}']
+        lines.extend(f'{name}{_format_labels(labels)} {_format_value(value)}'
+                     for name, labels, value in self.samples())
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    """A value that only increases, such as the number of FlowMods sent."""
+
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        """Increase the counter of the given labels."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels):
+        """Return the value of the counter of the given labels."""
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        """Return a list of (name, labels, value) of the metric values."""
+        with self._lock:
+            values = sorted(self._values.items())
+        return [(self.name, tuple(zip(self.labelnames, key)), value)
+                for key, value in values]
+
+
+class Histogram(Metric):
+    """Distribution of observed values, such as the duration of a method."""
+
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(),
+                 buckets=DEFAULT_BUCKETS):
+        """Create a histogram with the upper bounds of its buckets."""
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        """Add an observed value to the histogram of the given labels."""
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                # One count for each bucket and +Inf, followed by the sum
+                counts = self._values[key] = [0] * (len(self.buckets) + 2)
+            counts[index] += 1
+            counts[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration, in seconds, of the ``with`` block."""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(time.monotonic() - start, **labels)
+
+    def get_count(self, **labels):
+        """Return the number of values observed with the given labels."""
+        counts = self._values.get(self._key(labels))
+        return sum(counts[:-1]) if counts else 0
+
+    def samples(self):
+        """Return a list of (name, labels, value) of the metric values."""
+        with self._lock:
+            values = sorted((key, list(counts))
+                            for key, counts in self._values.items())
+        samples = []
+        for key, counts in values:
+            labels = tuple(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                samples.append((f'{self.name}_bucket',
+                                labels + (('le', _format_value(bound)),),
+                                cumulative))
+            samples.append((f'{self.name}_sum', labels, counts[-1]))
+            samples.append((f'{self.name}_count', labels, cumulative))
+        return samples
+
+
+class Registry:
+    """Collection of metrics rendered together."""
+
+    def __init__(self):
+        """Create an empty registry."""
+        self.metrics = []
+
+    def counter(self, name, documentation, labelnames=()):
+        """Create and register a counter."""
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(),
+                  buckets=DEFAULT_BUCKETS):
+        """Create and register a histogram."""
+        return self.register(Histogram(name, documentation, labelnames,
+                                       buckets))
+
+    def register(self, metric):
+        """Add a metric to the registry and return it."""
+        self.metrics.append(metric)
+        return metric
+
+    def clear(self):
+        """Remove the values of all metrics."""
+        for metric in self.metrics:
+            metric.clear()
+
+    def render(self):
+        """Return all metrics in the Prometheus text format."""
+        return ''.join(metric.render() + '\n' for metric in self.metrics)
+
+
+REGISTRY = Registry()
+
+INSTALL_FLOWS_SECONDS = REGISTRY.histogram(
+    'flow_manager_install_flows_seconds',
+    'Time spent sending the FlowMods of a request to a switch.',
+    ('dpid', 'command'))
+FLOW_MODS_SENT = REGISTRY.counter(
+    'flow_manager_flow_mods_sent_total',
+    'Number of FlowMods sent to a switch.', ('dpid', 'command'))
+FLOW_MODS_SKIPPED = REGISTRY.counter(
+    'flow_manager_flow_mods_skipped_total',
+    'Number of FlowMods not sent, since their flows were already installed '
+    'and stored.', ('dpid',))
+STORE_CHANGED_FLOWS_SECONDS = REGISTRY.histogram(
+    'flow_manager_store_changed_flows_seconds',
+    'Time spent updating and persisting the stored flows of a switch.',
+    ('dpid',))
+STOREHOUSE_SAVE_SECONDS = REGISTRY.histogram(
+    'flow_manager_storehouse_save_seconds',
+    'Time spent requesting storehouse to save the stored flows.')
+STOREHOUSE_SAVE_ERRORS = REGISTRY.counter(
+    'flow_manager_storehouse_save_errors_total',
+    'Number of errors reported by storehouse when saving the stored flows.')
+CONSISTENCY_CHECK_SECONDS = REGISTRY.histogram(
+    'flow_manager_consistency_check_seconds',
+    'Time spent in a consistency check of a switch.', ('check', 'dpid'))
+CONSISTENCY_REPAIRS = REGISTRY.counter(
+    'flow_manager_consistency_repairs_total',
+    'Number of flows sent to a switch to fix a consistency problem.',
+    ('check', 'dpid'))
+CONSISTENCY_REPAIRS_AVOIDED = REGISTRY.counter(
+    'flow_manager_consistency_repairs_avoided_total',
+    'Number of repairs not sent because the flow was sent to the switch '
+    'within the grace window.', ('check', 'dpid'))
+ERRORS_RECEIVED = REGISTRY.counter(
+    'flow_manager_errors_received_total',
+    'Number of OpenFlow errors received from a switch.', ('dpid',))
+HANDLE_ERRORS_SECONDS = REGISTRY.histogram(
+    'flow_manager_handle_errors_seconds',
+    'Time spent handling an OpenFlow error.')
+LIST_SECONDS = REGISTRY.histogram(
+    'flow_manager_list_seconds',
+    'Time spent listing the flows of the switches.')
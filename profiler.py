@@ -0,0 +1,126 @@
+"""Sampling profiler of the threads running flow_manager code.
+
+The profiler samples the stacks of all threads at a fixed interval, with
+``sys._current_frames``, and keeps only the stacks that have at least one
+frame of this NApp. These are the threads of the event handlers, such as
+``event_flows_install_delete`` and ``on_flow_stats_check_consistency``, and
+of the REST handlers. The stacks are aggregated by function or written in the
+collapsed format used by flamegraph tools.
+"""
+import os
+import sys
+import time
+from collections import Counter
+from threading import Event, Lock, Thread, get_ident
+
+NAPP_PATH = os.path.dirname(os.path.abspath(__file__))
+
+
+def _frame_name(code):
+    """Return the name of the function of a frame in the stacks."""
+    filename = os.path.basename(code.co_filename)
+    return f'{code.co_name} ({filename}:{code.co_firstlineno})'
+
+
+class SamplingProfiler:
+    """Sample the stacks of the flow_manager threads in background."""
+
+    def __init__(self, path=NAPP_PATH):
+        """Create a profiler of the threads running code under ``path``."""
+        self.path = path
+        self.interval = None
+        self.stacks = Counter()
+        self.samples = 0
+        self.started_at = None
+        self.stopped_at = None
+        self._lock = Lock()
+        self._stop_event = Event()
+        self._thread = None
+
+    def is_running(self):
+        """Return True if the profiler is sampling the threads."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval, duration):
+        """Start sampling every ``interval`` seconds, during ``duration``.
+
+        The results of the previous capture are discarded. Return False if
+        the profiler is already running.
+        """
+        with self._lock:
+            if self.is_running():
+                return False
+            self.interval = interval
+            self.stacks = Counter()
+            self.samples = 0
+            self.started_at = time.time()
+            self.stopped_at = None
+            self._stop_event.clear()
+            self._thread = Thread(target=self._run, args=(interval, duration),
+                                  name='flow_manager_profiler', daemon=True)
+            self._thread.start()
+        return True
+
+    def stop(self):
+        """Stop sampling and wait for the sampling thread."""
+        with self._lock:
+            thread = self._thread
+            self._stop_event.set()
+        if thread is not None and thread.ident != get_ident():
+            thread.join()
+
+    def _run(self, interval, duration):
+        """Sample the threads until the profiler is stopped or times out."""
+        deadline = time.monotonic() + duration
+        while (not self._stop_event.wait(interval)
+               and time.monotonic() < deadline):
+            self._sample()
+        self.stopped_at = time.time()
+
+    def _sample(self):
+        """Count the stacks of the threads running code of the NApp."""
+        ignored = get_ident()
+        # pylint: disable=protected-access
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == ignored:
+                continue
+            stack = []
+            in_napp = False
+            while frame is not None:
+                code = frame.f_code
+                in_napp = in_napp or code.co_filename.startswith(self.path)
+                stack.append(_frame_name(code))
+                frame = frame.f_back
+            if in_napp:
+                self.stacks[tuple(reversed(stack))] += 1
+        self.samples += 1
+
+    def collapsed(self):
+        """Return the sampled stacks in the collapsed stack format.
+
+        Each line has the functions of a stack, from the outermost, separated
+        by semicolons, followed by the number of times it was sampled.
+        """
+        return ''.join(f"{';'.join(stack)} {count}\n"
+                       for stack, count in self.stacks.most_common())
+
+    def stats(self, limit=None):
+        """Return the number of samples of each function.
+
+        ``self`` counts the samples where the function was running and
+        ``total`` the samples where it was in the stack.
+        """
+        self_counts = Counter()
+        total_counts = Counter()
+        for stack, count in self.stacks.items():
+            self_counts[stack[-1]] += count
+            for name in set(stack):
+                total_counts[name] += count
+        functions = [{'function': name, 'self': self_counts[name],
+                      'total': total}
+                     for name, total in total_counts.most_common(limit)]
+        return {'started_at': self.started_at,
+                'stopped_at': self.stopped_at,
+                'interval': self.interval,
+                'samples': self.samples,
+                'functions': functions}
@@ -0,0 +1,171 @@
+"""Adaptive scheduling of the consistency checks of the switches.
+
+Without the scheduler, every flow stats reply triggers a full consistency
+check of the switch. With it, a switch is checked less often after each check
+without changes of its stored flows or repairs, doubling its interval up to a
+maximum, and even less often if it has many flows. A switch whose stored flows
+changed is checked again at its next flow stats. The time spent in the checks
+of all switches is limited by a budget per stats interval, the switches not
+checked because of the budget are checked first in the next interval: the
+cost of their last checks is reserved for them, so the other switches are
+checked only with the rest of the budget until they are.
+"""
+import time
+from threading import Lock
+
+
+class SwitchSchedule:
+    """Consistency check schedule of a switch."""
+
+    def __init__(self, now):
+        """Create the schedule of a switch due to be checked at ``now``."""
+        self.next_check = now
+        self.last_check = None
+        self.last_change = None
+        self.interval = None
+        self.cost = None
+        self.flows = None
+        self.changes = 0
+        self.stable_checks = 0
+
+    def as_dict(self):
+        """Return the schedule as a dictionary."""
+        return {'next_check': self.next_check,
+                'last_check': self.last_check,
+                'last_change': self.last_change,
+                'interval': self.interval,
+                'cost': self.cost,
+                'flows': self.flows,
+                'changes': self.changes,
+                'stable_checks': self.stable_checks}
+
+
+class ConsistencyScheduler:
+    """Decide when the consistency of each switch is checked."""
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, interval, max_interval, large_switch_flows, budget,
+                 enabled=True, clock=time.time):
+        """Create a scheduler for flow stats received every ``interval``.
+
+        Args:
+            interval: Seconds between the flow stats of a switch.
+            max_interval: Maximum seconds between the checks of a switch.
+            large_switch_flows: Number of flows of a switch that makes its
+                checks less frequent.
+            budget: Seconds of checks allowed per interval, 0 for no limit.
+            enabled: If False, every switch is always due to be checked.
+            clock: Function returning the current time in seconds.
+        """
+        self.interval = interval
+        self.max_interval = max_interval
+        self.large_switch_flows = large_switch_flows
+        self.budget = budget
+        self.enabled = enabled
+        self._clock = clock
+        self._schedules = {}
+        self._window_start = clock()
+        self._spent = 0.0
+        # Switches not checked because of the budget in the current window
+        # and, in the previous one, the switches to be checked first.
+        self._skipped = set()
+        self._deferred = set()
+        self._lock = Lock()
+
+    def _schedule(self, dpid):
+        """Return the schedule of a switch, created if needed."""
+        schedule = self._schedules.get(dpid)
+        if schedule is None:
+            schedule = self._schedules[dpid] = SwitchSchedule(self._clock())
+        return schedule
+
+    def _renew_window(self, now):
+        """Start a new budget window if the current one is over."""
+        if now - self._window_start >= self.interval:
+            self._window_start = now
+            self._spent = 0.0
+            self._deferred = self._skipped
+            self._skipped = set()
+
+    def _reserved(self):
+        """Return the seconds of budget reserved for deferred switches."""
+        return sum(self._schedules[dpid].cost or 0.0
+                   for dpid in self._deferred)
+
+    def is_due(self, dpid):
+        """Return True if the switch must be checked now."""
+        if not self.enabled:
+            return True
+        with self._lock:
+            now = self._clock()
+            # The stats of a switch are not received at exact intervals, so
+            # a check due up to half an interval later is already run.
+            if self._schedule(dpid).next_check - self.interval / 2 > now:
+                return False
+            self._renew_window(now)
+            if not self.budget:
+                return True
+            budget = self.budget
+            if dpid not in self._deferred:
+                budget -= self._reserved()
+            if self._spent < budget:
+                return True
+            self._skipped.add(dpid)
+            return False
+
+    def checked(self, dpid, cost, flows, repairs):
+        """Schedule the next check of a switch after a check.
+
+        Args:
+            dpid: Switch checked.
+            cost: Seconds spent checking the switch.
+            flows: Number of flows installed in the switch.
+            repairs: Number of flows repaired by the check.
+        """
+        with self._lock:
+            now = self._clock()
+            self._renew_window(now)
+            self._spent += cost
+            self._deferred.discard(dpid)
+            schedule = self._schedule(dpid)
+            if repairs or schedule.changes:
+                schedule.stable_checks = 0
+            elif schedule.interval is None or \
+                    schedule.interval < self.max_interval:
+                schedule.stable_checks += 1
+            schedule.changes = 0
+            schedule.cost = cost
+            schedule.flows = flows
+            schedule.last_check = now
+            schedule.interval = self._next_interval(schedule)
+            schedule.next_check = now + schedule.interval
+
+    def changed(self, dpid):
+        """Check a switch at its next flow stats, since its flows changed."""
+        with self._lock:
+            now = self._clock()
+            schedule = self._schedule(dpid)
+            schedule.changes += 1
+            schedule.last_change = now
+            schedule.stable_checks = 0
+            schedule.next_check = min(schedule.next_check, now)
+
+    def _next_interval(self, schedule):
+        """Return the seconds until the next check of a switch."""
+        if not schedule.stable_checks:
+            return self.interval
+        factor = 2 ** schedule.stable_checks
+        factor *= 1 + schedule.flows // self.large_switch_flows
+        return min(self.interval * factor, self.max_interval)
+
+    def as_dict(self):
+        """Return the schedules of all switches and the budget spent."""
+        with self._lock:
+            return {'enabled': self.enabled,
+                    'budget': self.budget,
+                    'spent': self._spent,
+                    'window_start': self._window_start,
+                    'deferred': sorted(self._deferred),
+                    'switches': {dpid: schedule.as_dict()
+                                 for dpid, schedule in
+                                 self._schedules.items()}}
@@ -1,9 +1,81 @@
 """Abstract class for serializing flows."""
+import re
 from abc import ABC, abstractmethod
+from functools import partial
+from struct import Struct
 
+from pyof.v0x01.common.header import Type
 from pyof.v0x01.controller2switch.flow_mod import \
     FlowModCommand as CommonFlowModCommand
 
+# Values of the address match fields, the IPv4 address with a netmask
+_OCTET = r'(25[0-5]|2[0-4][0-9]|1[0-9][0-9]|[1-9]?[0-9])'
+HW_ADDRESS = re.compile(r'[0-9a-fA-F]{2}(:[0-9a-fA-F]{2}){5}')
+IPV4_ADDRESS = re.compile(_OCTET + r'(\.' + _OCTET + r'){3}'
+                          r'(/([0-9]|[12][0-9]|3[0-2]))?')
+
+
+def is_uint(value, max_value):
+    """Return True if value is an integer from 0 to max_value."""
+    return (isinstance(value, int) and not isinstance(value, bool)
+            and 0 <= value <= max_value)
+
+
+class PackedHeader:
+    """Header attributes of a buffer of packed messages, used for logging."""
+
+    __slots__ = ('version', 'message_type', 'xid')
+
+    def __init__(self, version, message_type, xid):
+        """Create the header of the first message in the buffer."""
+        self.version = version
+        self.message_type = message_type
+        self.xid = xid
+
+
+class PackedFlowMods:
+    """FlowMod messages already packed in a single buffer.
+
+    It can be sent in a ``messages.out`` event like any other message, the
+    header is the header of the first FlowMod in the buffer.
+    """
+
+    # Length and xid of the OpenFlow header of each FlowMod
+    LENGTH_STRUCT = Struct('!H')
+    XID_STRUCT = Struct('!I')
+
+    def __init__(self, version, buffer, xids):
+        """Create a message from the buffer and the xids of its FlowMods."""
+        self.header = PackedHeader(version, Type.OFPT_FLOW_MOD,
+                                   xids[0] if xids else None)
+        self.buffer = buffer
+        self.xids = xids
+
+    @classmethod
+    def from_messages(cls, version, flow_mods):
+        """Return FlowMod objects packed in a single buffer."""
+        buffer = bytearray(b''.join(flow_mod.pack() for flow_mod in flow_mods))
+        xids = [int(flow_mod.header.xid) for flow_mod in flow_mods]
+        return cls(version, buffer, xids)
+
+    def with_xids(self, xids):
+        """Return a copy of the FlowMods with new xids.
+
+        Only the xids are written in the copy of the buffer, so the same
+        FlowMods can be sent to many switches of the same version.
+        """
+        buffer = bytearray(self.buffer)
+        offset = 0
+        for xid in xids:
+            length, = self.LENGTH_STRUCT.unpack_from(buffer, offset + 2)
+            self.XID_STRUCT.pack_into(buffer, offset + 4, xid)
+            offset += length
+        return PackedFlowMods(self.header.version, buffer, xids)
+
+    def pack(self):
+        """Return the packed FlowMods."""
+        return bytes(self.buffer)
+
 
 class FlowSerializer(ABC):
     """Common code for OF 1.0 and 1.3 flow serialization.
@@ -15,11 +87,160 @@ class FlowSerializer(ABC):
     # These values are the same in both versions 1.0 and 1.3
     OFPFC_ADD = CommonFlowModCommand.OFPFC_ADD
     OFPFC_DELETE = CommonFlowModCommand.OFPFC_DELETE
+    OFPFC_DELETE_STRICT = CommonFlowModCommand.OFPFC_DELETE_STRICT
+
+    # Commands of this NApp and their FlowMod commands
+    COMMANDS = {'add': OFPFC_ADD,
+                'delete': OFPFC_DELETE,
+                'delete_strict': OFPFC_DELETE_STRICT}
+
+    # OpenFlow version and size of FlowMods without match and actions
+    VERSION = None
+    FLOW_MOD_SIZE = None
+
+    # Maximum number of items in each cache of match fields and actions
+    CACHE_MAX_SIZE = 4096
+
+    # Largest value of the integer fields of a flow, of the integer match
+    # fields and of the output port
+    ATTRIBUTE_MAX_VALUES = {'priority': 0xffff, 'idle_timeout': 0xffff,
+                            'hard_timeout': 0xffff,
+                            'cookie': 0xffffffffffffffff}
+    MATCH_MAX_VALUES = {}
+    PORT_MAX_VALUE = None
 
     def __init__(self):
         """Initialize common attributes of 1.0 and 1.3 versions."""
         self.flow_attributes = set(('priority', 'idle_timeout', 'hard_timeout',
                                     'cookie'))
+        # Flows usually share most of their match fields and actions, so the
+        # objects created for them are reused by the next FlowMods.
+        self._match_cache = {}
+        self._action_cache = {}
+        self._packed_cache = {}
+
+    def _cached(self, cache, key, factory):
+        """Return the cached value of key, creating it with factory.
+
+        Values with unhashable keys are created but not cached. The cache is
+        cleared when it is full.
+        """
+        try:
+            return cache[key]
+        except KeyError:
+            pass
+        except TypeError:
+            return factory()
+        if len(cache) >= self.CACHE_MAX_SIZE:
+            cache.clear()
+        value = cache[key] = factory()
+        return value
+
+    @staticmethod
+    def _action_key(action):
+        """Return a hashable key for an action dictionary."""
+        return tuple(sorted(action.items()))
+
+    def can_pack(self, dictionary):
+        """Return True if pack_flow_mods supports all fields of a flow.
+
+        The values of the fields are checked too, the flows with values not
+        supported are left to the FlowMods created by of_core. So are the
+        flows without a priority, which get the default priority of of_core.
+        """
+        fields = self.flow_attributes | {'match', 'actions'}
+        if 'priority' not in dictionary or not dictionary.keys() <= fields:
+            return False
+        match = dictionary.get('match', {})
+        actions = dictionary.get('actions', [])
+        if not isinstance(match, dict) or not isinstance(actions, list):
+            return False
+        return (all(is_uint(dictionary[field], max_value)
+                    for field, max_value in self.ATTRIBUTE_MAX_VALUES.items()
+                    if field in dictionary)
+                and all(field in self.match_fields
+                        and self._can_pack_match_value(field, value)
+                        for field, value in match.items())
+                and all(isinstance(action, dict)
+                        and self._can_pack_action(action)
+                        for action in actions))
+
+    def _can_pack_match_value(self, field, value):
+        """Return True if the value of a match field can be packed."""
+        if field in self.MATCH_MAX_VALUES:
+            return is_uint(value, self.MATCH_MAX_VALUES[field])
+        if field in ('dl_src', 'dl_dst'):
+            return isinstance(value, str) and bool(HW_ADDRESS.fullmatch(value))
+        return isinstance(value, str) and bool(IPV4_ADDRESS.fullmatch(value))
+
+    def _can_pack_action(self, action):
+        """Return True if an action dictionary can be packed."""
+        action_type = action.get('action_type')
+        if action_type not in self.action_types:
+            return False
+        if action_type == 'output':
+            port = action.get('port')
+            return port == 'controller' or is_uint(port, self.PORT_MAX_VALUE)
+        if action_type == 'set_vlan':
+            return is_uint(action.get('vlan_id'), 4095)
+        if action_type == 'push_vlan':
+            return 'tag_type' in action
+        return True
+
+    def pack_flow_mods(self, flows, command, xids):
+        """Return FlowMods of flow dictionaries packed in a single buffer.
+
+        The FlowMods are packed directly from the dictionaries, without
+        creating FlowMod objects, and they are the same FlowMods returned by
+        ``from_dict``. Only flows accepted by ``can_pack`` are supported.
+
+        Args:
+            flows: List of flow dictionaries.
+            command: One of the keys of ``COMMANDS``.
+            xids: List with the xid of each FlowMod.
+        """
+        command = self.COMMANDS[command]
+        bodies = [(flow, self._packed_match(flow.get('match', {})),
+                   self._packed_actions(flow.get('actions', [])))
+                  for flow in flows]
+        buffer = bytearray(sum(self.FLOW_MOD_SIZE + len(match) + len(actions)
+                               for _, match, actions in bodies))
+        offset = 0
+        for xid, (flow, match, actions) in zip(xids, bodies):
+            length = self.FLOW_MOD_SIZE + len(match) + len(actions)
+            self._pack_flow_mod_into(buffer, offset, length, xid, command,
+                                     flow, match)
+            offset += length
+            buffer[offset - len(actions):offset] = actions
+        return PackedFlowMods(self.VERSION, buffer, xids)
+
+    def _packed_actions(self, action_list):
+        """Return the packed actions of a list of action dictionaries."""
+        return b''.join(
+            self._cached(self._packed_cache,
+                         ('action', self._action_key(action)),
+                         partial(self._pack_action, action))
+            for action in action_list)
+
+    def _pack_action(self, action):
+        """Return the packed action of an action dictionary."""
+        new_action = self._cached(self._action_cache,
+                                  self._action_key(action),
+                                  partial(self._action_from_dict, action))
+        return new_action.pack() if new_action is not None else b''
+
+    @abstractmethod
+    def _packed_match(self, dictionary):
+        """Return the packed match of a match dictionary."""
+
+    @abstractmethod
+    def _pack_flow_mod_into(self, buffer, offset, length, xid, command,
+                            flow, match):
+        """Pack a FlowMod without its actions into buffer at offset."""
+
+    @abstractmethod
+    def _action_from_dict(self, action):
+        """Return the action of an action dictionary."""
 
     @abstractmethod
     def from_dict(self, dictionary):
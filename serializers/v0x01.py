@@ -1,7 +1,13 @@
 """Flow serializer for OF 1.0."""
+import struct
+from functools import partial
+
 from pyof.v0x01.common.action import ActionOutput, ActionType, ActionVlanVid
+from pyof.v0x01.common.constants import NO_BUFFER
+from pyof.v0x01.common.flow_match import Match
+from pyof.v0x01.common.header import Type
 from pyof.v0x01.common.phy_port import Port
-from pyof.v0x01.controller2switch.flow_mod import FlowMod
+from pyof.v0x01.controller2switch.flow_mod import FlowMod, FlowModFlags
 
 from napps.kytos.flow_manager.serializers.base import FlowSerializer
 
@@ -9,6 +15,17 @@ from napps.kytos.flow_manager.serializers.base import FlowSerializer
 class FlowSerializer10(FlowSerializer):
     """Flow serializer for OpenFlow 1.0."""
 
+    VERSION = 0x01
+    # Header, fixed-size match and the fields after the match
+    HEADER_STRUCT = struct.Struct('!BBHI')
+    FIELDS_STRUCT = struct.Struct('!QHHHHIHH')
+    MATCH_SIZE = 40
+    FLOW_MOD_SIZE = HEADER_STRUCT.size + FIELDS_STRUCT.size
+    MATCH_MAX_VALUES = {'in_port': 0xffff, 'dl_vlan': 0xffff,
+                        'dl_vlan_pcp': 0xff, 'dl_type': 0xffff,
+                        'nw_proto': 0xff}
+    PORT_MAX_VALUE = 0xffff
+
     def __init__(self):
         """Initialize OF 1.0 specific variables."""
         super().__init__()
@@ -22,6 +39,12 @@ class FlowSerializer10(FlowSerializer):
             'nw_src',
             'nw_dst',
             'nw_proto'))
+        self.action_types = {'set_vlan', 'output'}
+
+    @property
+    def match_fields(self):
+        """Return the match fields supported by this serializer."""
+        return self.match_attributes
 
     def from_dict(self, dictionary):
         """Return an OF 1.0 FlowMod message from serialized dictionary."""
@@ -36,29 +59,63 @@ class FlowSerializer10(FlowSerializer):
                 flow_mod.actions.extend(actions)
         return flow_mod
 
+    def _packed_match(self, dictionary):
+        """Return the packed match of a match dictionary."""
+        key = tuple(sorted((field, data) for field, data in dictionary.items()
+                           if field in self.match_attributes))
+        return self._cached(self._packed_cache, ('match', key),
+                            partial(self._pack_match, dictionary))
+
+    def _pack_match(self, dictionary):
+        """Return a packed OF 1.0 Match created from a match dictionary."""
+        match = Match()
+        self._update_match(match, dictionary)
+        return match.pack()
+
+    def _pack_flow_mod_into(self, buffer, offset, length, xid, command,
+                            flow, match):
+        """Pack an OF 1.0 FlowMod without its actions into buffer."""
+        self.HEADER_STRUCT.pack_into(buffer, offset, self.VERSION,
+                                     Type.OFPT_FLOW_MOD, length, xid)
+        offset += self.HEADER_STRUCT.size
+        buffer[offset:offset + len(match)] = match
+        offset += len(match)
+        self.FIELDS_STRUCT.pack_into(buffer, offset,
+                                     flow.get('cookie', 0), command,
+                                     flow.get('idle_timeout', 0),
+                                     flow.get('hard_timeout', 0),
+                                     flow.get('priority', 0), NO_BUFFER,
+                                     Port.OFPP_NONE,
+                                     FlowModFlags.OFPFF_SEND_FLOW_REM)
+
     def _update_match(self, match, dictionary):
         """Update match attributes found in dictionary."""
         for field, data in dictionary.items():
             if field in self.match_attributes:
                 setattr(match, field, data)
 
-    @staticmethod
-    def _actions_from_list(action_list):
+    def _actions_from_list(self, action_list):
         """Return actions found in the action list."""
         actions = []
         for action in action_list:
-            if action['action_type'] == 'set_vlan':
-                new_action = ActionVlanVid(vlan_id=action['vlan_id'])
-            elif action['action_type'] == 'output':
-                if action['port'] == 'controller':
-                    new_action = ActionOutput(port=Port.OFPP_CONTROLLER)
-                else:
-                    new_action = ActionOutput(port=action['port'])
-            else:
-                continue
-            actions.append(new_action)
+            new_action = self._cached(self._action_cache,
+                                      self._action_key(action),
+                                      partial(self._action_from_dict, action))
+            if new_action is not None:
+                actions.append(new_action)
         return actions
 
+    @staticmethod
+    def _action_from_dict(action):
+        """Return the action of a dictionary or None if not supported."""
+        if action['action_type'] == 'set_vlan':
+            return ActionVlanVid(vlan_id=action['vlan_id'])
+        if action['action_type'] == 'output':
+            if action['port'] == 'controller':
+                return ActionOutput(port=Port.OFPP_CONTROLLER)
+            return ActionOutput(port=action['port'])
+        return None
+
     def to_dict(self, flow_stats):
         """Return a dictionary created from OF 1.0 FlowStats."""
         flow_dict = {field: data.value
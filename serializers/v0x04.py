@@ -1,23 +1,50 @@
 """Flow serializer for OF 1.3."""
+import re
+import struct
+from functools import partial
 from itertools import chain
 
 from pyof.foundation.basic_types import HWAddress, IPAddress
 from pyof.foundation.network_types import EtherType
 from pyof.v0x04.common.action import (ActionOutput, ActionPopVLAN, ActionPush,
                                       ActionSetField, ActionType)
+from pyof.v0x04.common.constants import OFP_NO_BUFFER
 from pyof.v0x04.common.flow_instructions import InstructionApplyAction
 from pyof.v0x04.common.flow_instructions import InstructionType as IType
-from pyof.v0x04.common.flow_match import OxmOfbMatchField, OxmTLV, VlanId
+from pyof.v0x04.common.flow_match import (MatchType, OxmOfbMatchField, OxmTLV,
+                                          VlanId)
+from pyof.v0x04.common.header import Type
 from pyof.v0x04.common.port import PortNo
-from pyof.v0x04.controller2switch.flow_mod import FlowMod
+from pyof.v0x04.controller2switch.flow_mod import FlowMod, FlowModFlags
+from pyof.v0x04.controller2switch.group_mod import Group
 
-from napps.kytos.flow_manager.serializers.base import FlowSerializer
+from napps.kytos.flow_manager.serializers.base import (HW_ADDRESS,
+                                                       FlowSerializer, is_uint)
+
+# "vid/mask" value of a dl_vlan match field
+VLAN_MASK = re.compile(r'([0-9]+)/([0-9]+)')
 
 
 # pylint: disable=too-many-return-statements, inconsistent-return-statements
 class FlowSerializer13(FlowSerializer):
     """Flow serializer for OpenFlow 1.3."""
 
+    VERSION = 0x04
+    # Header and fixed fields, the match header and the instruction header
+    FLOW_MOD_STRUCT = struct.Struct('!BBHIQQBBHHHIIIH2x')
+    MATCH_STRUCT = struct.Struct('!HH')
+    INSTRUCTION_STRUCT = struct.Struct('!HH4x')
+    FLOW_MOD_SIZE = FLOW_MOD_STRUCT.size
+    MATCH_MAX_VALUES = {'in_port': 0xffffffff, 'dl_vlan_pcp': 0xff,
+                        'dl_type': 0xffff, 'nw_proto': 0xff}
+    PORT_MAX_VALUE = 0xffffffff
+    # Order of the OXM fields in the FlowMods of of_core, which follows the
+    # attributes of its Match instead of the order of the match dictionary
+    MATCH_FIELDS_ORDER = ('in_port', 'dl_src', 'dl_dst', 'dl_vlan',
+                          'dl_vlan_pcp', 'dl_type', 'nw_proto', 'nw_src',
+                          'nw_dst')
+    NO_HW_ADDRESS_MASK = 'FF:FF:FF:FF:FF:FF'
+
     def __init__(self):
         """Initialize OF 1.3 specific variables."""
         super().__init__()
@@ -33,6 +60,14 @@ class FlowSerializer13(FlowSerializer):
             'nw_proto': OxmOfbMatchField.OFPXMT_OFB_IP_PROTO}
         # Invert match_values index
         self._match_values = {b: a for a, b in self._match_names.items()}
+        self._match_order = {name: index for index, name
+                             in enumerate(self.MATCH_FIELDS_ORDER)}
+        self.action_types = {'set_vlan', 'output', 'push_vlan', 'pop_vlan'}
+
+    @property
+    def match_fields(self):
+        """Return the match fields supported by this serializer."""
+        return self._match_names.keys()
 
     def from_dict(self, dictionary):
         """Return an OF 1.0 FlowMod message from serialized dictionary."""
@@ -53,31 +88,119 @@ class FlowSerializer13(FlowSerializer):
         return flow_mod
 
     def _match_from_dict(self, dictionary):
-        known_fields = ((field, data) for field, data in dictionary.items()
-                        if field in self._match_names)
-        for field_name, data in known_fields:
-            tlv = OxmTLV()
-            tlv.oxm_field = self._match_names[field_name]
-            # set oxm_value
-            if field_name in ('dl_vlan_pcp', 'nw_proto'):
-                tlv.oxm_value = data.to_bytes(1, 'big')
-            elif field_name == 'dl_vlan':
-                vid = data | VlanId.OFPVID_PRESENT
-                tlv.oxm_value = vid.to_bytes(2, 'big')
-            elif field_name in ('dl_src', 'dl_dst'):
-                tlv.oxm_value = HWAddress(data).pack()
-            elif field_name in ('nw_src', 'nw_dst'):
-                tlv.oxm_value = IPAddress(data).pack()
-            elif field_name == 'in_port':
-                tlv.oxm_value = data.to_bytes(4, 'big')
+        for field_name, data in self._known_match_fields(dictionary):
+            yield self._cached_match_tlv(field_name, data)
+
+    def _known_match_fields(self, dictionary):
+        """Return the supported (field, data) pairs in the OXM order."""
+        return sorted(((field, data) for field, data in dictionary.items()
+                       if field in self._match_names),
+                      key=lambda item: self._match_order.get(item[0], 0))
+
+    def _can_pack_match_value(self, field, value):
+        """Return True if the value of a match field can be packed.
+
+        VLAN ids may be a "vid/mask" string and hardware addresses may have a
+        mask, as in the match fields of of_core.
+        """
+        if field == 'dl_vlan':
+            if is_uint(value, 4095):
+                return True
+            masked = isinstance(value, str) and VLAN_MASK.fullmatch(value)
+            return bool(masked) and all(0 < int(part) <= 0x1fff
+                                        for part in masked.groups())
+        if field in ('dl_src', 'dl_dst') and isinstance(value, str):
+            address, _, mask = value.partition('/')
+            return bool(HW_ADDRESS.fullmatch(address)
+                        and (not mask or HW_ADDRESS.fullmatch(mask)))
+        return super()._can_pack_match_value(field, value)
+
+    def _cached_match_tlv(self, field_name, data):
+        """Return the cached OxmTLV of a match field."""
+        return self._cached(self._match_cache, (field_name, data),
+                            partial(self._match_tlv, field_name, data))
+
+    def _pack_match_tlv(self, field_name, data):
+        """Return the packed OxmTLV of a match field."""
+        return self._cached_match_tlv(field_name, data).pack()
+
+    def _packed_match(self, dictionary):
+        """Return the packed OXM match of a match dictionary."""
+        oxm_fields = b''.join(
+            self._cached(self._packed_cache, ('match', field_name, data),
+                         partial(self._pack_match_tlv, field_name, data))
+            for field_name, data in self._known_match_fields(dictionary))
+        length = self.MATCH_STRUCT.size + len(oxm_fields)
+        # The match is padded to a multiple of 8 bytes
+        return (self.MATCH_STRUCT.pack(MatchType.OFPMT_OXM, length)
+                + oxm_fields + bytes(-length % 8))
+
+    def _packed_actions(self, action_list):
+        """Return the packed instruction with the actions of a list."""
+        actions = super()._packed_actions(action_list)
+        length = self.INSTRUCTION_STRUCT.size + len(actions)
+        return (self.INSTRUCTION_STRUCT.pack(IType.OFPIT_APPLY_ACTIONS,
+                                             length) + actions)
+
+    def _pack_flow_mod_into(self, buffer, offset, length, xid, command,
+                            flow, match):
+        """Pack an OF 1.3 FlowMod without its instructions into buffer."""
+        self.FLOW_MOD_STRUCT.pack_into(buffer, offset, self.VERSION,
+                                       Type.OFPT_FLOW_MOD, length, xid,
+                                       flow.get('cookie', 0), 0, 0, command,
+                                       flow.get('idle_timeout', 0),
+                                       flow.get('hard_timeout', 0),
+                                       flow.get('priority', 0), OFP_NO_BUFFER,
+                                       PortNo.OFPP_ANY, Group.OFPG_ANY,
+                                       FlowModFlags.OFPFF_SEND_FLOW_REM)
+        offset += self.FLOW_MOD_SIZE
+        buffer[offset:offset + len(match)] = match
+
+    def _match_tlv(self, field_name, data):
+        """Return the OxmTLV of a match field.
+
+        The value is followed by its mask, if any, like in the OXM fields
+        of of_core: "vid/mask" VLAN ids, "address/mask" hardware addresses
+        and IPv4 addresses with a netmask.
+        """
+        tlv = OxmTLV()
+        tlv.oxm_field = self._match_names[field_name]
+        mask = None
+        # set oxm_value
+        if field_name in ('dl_vlan_pcp', 'nw_proto'):
+            value = data.to_bytes(1, 'big')
+        elif field_name == 'dl_vlan':
+            if isinstance(data, str) and '/' in data:
+                vid, mask = (int(part) | VlanId.OFPVID_PRESENT
+                             for part in data.split('/'))
+                mask = mask.to_bytes(2, 'big')
             else:
-                tlv.oxm_value = data.to_bytes(2, 'big')
-            yield tlv
+                vid = int(data) | VlanId.OFPVID_PRESENT
+            value = vid.to_bytes(2, 'big')
+        elif field_name in ('dl_src', 'dl_dst'):
+            address, _, hw_mask = data.partition('/')
+            value = HWAddress(address).pack()
+            if hw_mask and hw_mask.upper() != self.NO_HW_ADDRESS_MASK:
+                mask = HWAddress(hw_mask).pack()
+        elif field_name in ('nw_src', 'nw_dst'):
+            address = IPAddress(data)
+            value = address.pack()
+            if address.netmask < 32:
+                bits = 0xffffffff << (32 - address.netmask) & 0xffffffff
+                mask = bits.to_bytes(4, 'big')
+        elif field_name == 'in_port':
+            value = data.to_bytes(4, 'big')
+        else:
+            value = data.to_bytes(2, 'big')
+        tlv.oxm_hasmask = mask is not None
+        tlv.oxm_value = value + mask if mask else value
+        return tlv
 
-    @classmethod
-    def _actions_from_list(cls, action_list):
+    def _actions_from_list(self, action_list):
         for action in action_list:
-            new_action = cls._action_from_dict(action)
+            new_action = self._cached(self._action_cache,
+                                      self._action_key(action),
+                                      partial(self._action_from_dict, action))
             if new_action:
                 yield new_action
 
@@ -11,3 +11,105 @@ ENABLE_CONSISTENCY_CHECK = True
 # To filter by a cookie or `table_id` range [(value1, value2)]
 CONSISTENCY_COOKIE_IGNORED_RANGE = []
 CONSISTENCY_TABLE_ID_IGNORED_RANGE = []
+
+# Encoding of the list of flows persisted for each switch in storehouse:
+# 'dict' saves the list of flows as dictionaries (original format) and
+# 'zlib_json' saves it as compressed JSON. Flows saved with any of these
+# encodings are loaded, so this value can be changed at any time.
+FLOW_LIST_ENCODING = 'dict'
+
+# Path of the local snapshot file of the stored flows, used to restore them
+# on restart before they are retrieved from storehouse. Set it to None to
+# disable the snapshot.
+FLOW_SNAPSHOT_PATH = None
+
+# Compare the installed and stored flows in the consistency check using NumPy
+# arrays of flow identities (table_id, priority, cookie, timeouts, match and
+# actions).
+# Requires NumPy, recommended for switches with a large number of flows.
+ENABLE_VECTORIZED_CONSISTENCY = False
+
+# Pack the FlowMods of requests with at least BULK_PACKING_MIN_FLOWS flows
+# directly into a single buffer per switch, instead of creating a FlowMod
+# object and an event for each flow. Only flows with the fields described in
+# the README (without table_id) are packed, other requests are sent as usual.
+ENABLE_BULK_PACKING = False
+BULK_PACKING_MIN_FLOWS = 100
+
+# Interval, in seconds, between the samples of the profiler started through
+# the v2/profiler/start endpoint, and the maximum duration of a capture.
+PROFILER_INTERVAL = 0.01
+PROFILER_MAX_DURATION = 60
+
+# Number of jobs of asynchronous requests (made with ?async=true) whose
+# status is kept to be returned by the v2/jobs/<job_id> endpoint.
+JOBS_MAX_SIZE = 1000
+
+# Send a BarrierRequest to each switch after the FlowMods of a request, and
+# report in the v2/jobs/<job_id> endpoint the FlowMods confirmed by the reply
+# of the switch. When enabled, every request returns the id of its job.
+ENABLE_BARRIER_TRACKING = False
+
+# Number of threads that install flows in parallel in different switches,
+# keeping the order of the flows sent to each switch. With 0, the flows are
+# installed in the switches one after the other, by the calling thread.
+SWITCH_WORKERS = 0
+
+# Build the FlowMods of a request for many switches once per OpenFlow version,
+# and send a copy with new xids to each switch, instead of creating the Flow
+# objects and FlowMods again for each switch.
+ENABLE_FAN_OUT = False
+
+# Check the consistency of a switch less often after each check without
+# repairs or changes of its stored flows, doubling the interval up to
+# CONSISTENCY_MAX_INTERVAL seconds, and even less often if it has more than
+# CONSISTENCY_LARGE_SWITCH_FLOWS flows. A switch whose stored flows changed
+# is checked at its next flow stats. The checks of all switches take at most
+# CONSISTENCY_TIME_BUDGET seconds per STATS_INTERVAL, 0 for no limit, and
+# the switches skipped because of it are checked first in the next interval.
+# The next checks are returned by the v2/consistency/schedule endpoint.
+ENABLE_ADAPTIVE_CONSISTENCY = False
+CONSISTENCY_MAX_INTERVAL = 600
+CONSISTENCY_LARGE_SWITCH_FLOWS = 10000
+CONSISTENCY_TIME_BUDGET = 0
+
+# Seconds after a FlowMod is sent to a switch during which the consistency
+# check does not repair its flow, since the flow stats of the switch may not
+# reflect it yet. 0 disables the grace window.
+CONSISTENCY_GRACE_WINDOW = 0
+
+# Seconds during which the OpenFlow errors of a switch with the same type and
+# code are grouped, to be handled together and reported in a single
+# kytos/flow_manager.flows.error event. With 0, each error is handled when it
+# is received and reported in a kytos/flow_manager.flow.error event.
+ERRORS_AGGREGATION_WINDOW = 0
+
+# Events sent to other NApps for the FlowMods sent to the switches: a
+# kytos/flow_manager.flow.added or .flow.removed event for each flow, and a
+# kytos/flow_manager.flows.added or .flows.removed event with the flows of a
+# request sent to each switch.
+ENABLE_FLOW_NAPP_EVENTS = True
+ENABLE_BATCHED_NAPP_EVENTS = False
+
+# Do not send the FlowMods of flows added again, if they are installed in the
+# switch, according to its last flow stats received after it connected, and
+# stored with the add command.
+ENABLE_IDEMPOTENT_ADD = False
+
+# Number of flows of a request body with the application/x-ndjson content
+# type, one flow per line, sent to the switches at a time while the body is
+# still being received. The flows stored by each batch are persisted at once.
+# With barrier tracking, the FlowMods of each batch are confirmed by their own
+# BarrierRequest and counted by the job of the request.
+NDJSON_BATCH_SIZE = 1000
+
+# Compression level, from 1 (fastest) to 9 (smallest), of the flow lists sent
+# with gzip to the clients that accept it. 0 disables the compression of the
+# responses. Request bodies with the gzip content encoding are always
+# accepted.
+GZIP_COMPRESS_LEVEL = 6
+
+# Maximum size, in bytes, of a request body with the gzip content encoding
+# once decompressed, and of each line of a gzip NDJSON body. Larger bodies are
+# rejected with 413, so a small body cannot expand to fill the memory.
+GZIP_MAX_DECOMPRESSED_SIZE = 64 * 1024 * 1024
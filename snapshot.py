@@ -0,0 +1,83 @@
+"""Module to handle the local snapshot of the stored flows.
+
+The snapshot is a cache of the flows persisted in storehouse, used to restore
+the stored flows on restart without waiting for the storehouse NApp. Its
+header has a generation number and a checksum of the payload, both also saved
+in storehouse, so the snapshot can be validated against the persisted data.
+"""
+import json
+import mmap
+import os
+import struct
+import zlib
+
+from kytos.core import log
+
+
+class FlowSnapshot:
+    """Class to read and write the local snapshot file of stored flows."""
+
+    MAGIC = b'KFMSNAP1'
+    # magic, generation, payload length and payload checksum
+    HEADER = struct.Struct('!8sQQI')
+
+    def __init__(self, path):
+        """Create a snapshot client for the file in ``path``."""
+        self.path = path
+
+    @staticmethod
+    def dumps(stored_flows):
+        """Return the canonical payload of the stored flows."""
+        return json.dumps(stored_flows, sort_keys=True,
+                          separators=(',', ':')).encode('utf-8')
+
+    @classmethod
+    def checksum(cls, stored_flows):
+        """Return the checksum of the stored flows payload."""
+        return zlib.crc32(cls.dumps(stored_flows))
+
+    def save(self, generation, stored_flows):
+        """Write the snapshot file and return the payload checksum.
+
+        The file is written to a temporary path and then renamed, so a crash
+        while saving never leaves a partially written snapshot behind.
+        """
+        payload = self.dumps(stored_flows)
+        checksum = zlib.crc32(payload)
+        header = self.HEADER.pack(self.MAGIC, generation, len(payload),
+                                  checksum)
+        tmp_path = f'{self.path}.tmp'
+        try:
+            with open(tmp_path, 'wb') as snapshot_file:
+                snapshot_file.write(header)
+                snapshot_file.write(payload)
+            os.replace(tmp_path, self.path)
+        except OSError as error:
+            log.error(f'Can\'t save the flows snapshot {self.path}: {error}')
+        return checksum
+
+    def load(self):
+        """Return the generation, checksum and stored flows of the snapshot.
+
+        Return None if the snapshot does not exist or is not valid.
+        """
+        try:
+            with open(self.path, 'rb') as snapshot_file, \
+                    mmap.mmap(snapshot_file.fileno(), 0,
+                              access=mmap.ACCESS_READ) as data:
+                return self._parse(data)
+        except (OSError, ValueError) as error:
+            log.debug(f'There is no valid flows snapshot to load: {error}')
+        return None
+
+    def _parse(self, data):
+        """Validate and parse the content of a snapshot file."""
+        if len(data) < self.HEADER.size:
+            raise ValueError('Truncated snapshot header.')
+        magic, generation, size, checksum = self.HEADER.unpack_from(data)
+        if magic != self.MAGIC:
+            raise ValueError('Invalid snapshot file.')
+        payload = data[self.HEADER.size:self.HEADER.size + size]
+        if len(payload) != size or zlib.crc32(payload) != checksum:
+            raise ValueError('Snapshot checksum mismatch.')
+        return generation, checksum, json.loads(payload.decode('utf-8'))
@@ -0,0 +1,74 @@
+"""Compact representation of the flows stored by this NApp."""
+import sys
+
+from napps.kytos.flow_manager.consistency import flow_identity
+
+
+def _intern_strings(value):
+    """Return a copy of ``value`` with all strings interned.
+
+    Every stored flow repeats the same keys (``match``, ``actions``,
+    ``in_port``...) and many values (``output``, ``set_vlan``...), so
+    interning them makes all flows share one string.
+    """
+    if isinstance(value, dict):
+        return {sys.intern(key) if isinstance(key, str) else key:
+                _intern_strings(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_intern_strings(item) for item in value]
+    if isinstance(value, str):
+        return sys.intern(value)
+    return value
+
+
+class StoredFlow:
+    """A flow sent to a switch and the command used to send it.
+
+    The dictionary format ``{'command': ..., 'flow': {...}}`` is only used to
+    persist the flows, this class is used everywhere else.
+    """
+
+    __slots__ = ('command', 'flow', '_hash')
+
+    def __init__(self, command, flow):
+        """Create a stored flow from a command and a flow dictionary."""
+        self.command = sys.intern(command)
+        self.flow = _intern_strings(flow)
+        # Computed when first needed, most stored flows are never hashed
+        self._hash = None
+
+    @classmethod
+    def from_dict(cls, stored_flow):
+        """Return a StoredFlow from its persisted dictionary."""
+        return cls(stored_flow['command'], stored_flow['flow'])
+
+    def as_dict(self):
+        """Return the persisted dictionary of this stored flow."""
+        return {'command': self.command, 'flow': self.flow}
+
+    def __eq__(self, other):
+        if not isinstance(other, StoredFlow):
+            return NotImplemented
+        return self.command == other.command and self.flow == other.flow
+
+    def __hash__(self):
+        if self._hash is None:
+            self._hash = hash(flow_identity(self.flow))
+        return self._hash
+
+    def __repr__(self):
+        return f'StoredFlow({self.command!r}, {self.flow!r})'
+
+
+def stored_flows_from_dict(data):
+    """Convert the persisted flow lists of each switch to StoredFlow."""
+    return {dpid: {'flow_list': [StoredFlow.from_dict(stored_flow)
+                                 for stored_flow in entry['flow_list']]}
+            for dpid, entry in data.items()}
+
+
+def stored_flows_as_dict(stored_flows):
+    """Convert the StoredFlow lists of each switch to dictionaries."""
+    return {dpid: {'flow_list': [stored_flow.as_dict()
+                                 for stored_flow in entry['flow_list']]}
+            for dpid, entry in stored_flows.items()}
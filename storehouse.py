@@ -4,6 +4,8 @@ import time
 from kytos.core import log
 from kytos.core.events import KytosEvent
 from napps.kytos.flow_manager import settings
+from napps.kytos.flow_manager.metrics import (STOREHOUSE_SAVE_ERRORS,
+                                              STOREHOUSE_SAVE_SECONDS)
 
 DEFAULT_BOX_RESTORE_TIMER = 0.1
 BOX_RESTORE_ATTEMPTS = 10
@@ -33,14 +35,20 @@ class StoreHouse:
             self.box = None
         self.list_stored_boxes()
 
-    def get_data(self):
-        """Return the persistence box data."""
-        # Wait retrieve or create box in storehouse
+    def _wait_box(self):
+        """Wait for the box to be retrieved or created in storehouse.
+
+        Return False if the box is still missing after all the attempts.
+        """
         i = 0
         while not self.box and i < BOX_RESTORE_ATTEMPTS:
             time.sleep(self.box_restore_timer)
             i += 1
-        if not self.box:
+        return bool(self.box)
+
+    def get_data(self):
+        """Return the persistence box data."""
+        if not self._wait_box():
             error = 'Error retrieving persistence box from storehouse.'
             log.error(error)
             raise FileNotFoundError(error)
@@ -95,8 +103,17 @@ class StoreHouse:
 
         self.box = data
 
+    @STOREHOUSE_SAVE_SECONDS.time()
     def save_flow(self, flows):
-        """Save flows in storehouse."""
+        """Save flows in storehouse.
+
+        The flows loaded from the local snapshot can be changed before the
+        box is retrieved, so the box is waited for here too.
+        """
+        if not self._wait_box():
+            log.error('Flows not saved, the persistence box was not '
+                      'retrieved from storehouse.')
+            return
         self.box.data[flows['id']] = flows
         content = {'namespace': self.namespace,
                    'box_id': self.box.box_id,
@@ -109,6 +126,7 @@ class StoreHouse:
     def _save_flow_callback(self, _event, data, error):
         """Display stored flow."""
         if error:
+            STOREHOUSE_SAVE_ERRORS.inc()
             log.error(f'Can\'t update persistence box {data.box_id}.')
 
         log.info(f'Flow saved in {self.namespace}.{data.box_id}')
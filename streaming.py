@@ -0,0 +1,120 @@
+"""Incremental reading of request bodies and writing of response bodies.
+
+A request body with the ``application/x-ndjson`` content type has a JSON flow
+on each line. Its flows are parsed in batches while the body is received, so
+the first FlowMods are sent before the upload finishes and the memory used
+does not grow with the size of the body.
+
+Request bodies with the ``gzip`` content encoding are decompressed while they
+are read, up to a maximum size, and responses compressed with gzip are sent
+in chunks compressed while they are generated.
+"""
+import gzip
+import json
+import zlib
+from itertools import islice
+
+from napps.kytos.flow_manager.exceptions import (BodyTooLargeError,
+                                                 InvalidFlowStreamError)
+
+NDJSON_CONTENT_TYPE = 'application/x-ndjson'
+GZIP_ENCODING = 'gzip'
+# Errors raised while reading a stream that is not valid gzip data
+GZIP_ERRORS = (EOFError, OSError, zlib.error)
+# Bytes read at a time from a stream
+CHUNK_SIZE = 64 * 1024
+
+
+def decoded_stream(stream, content_encoding):
+    """Return a binary stream with the decoded content of ``stream``.
+
+    Raise ValueError if the content encoding is not supported.
+    """
+    content_encoding = (content_encoding or '').strip().lower()
+    if content_encoding in ('', 'identity'):
+        return stream
+    if content_encoding == GZIP_ENCODING:
+        return gzip.GzipFile(fileobj=stream, mode='rb')
+    raise ValueError(f'The content encoding must be {GZIP_ENCODING} '
+                     f'(received {content_encoding}).')
+
+
+def read_limited(stream, max_size):
+    """Return the content of a binary stream of at most ``max_size`` bytes.
+
+    The stream is read in chunks, so it stops as soon as the content is
+    larger than ``max_size``, raising BodyTooLargeError.
+    """
+    chunks = []
+    size = 0
+    chunk = stream.read(CHUNK_SIZE)
+    while chunk:
+        size += len(chunk)
+        if size > max_size:
+            raise BodyTooLargeError(f'it is larger than {max_size} bytes')
+        chunks.append(chunk)
+        chunk = stream.read(CHUNK_SIZE)
+    return b''.join(chunks)
+
+
+def read_ndjson_flows(stream, max_line_size=None):
+    """Yield the flow of each non-empty line of a binary stream.
+
+    Raise InvalidFlowStreamError when a line is not a JSON object and
+    BodyTooLargeError when it is larger than ``max_line_size`` bytes.
+    """
+    number = 0
+    while True:
+        if max_line_size:
+            line = stream.readline(max_line_size + 1)
+            if len(line) > max_line_size:
+                raise BodyTooLargeError(f'line {number + 1} is larger than '
+                                        f'{max_line_size} bytes')
+        else:
+            line = stream.readline()
+        if not line:
+            return
+        number += 1
+        if not line.strip():
+            continue
+        try:
+            flow = json.loads(line)
+        except ValueError as error:
+            raise InvalidFlowStreamError(
+                f'line {number} is not valid JSON ({error})') from error
+        if not isinstance(flow, dict):
+            raise InvalidFlowStreamError(
+                f'line {number} is not a JSON object')
+        yield flow
+
+
+def batches(iterable, size):
+    """Yield lists with the next ``size`` items of an iterable."""
+    iterator = iter(iterable)
+    batch = list(islice(iterator, size))
+    while batch:
+        yield batch
+        batch = list(islice(iterator, size))
+
+
+def json_object_chunks(items):
+    """Yield the JSON of an object with the (key, value) pairs of ``items``.
+
+    Each value is encoded when its chunk is yielded, so the values can be
+    created lazily by a generator.
+    """
+    separator = '{'
+    for key, value in items:
+        yield f'{separator}{json.dumps(key)}: {json.dumps(value)}'
+        separator = ', '
+    yield '}' if separator == ', ' else '{}'
+
+
+def gzip_chunks(chunks, level):
+    """Yield the gzip compression of text chunks, as they are generated."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
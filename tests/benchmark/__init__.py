@@ -0,0 +1 @@
+"""kytos/flow_manager benchmarks."""
@@ -0,0 +1,271 @@
+"""Benchmarks of the flow_manager hot paths.
+
+The NApp runs with a mocked controller and switches, like the unit tests, so
+the results only measure the code of this NApp and of_core. Run them from the
+root of the NApp with:
+
+    python -m tests.benchmark.benchmarks --output results.json
+
+The results are emitted as JSON, with the minimum, median and mean time in
+seconds of each benchmark, so they can be compared between versions.
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+from statistics import mean, median
+from unittest.mock import MagicMock, patch
+
+from pyof.v0x01.controller2switch.common import FlowStats as FlowStats10
+from pyof.v0x04.controller2switch.multipart_reply import \
+    FlowStats as FlowStats13
+
+from napps.kytos.flow_manager.consistency import HAS_NUMPY
+from napps.kytos.flow_manager.match import match_flow
+from napps.kytos.flow_manager.serializers.v0x01 import FlowSerializer10
+from napps.kytos.flow_manager.serializers.v0x04 import FlowSerializer13
+from napps.kytos.flow_manager.stored_flow import StoredFlow
+
+DPID = '00:00:00:00:00:00:00:01'
+VERSIONS = {0x01: '1.0', 0x04: '1.3'}
+
+
+class Benchmark:
+    """Run the benchmarks and collect their results."""
+
+    def __init__(self, repeat):
+        """Create a benchmark runner that repeats each benchmark."""
+        self.repeat = repeat
+        self.results = []
+
+    def measure(self, name, func, setup=None, **params):
+        """Measure ``func``, called with the arguments returned by setup.
+
+        The time spent in ``setup`` is not measured, it is used to reset the
+        state changed by the previous call.
+        """
+        timings = []
+        for _ in range(self.repeat):
+            args = setup() if setup else ()
+            start = time.perf_counter()
+            func(*args)
+            timings.append(time.perf_counter() - start)
+        result = {'name': name, 'params': params, 'repeat': self.repeat,
+                  'min': min(timings), 'median': median(timings),
+                  'mean': mean(timings)}
+        self.results.append(result)
+        print(f"{name} {params}: {result['median']:.6f}s", file=sys.stderr)
+
+    def as_dict(self):
+        """Return the results and the environment where they were taken."""
+        return {'timestamp': time.time(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'repeat': self.repeat,
+                'results': self.results}
+
+
+def get_flow_dict(index):
+    """Return a flow dictionary supported by OF 1.0 and OF 1.3."""
+    return {'priority': 100 + index % 1000,
+            'cookie': index,
+            'match': {'in_port': index % 48 + 1,
+                      'dl_vlan': index % 4094 + 1},
+            'actions': [{'action_type': 'set_vlan',
+                         'vlan_id': (index + 1) % 4094 + 1},
+                        {'action_type': 'output',
+                         'port': (index + 1) % 48 + 1}]}
+
+
+def get_flow_dicts(count, start=0):
+    """Return ``count`` different flow dictionaries."""
+    return [get_flow_dict(index) for index in range(start, start + count)]
+
+
+def get_flow_stats(version, flows):
+    """Return the flow stats replied by a switch with the given flows."""
+    stats_list = []
+    for flow_dict in flows:
+        if version == 0x01:
+            flow_mod = FlowSerializer10().from_dict(flow_dict)
+            stats = FlowStats10(match=flow_mod.match,
+                                actions=flow_mod.actions)
+        else:
+            flow_mod = FlowSerializer13().from_dict(flow_dict)
+            stats = FlowStats13(match=flow_mod.match, flags=0,
+                                instructions=flow_mod.instructions)
+        stats.length = 0
+        stats.table_id = 0
+        stats.duration_sec = stats.duration_nsec = 0
+        stats.priority = flow_mod.priority
+        stats.idle_timeout = stats.hard_timeout = 0
+        stats.cookie = flow_mod.cookie
+        stats.packet_count = stats.byte_count = 0
+        stats.length = stats.get_size()
+        unpacked_stats = type(stats)()
+        unpacked_stats.unpack(stats.pack())
+        stats_list.append(unpacked_stats)
+    return stats_list
+
+
+def get_napp(version):
+    """Return the NApp with a mocked controller and a single switch."""
+    # pylint: disable=import-outside-toplevel
+    from kytos.lib.helpers import get_controller_mock, get_switch_mock
+    from napps.kytos.flow_manager.main import Main
+
+    controller = get_controller_mock()
+    controller.buffers = MagicMock()
+    switch = get_switch_mock(DPID, version)
+    switch.id = DPID
+    switch.flows = []
+    switch.is_enabled.return_value = True
+    controller.switches = {DPID: switch}
+    controller.get_switch_by_dpid.return_value = switch
+
+    napp = Main(controller)
+    napp.storehouse = MagicMock()
+    return napp, switch
+
+
+def bench_serializers(benchmark):
+    """Benchmark the conversion of flows by the flow serializers."""
+    flows = get_flow_dicts(1000)
+    xids = list(range(len(flows)))
+    for version, serializer in ((0x01, FlowSerializer10()),
+                                (0x04, FlowSerializer13())):
+        params = {'version': VERSIONS[version], 'flows': len(flows)}
+        stats_list = get_flow_stats(version, flows)
+        benchmark.measure('serializer.from_dict',
+                          lambda s=serializer: [s.from_dict(flow)
+                                                for flow in flows],
+                          **params)
+        benchmark.measure('serializer.to_dict',
+                          lambda s=serializer, stats_list=stats_list:
+                          [s.to_dict(stats) for stats in stats_list],
+                          **params)
+        benchmark.measure('serializer.pack_flow_mods',
+                          lambda s=serializer:
+                          s.pack_flow_mods(flows, 'add', xids).pack(),
+                          **params)
+
+
+def bench_match_flow(benchmark):
+    """Benchmark the non-strict match used to delete stored flows."""
+    stored_flows = get_flow_dicts(1000)
+    flow_to_delete = {'match': {'in_port': 1}}
+    for version in VERSIONS:
+        benchmark.measure('match_flow',
+                          lambda v=version: [match_flow(flow_to_delete, v,
+                                                        stored_flow)
+                                             for stored_flow in stored_flows],
+                          version=VERSIONS[version],
+                          stored_flows=len(stored_flows))
+
+
+def bench_install_flows(benchmark):
+    """Benchmark the creation and sending of FlowMods.
+
+    The persistence of the flows is measured by the benchmark of
+    ``_store_changed_flows``, so it is disabled here.
+    """
+    napp, switch = get_napp(0x04)
+    napp._store_changed_flows = MagicMock()
+    for count in (1, 100, 10000):
+        flows_dict = {'flows': get_flow_dicts(count)}
+        for bulk_packing in (False, True):
+            with patch('napps.kytos.flow_manager.main.ENABLE_BULK_PACKING',
+                       bulk_packing):
+                benchmark.measure('_install_flows',
+                                  lambda f=flows_dict:
+                                  napp._install_flows('add', f, [switch]),
+                                  flows=count, bulk_packing=bulk_packing)
+
+
+def bench_store_changed_flows(benchmark):
+    """Benchmark the persistence of a flow in growing stored lists."""
+    napp, switch = get_napp(0x04)
+    new_flow = get_flow_dict(0)
+    deleted_flow = {'match': {'in_port': 1}}
+
+    for count in (10, 100, 1000):
+        stored = [StoredFlow('add', flow)
+                  for flow in get_flow_dicts(count, start=1)]
+
+        def setup(stored=stored):
+            napp.stored_flows = {DPID: {'flow_list': list(stored)}}
+            return ()
+
+        for command, flow in (('add', new_flow), ('delete', deleted_flow)):
+            benchmark.measure('_store_changed_flows',
+                              lambda c=command, f=flow:
+                              napp._store_changed_flows(c, f, switch),
+                              setup=setup, command=command,
+                              stored_flows=count)
+
+
+def bench_consistency(benchmark):
+    """Benchmark both consistency checks with varying overlap.
+
+    The FlowMods that repair the switch are not built nor sent, so only the
+    comparison of installed and stored flows is measured, and no repaired
+    flow is left in the grace window of the next runs.
+    """
+    # pylint: disable=import-outside-toplevel
+    from napps.kytos.of_core.flow import FlowFactory
+
+    napp, switch = get_napp(0x04)
+    napp._send_flows = MagicMock()
+    serializer = FlowFactory.get_class(switch)
+    count = 1000
+    for overlap in (0, 0.5, 1):
+        start = int(count * (1 - overlap))
+        switch.flows = [serializer.from_dict(flow, switch)
+                        for flow in get_flow_dicts(count)]
+        stored = [StoredFlow('add', flow)
+                  for flow in get_flow_dicts(count, start=start)]
+        napp.stored_flows = {DPID: {'flow_list': stored}}
+        for vectorized in (False, True):
+            if vectorized and not HAS_NUMPY:
+                continue
+            napp.vectorized_consistency = vectorized
+            params = {'flows': count, 'overlap': overlap,
+                      'vectorized': vectorized}
+            benchmark.measure('check_switch_consistency',
+                              lambda: napp.check_switch_consistency(switch),
+                              **params)
+            benchmark.measure('check_storehouse_consistency',
+                              lambda: napp.check_storehouse_consistency(
+                                  switch),
+                              **params)
+
+
+GROUPS = {'serializers': bench_serializers,
+          'match_flow': bench_match_flow,
+          'install_flows': bench_install_flows,
+          'store_changed_flows': bench_store_changed_flows,
+          'consistency': bench_consistency}
+
+
+def main(args=None):
+    """Run the selected benchmarks and write their results as JSON."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='number of times each benchmark is run')
+    parser.add_argument('--group', action='append', choices=GROUPS,
+                        help='benchmark group to run (default: all)')
+    parser.add_argument('--output', type=argparse.FileType('w'),
+                        default=sys.stdout,
+                        help='file where the results are written')
+    args = parser.parse_args(args)
+
+    benchmark = Benchmark(args.repeat)
+    for group in args.group or GROUPS:
+        GROUPS[group](benchmark)
+    json.dump(benchmark.as_dict(), args.output, indent=2)
+    args.output.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""Test the aggregation of items by key."""
+from threading import Event
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from napps.kytos.flow_manager.aggregation import Aggregator
+
+
+class TestAggregator(TestCase):
+    """Test the Aggregator class."""
+
+    def setUp(self):
+        """Execute steps before each tests."""
+        self.handler = MagicMock()
+
+    def test_no_window(self):
+        """Test that each item is handled when the window is 0."""
+        aggregator = Aggregator(0, self.handler)
+
+        aggregator.add('key', 1)
+        aggregator.add('key', 2)
+
+        self.assertEqual(self.handler.call_count, 2)
+        self.handler.assert_called_with('key', [2])
+
+    def test_window(self):
+        """Test that the items of each key are handled together."""
+        aggregator = Aggregator(60, self.handler)
+
+        aggregator.add('key_1', 1)
+        aggregator.add('key_2', 2)
+        aggregator.add('key_1', 3)
+        self.handler.assert_not_called()
+        aggregator.flush('key_1')
+
+        self.handler.assert_called_once_with('key_1', [1, 3])
+        aggregator.flush()
+        self.handler.assert_called_with('key_2', [2])
+        aggregator.flush()
+        self.assertEqual(self.handler.call_count, 2)
+
+    def test_timer(self):
+        """Test that the items are handled when the window ends."""
+        handled = Event()
+        aggregator = Aggregator(0.01, lambda key, items: handled.set())
+
+        aggregator.add('key', 1)
+
+        self.assertTrue(handled.wait(5))
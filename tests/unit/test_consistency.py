@@ -0,0 +1,71 @@
+"""Test the helpers used to compare installed and stored flows."""
+from unittest import TestCase, skipIf
+from unittest.mock import MagicMock
+
+from napps.kytos.flow_manager.consistency import (HAS_NUMPY, flow_identity,
+                                                  vectorized_flows_in)
+
+
+def get_flow_mock(flow_dict):
+    """Return a Flow mock with the given dictionary."""
+    flow = MagicMock()
+    flow.as_dict.return_value = flow_dict
+    return flow
+
+
+class TestConsistency(TestCase):
+    """Test the consistency helpers."""
+
+    def test_flow_identity(self):
+        """Test the identity of equivalent and different flows."""
+        flow_dict = {'priority': 10, 'cookie': 1, 'table_id': 0,
+                     'match': {'in_port': 1, 'dl_vlan': 2},
+                     'actions': [{'action_type': 'output', 'port': 2}],
+                     'stats': {'packet_count': 10}}
+        same_flow = {'table_id': 0, 'cookie': 1, 'priority': 10,
+                     'match': {'dl_vlan': 2, 'in_port': 1},
+                     'actions': [{'port': 2, 'action_type': 'output'}]}
+        other_flow = dict(same_flow, match={'dl_vlan': 3, 'in_port': 1})
+        other_timeout = dict(same_flow, idle_timeout=30)
+
+        self.assertEqual(flow_identity(flow_dict), flow_identity(same_flow))
+        self.assertNotEqual(flow_identity(flow_dict),
+                            flow_identity(other_flow))
+        self.assertNotEqual(flow_identity(flow_dict),
+                            flow_identity(other_timeout))
+
+    def test_flow_identity_invalid_fields(self):
+        """Test the identity of flows with fields that are not integers."""
+        flow_dict = {'priority': 'high', 'cookie': None, 'match': {}}
+
+        self.assertEqual(flow_identity(flow_dict),
+                         flow_identity(dict(flow_dict)))
+        self.assertEqual(flow_identity(flow_dict)[1:3], ('high', 'None'))
+
+    @skipIf(not HAS_NUMPY, 'NumPy is not installed')
+    def test_vectorized_flows_in(self):
+        """Test the vectorized comparison of flow lists."""
+        flows = [get_flow_mock({'priority': i, 'cookie': 2 ** 63 + i,
+                                'match': {'in_port': i}})
+                 for i in range(5)]
+        other_flows = [get_flow_mock({'priority': i, 'cookie': 2 ** 63 + i,
+                                      'match': {'in_port': i}})
+                       for i in (1, 3, 7)]
+        other_flows[1].as_dict.return_value['hard_timeout'] = 60
+
+        result = vectorized_flows_in(flows, other_flows)
+
+        self.assertEqual(list(result), [False, True, False, False, False])
+
+    @skipIf(not HAS_NUMPY, 'NumPy is not installed')
+    def test_vectorized_flows_in_invalid_fields(self):
+        """Test that flows with fields out of the arrays are not compared."""
+        flows = [get_flow_mock({'priority': 10})]
+        invalid_flows = [[get_flow_mock({'priority': 'high'})],
+                         [get_flow_mock({'priority': 0x10000})],
+                         [get_flow_mock({'cookie': -1})],
+                         [get_flow_mock({'table_id': None})]]
+
+        for other_flows in invalid_flows:
+            with self.assertRaises(ValueError):
+                vectorized_flows_in(flows, other_flows)
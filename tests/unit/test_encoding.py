@@ -0,0 +1,60 @@
+"""Test the encodings of the persisted flow lists."""
+from unittest import TestCase
+
+from napps.kytos.flow_manager.encoding import (decode_flow_list,
+                                               decode_stored_flows,
+                                               encode_flow_list,
+                                               encode_stored_flows)
+
+
+class TestEncoding(TestCase):
+    """Test the encoding functions."""
+
+    def setUp(self):
+        """Execute steps before each tests."""
+        self.flow_list = [
+            {'command': 'add',
+             'flow': {'priority': 10, 'cookie': 84114904,
+                      'match': {'in_port': 1, 'dl_vlan': 300},
+                      'actions': [{'action_type': 'output', 'port': 2}]}},
+            {'command': 'delete',
+             'flow': {'cookie': 84114905, 'match': {'in_port': 2}}}]
+
+    def test_dict_encoding(self):
+        """Test that the dict encoding keeps the original format."""
+        entry = encode_flow_list(self.flow_list, 'dict')
+
+        self.assertEqual(entry, {'flow_list': self.flow_list})
+        self.assertEqual(decode_flow_list(entry), self.flow_list)
+
+    def test_zlib_json_encoding(self):
+        """Test the round trip of the zlib_json encoding."""
+        entry = encode_flow_list(self.flow_list * 100, 'zlib_json')
+
+        self.assertEqual(entry['encoding'], 'zlib_json')
+        self.assertIsInstance(entry['flow_list'], str)
+        self.assertLess(len(entry['flow_list']),
+                        len(str(self.flow_list * 100)))
+        self.assertEqual(decode_flow_list(entry), self.flow_list * 100)
+
+    def test_unknown_encoding(self):
+        """Test that unknown encodings raise ValueError."""
+        with self.assertRaises(ValueError):
+            encode_flow_list(self.flow_list, 'unknown')
+        with self.assertRaises(ValueError):
+            decode_flow_list({'encoding': 'unknown', 'flow_list': ''})
+
+    def test_stored_flows_migration(self):
+        """Test loading a mix of original and encoded switch entries."""
+        dpid_1 = '00:00:00:00:00:00:00:01'
+        dpid_2 = '00:00:00:00:00:00:00:02'
+        data = {dpid_1: {'flow_list': self.flow_list},
+                dpid_2: encode_flow_list(self.flow_list, 'zlib_json')}
+
+        stored_flows = decode_stored_flows(data)
+
+        expected = {dpid_1: {'flow_list': self.flow_list},
+                    dpid_2: {'flow_list': self.flow_list}}
+        self.assertEqual(stored_flows, expected)
+        encoded = encode_stored_flows(stored_flows, 'zlib_json')
+        self.assertEqual(decode_stored_flows(encoded), expected)
@@ -1,9 +1,14 @@
 """Test Flow serializer for OF 1.0 methods."""
-from unittest import TestCase
+from unittest import TestCase, skipIf
 from unittest.mock import MagicMock, patch
 
 from napps.kytos.flow_manager.serializers.v0x01 import FlowSerializer10
 
+try:
+    from napps.kytos.of_core.v0x01.flow import Flow as OFCoreFlow
+except ImportError:
+    OFCoreFlow = None
+
 
 # pylint: disable=protected-access, no-member
 class TestFlowSerializer10(TestCase):
@@ -63,6 +68,92 @@ class TestFlowSerializer10(TestCase):
                             'action_output_any']
         self.assertEqual(return_actions, expected_actions)
 
+    def test_actions_from_list_cache(self):
+        """Test that actions are reused by the next FlowMods."""
+        actions = [{'action_type': 'set_vlan', 'vlan_id': 10},
+                   {'action_type': 'output', 'port': 1}]
+
+        actions_1 = self.napp._actions_from_list(actions)
+        actions_2 = self.napp._actions_from_list(actions)
+
+        self.assertEqual(len(actions_1), 2)
+        self.assertIs(actions_1[0], actions_2[0])
+        self.assertIs(actions_1[1], actions_2[1])
+
+    def test_cache_max_size(self):
+        """Test that the cache is cleared when it is full."""
+        self.napp.CACHE_MAX_SIZE = 2
+        for port in range(3):
+            self.napp._actions_from_list([{'action_type': 'output',
+                                           'port': port}])
+
+        self.assertEqual(len(self.napp._action_cache), 1)
+
+    def test_can_pack(self):
+        """Test that only the flows with supported values are packed."""
+        self.assertTrue(self.napp.can_pack({'priority': 1, 'match': {
+            'dl_vlan': 0xffff, 'nw_src': '10.0.0.0/8'}}))
+        self.assertFalse(self.napp.can_pack({'match': {'in_port': 1}}))
+        self.assertFalse(self.napp.can_pack({'priority': 1, 'match': {
+            'dl_src': '00:00:00:00:00:01/ff:ff:ff:ff:ff:00'}}))
+        self.assertFalse(self.napp.can_pack({'priority': 1, 'match': {
+            'in_port': 0x10000}}))
+        self.assertFalse(self.napp.can_pack({'priority': 1, 'actions': [
+            {'action_type': 'output', 'port': 0x10000}]}))
+
+    def test_pack_flow_mods(self):
+        """Test that packed FlowMods are the same as from_dict FlowMods."""
+        flows = [{'priority': 10,
+                  'match': {'in_port': 1, 'dl_vlan': 3,
+                            'nw_src': '10.0.0.1'},
+                  'actions': [{'action_type': 'set_vlan', 'vlan_id': 5},
+                              {'action_type': 'output', 'port': 2}]},
+                 {'match': {}},
+                 {'cookie': 7, 'actions': [{'action_type': 'output',
+                                            'port': 'controller'}]}]
+        expected = b''
+        for xid, flow in enumerate(flows):
+            flow_mod = FlowSerializer10().from_dict(flow)
+            flow_mod.command = self.napp.OFPFC_DELETE_STRICT
+            flow_mod.header.xid = xid
+            expected += flow_mod.pack()
+
+        flow_mods = self.napp.pack_flow_mods(flows, 'delete_strict',
+                                             [0, 1, 2])
+
+        self.assertEqual(flow_mods.pack(), expected)
+        self.assertEqual(flow_mods.xids, [0, 1, 2])
+
+    @skipIf(OFCoreFlow is None, 'of_core is not installed')
+    def test_pack_flow_mods_of_core(self):
+        """Test that packed FlowMods are the same as of_core FlowMods."""
+        flows = [{'priority': 10, 'cookie': 5, 'idle_timeout': 3,
+                  'match': {'nw_dst': '10.0.0.0/8', 'dl_type': 0x800,
+                            'dl_vlan': 10, 'in_port': 1,
+                            'dl_src': '00:00:00:00:00:01'},
+                  'actions': [{'action_type': 'set_vlan', 'vlan_id': 5},
+                              {'action_type': 'output', 'port': 2}]},
+                 {'priority': 1, 'match': {'nw_proto': 6, 'dl_type': 0x800},
+                  'actions': [{'action_type': 'output',
+                               'port': 'controller'}]},
+                 {'priority': 5, 'match': {}}]
+        methods = {'add': 'as_of_add_flow_mod',
+                   'delete': 'as_of_delete_flow_mod',
+                   'delete_strict': 'as_of_strict_delete_flow_mod'}
+        switch = MagicMock()
+        self.assertTrue(all(self.napp.can_pack(flow) for flow in flows))
+        for command, method in methods.items():
+            expected = b''
+            for xid, flow in enumerate(flows):
+                flow_mod = getattr(OFCoreFlow.from_dict(flow, switch),
+                                   method)()
+                flow_mod.header.xid = xid
+                expected += flow_mod.pack()
+
+            flow_mods = self.napp.pack_flow_mods(flows, command, [0, 1, 2])
+
+            self.assertEqual(flow_mods.pack(), expected)
+
     def test_to_dict(self):
         """Test to_dict method."""
         action_1 = MagicMock()
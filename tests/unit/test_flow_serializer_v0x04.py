@@ -1,9 +1,15 @@
 """Test Flow serializer for OF 1.0 methods."""
-from unittest import TestCase
+from unittest import TestCase, skipIf
 from unittest.mock import MagicMock, patch
 
+from napps.kytos.flow_manager.serializers.base import PackedFlowMods
 from napps.kytos.flow_manager.serializers.v0x04 import FlowSerializer13
 
+try:
+    from napps.kytos.of_core.v0x04.flow import Flow as OFCoreFlow
+except ImportError:
+    OFCoreFlow = None
+
 
 # pylint: disable=protected-access, unused-argument, no-member
 class TestFlowSerializer13(TestCase):
@@ -42,34 +48,177 @@ class TestFlowSerializer13(TestCase):
         self.assertEqual(len(return_flow_mod.instructions), 1)
         self.assertEqual(len(return_flow_mod.instructions[0].actions), 1)
 
-    @patch('napps.kytos.flow_manager.serializers.v0x04.IPAddress')
-    @patch('napps.kytos.flow_manager.serializers.v0x04.HWAddress')
-    @patch('napps.kytos.flow_manager.serializers.v0x04.OxmTLV')
-    def test_match_from_dict(self, *args):
+    def test_match_from_dict(self):
         """Test _match_from_dict method."""
-        (_, mock_hw_address, mock_ip_address) = args
-        hw_address = MagicMock()
-        hw_address.pack.return_value = 'hw_address'
-        mock_hw_address.return_value = hw_address
-        ip_address = MagicMock()
-        ip_address.pack.return_value = 'ip_address'
-        mock_ip_address.return_value = ip_address
-
         dictionary = {'dl_vlan_pcp': 0, 'nw_proto': 1, 'dl_vlan': 2,
-                      'dl_src': 3, 'dl_dst': 4, 'nw_src': 5, 'nw_dst': 6,
-                      'in_port': 7, 'dl_type': 8}
-
-        tlv_generator = self.napp._match_from_dict(dictionary)
-
-        self.assertEqual(next(tlv_generator).oxm_value, b'\x00')
-        self.assertEqual(next(tlv_generator).oxm_value, b'\x01')
-        self.assertEqual(next(tlv_generator).oxm_value, b'\x10\x02')
-        self.assertEqual(next(tlv_generator).oxm_value, 'hw_address')
-        self.assertEqual(next(tlv_generator).oxm_value, 'hw_address')
-        self.assertEqual(next(tlv_generator).oxm_value, 'ip_address')
-        self.assertEqual(next(tlv_generator).oxm_value, 'ip_address')
-        self.assertEqual(next(tlv_generator).oxm_value, b'\x00\x00\x00\x07')
-        self.assertEqual(next(tlv_generator).oxm_value, b'\x00\x08')
+                      'dl_src': '00:00:00:00:00:03',
+                      'dl_dst': '00:00:00:00:00:04', 'nw_src': '10.0.0.5',
+                      'nw_dst': '10.0.0.6', 'in_port': 7, 'dl_type': 8}
+
+        tlvs = list(self.napp._match_from_dict(dictionary))
+
+        # The OXM fields are in the order of the of_core match fields
+        self.assertEqual([tlv.oxm_value for tlv in tlvs],
+                         [b'\x00\x00\x00\x07', bytes.fromhex('000000000003'),
+                          bytes.fromhex('000000000004'), b'\x10\x02', b'\x00',
+                          b'\x00\x08', b'\x01', bytes([10, 0, 0, 5]),
+                          bytes([10, 0, 0, 6])])
+        self.assertFalse(any(tlv.oxm_hasmask for tlv in tlvs))
+
+    def test_match_from_dict_masks(self):
+        """Test the match fields with masks."""
+        dictionary = {'nw_src': '10.0.0.0/8', 'nw_dst': '10.0.0.1/32',
+                      'dl_vlan': '4096/4096',
+                      'dl_src': '00:00:00:00:00:01/ff:ff:ff:ff:ff:00',
+                      'dl_dst': '00:00:00:00:00:02/ff:ff:ff:ff:ff:ff'}
+
+        tlvs = list(self.napp._match_from_dict(dictionary))
+
+        self.assertEqual([(tlv.oxm_hasmask, tlv.oxm_value) for tlv in tlvs],
+                         [(True, bytes.fromhex('000000000001ffffffffff00')),
+                          (False, bytes.fromhex('000000000002')),
+                          (True, bytes.fromhex('10001000')),
+                          (True, bytes.fromhex('0a000000ff000000')),
+                          (False, bytes.fromhex('0a000001'))])
+
+    def test_match_from_dict_cache(self):
+        """Test that match fields are reused by the next FlowMods."""
+        tlvs_1 = list(self.napp._match_from_dict({'in_port': 1,
+                                                  'dl_vlan': 10}))
+        tlvs_2 = list(self.napp._match_from_dict({'in_port': 1,
+                                                  'dl_vlan': 20}))
+
+        self.assertIs(tlvs_1[0], tlvs_2[0])
+        self.assertIsNot(tlvs_1[1], tlvs_2[1])
+        self.assertEqual(tlvs_2[1].oxm_value, b'\x10\x14')
+
+    def test_actions_from_list_cache(self):
+        """Test that actions are reused by the next FlowMods."""
+        actions = [{'action_type': 'push_vlan', 'tag_type': 's'},
+                   {'action_type': 'output', 'port': 1}]
+
+        actions_1 = list(self.napp._actions_from_list(actions))
+        actions_2 = list(self.napp._actions_from_list(
+            [{'tag_type': 's', 'action_type': 'push_vlan'},
+             {'action_type': 'output', 'port': 2}]))
+
+        self.assertIs(actions_1[0], actions_2[0])
+        self.assertIsNot(actions_1[1], actions_2[1])
+
+    def test_from_dict_pack(self):
+        """Test that FlowMods sharing cached objects are packed."""
+        flow_1 = {'priority': 10, 'match': {'in_port': 1, 'dl_vlan': 10},
+                  'actions': [{'action_type': 'output', 'port': 2}]}
+        flow_2 = {'priority': 10, 'match': {'in_port': 1, 'dl_vlan': 10},
+                  'actions': [{'action_type': 'output', 'port': 2}]}
+
+        flow_mod_1 = self.napp.from_dict(flow_1)
+        flow_mod_2 = self.napp.from_dict(flow_2)
+        for flow_mod in (flow_mod_1, flow_mod_2):
+            flow_mod.command = self.napp.OFPFC_ADD
+            flow_mod.header.xid = 1
+
+        self.assertEqual(flow_mod_1.pack(), flow_mod_2.pack())
+
+    def test_pack_flow_mods(self):
+        """Test that packed FlowMods are the same as from_dict FlowMods."""
+        flows = [{'priority': 10, 'cookie': 5, 'idle_timeout': 3,
+                  'match': {'in_port': 1, 'dl_vlan': 10,
+                            'dl_src': '00:00:00:00:00:01',
+                            'nw_dst': '10.0.0.1'},
+                  'actions': [{'action_type': 'push_vlan', 'tag_type': 's'},
+                              {'action_type': 'set_vlan', 'vlan_id': 5},
+                              {'action_type': 'output', 'port': 2},
+                              {'action_type': 'output',
+                               'port': 'controller'}]},
+                 {'match': {}},
+                 {'priority': 1, 'match': {'dl_type': 0x800, 'nw_proto': 6},
+                  'actions': [{'action_type': 'pop_vlan'}]}]
+        for command in ('add', 'delete', 'delete_strict'):
+            expected = b''
+            for xid, flow in enumerate(flows):
+                flow_mod = FlowSerializer13().from_dict(flow)
+                flow_mod.command = self.napp.COMMANDS[command]
+                flow_mod.header.xid = xid
+                expected += flow_mod.pack()
+
+            flow_mods = self.napp.pack_flow_mods(flows, command, [0, 1, 2])
+
+            self.assertEqual(flow_mods.pack(), expected)
+            self.assertEqual(flow_mods.header.version, 0x04)
+            self.assertEqual(flow_mods.header.xid, 0)
+
+    def test_with_xids(self):
+        """Test that the FlowMods are copied with new xids."""
+        flows = [{'priority': 10, 'match': {'in_port': 1},
+                  'actions': [{'action_type': 'output', 'port': 2}]},
+                 {'match': {}}]
+        flow_mods = self.napp.pack_flow_mods(flows, 'add', [0, 0])
+
+        copied = flow_mods.with_xids([7, 8])
+
+        expected = self.napp.pack_flow_mods(flows, 'add', [7, 8])
+        self.assertEqual(copied.pack(), expected.pack())
+        self.assertEqual(copied.header.xid, 7)
+        self.assertEqual(copied.xids, [7, 8])
+        self.assertEqual(flow_mods.xids, [0, 0])
+
+    def test_from_messages(self):
+        """Test FlowMod objects packed in a single buffer."""
+        flows = [{'priority': 10, 'match': {'in_port': 1}}, {'match': {}}]
+        messages = []
+        for xid, flow in enumerate(flows, 1):
+            flow_mod = self.napp.from_dict(flow)
+            flow_mod.command = self.napp.OFPFC_ADD
+            flow_mod.header.xid = xid
+            messages.append(flow_mod)
+
+        flow_mods = PackedFlowMods.from_messages(0x04, messages)
+
+        self.assertEqual(flow_mods.pack(),
+                         b''.join(message.pack() for message in messages))
+        self.assertEqual(flow_mods.xids, [1, 2])
+        self.assertIsNone(PackedFlowMods.from_messages(0x04, []).header.xid)
+
+    def test_can_pack(self):
+        """Test can_pack method."""
+        self.assertTrue(self.napp.can_pack({'priority': 1,
+                                            'match': {'in_port': 1}}))
+        self.assertFalse(self.napp.can_pack({'priority': 1, 'table_id': 1}))
+        self.assertFalse(self.napp.can_pack({'priority': 1,
+                                             'match': {'ipv6_src': 1}}))
+        self.assertFalse(self.napp.can_pack({'priority': 1, 'actions': [
+            {'action_type': 'set_queue'}]}))
+        self.assertFalse(self.napp.can_pack({'match': {'in_port': 1}}))
+
+    def test_can_pack_values(self):
+        """Test that only the flows with supported values are packed."""
+        valid_matches = [{'dl_vlan': 4095}, {'dl_vlan': '4096/4096'},
+                         {'nw_src': '10.0.0.0/8'},
+                         {'dl_dst': '00:00:00:00:00:01/ff:ff:ff:ff:ff:00'}]
+        invalid_matches = [{'dl_vlan': 4096}, {'dl_vlan': '10'},
+                           {'dl_vlan': '4096/0'}, {'in_port': -1},
+                           {'in_port': 'controller'}, {'nw_proto': 256},
+                           {'nw_src': '10.0.0.256'}, {'nw_src': '10.0.0.0/33'},
+                           {'dl_src': '00:00:00:00:00'}, {'dl_type': True}]
+        invalid_flows = [{'priority': 0x10000}, {'priority': '1'},
+                         {'priority': 1, 'cookie': -1},
+                         {'priority': 1, 'match': []},
+                         {'priority': 1, 'actions': [
+                             {'action_type': 'output', 'port': 'all'}]},
+                         {'priority': 1, 'actions': [
+                             {'action_type': 'set_vlan', 'vlan_id': 4096}]},
+                         {'priority': 1, 'actions': [
+                             {'action_type': 'push_vlan'}]}]
+
+        for match in valid_matches:
+            self.assertTrue(self.napp.can_pack({'priority': 1,
+                                                'match': match}), match)
+        for match in invalid_matches:
+            self.assertFalse(self.napp.can_pack({'priority': 1,
+                                                 'match': match}), match)
+        for flow in invalid_flows:
+            self.assertFalse(self.napp.can_pack(flow), flow)
 
     @patch('napps.kytos.flow_manager.serializers.v0x04.ActionOutput')
     def test_actions_from_list(self, mock_action_output):
@@ -133,6 +282,40 @@ class TestFlowSerializer13(TestCase):
         self.assertEqual(tlv.oxm_field, 6)
         self.assertEqual(tlv.oxm_value, b'\x10\x01')
 
+    @skipIf(OFCoreFlow is None, 'of_core is not installed')
+    def test_pack_flow_mods_of_core(self):
+        """Test that packed FlowMods are the same as of_core FlowMods."""
+        flows = [{'priority': 10, 'cookie': 5, 'idle_timeout': 3,
+                  'match': {'nw_dst': '10.0.0.0/8', 'dl_type': 0x800,
+                            'dl_vlan': '4096/4096', 'in_port': 1,
+                            'dl_src': '00:00:00:00:00:01/ff:ff:ff:ff:ff:00'},
+                  'actions': [{'action_type': 'push_vlan', 'tag_type': 's'},
+                              {'action_type': 'set_vlan', 'vlan_id': 5},
+                              {'action_type': 'output', 'port': 2}]},
+                 {'priority': 1, 'match': {'nw_proto': 6, 'dl_type': 0x800,
+                                           'nw_src': '10.0.0.1',
+                                           'dl_vlan': 10},
+                  'actions': [{'action_type': 'pop_vlan'},
+                              {'action_type': 'output',
+                               'port': 'controller'}]},
+                 {'priority': 5, 'match': {}}]
+        methods = {'add': 'as_of_add_flow_mod',
+                   'delete': 'as_of_delete_flow_mod',
+                   'delete_strict': 'as_of_strict_delete_flow_mod'}
+        switch = MagicMock()
+        self.assertTrue(all(self.napp.can_pack(flow) for flow in flows))
+        for command, method in methods.items():
+            expected = b''
+            for xid, flow in enumerate(flows):
+                flow_mod = getattr(OFCoreFlow.from_dict(flow, switch),
+                                   method)()
+                flow_mod.header.xid = xid
+                expected += flow_mod.pack()
+
+            flow_mods = self.napp.pack_flow_mods(flows, command, [0, 1, 2])
+
+            self.assertEqual(flow_mods.pack(), expected)
+
     @patch('napps.kytos.flow_manager.serializers.v0x04.FlowSerializer13.'
            '_actions_to_list', return_value='actions_to_list')
     @patch('napps.kytos.flow_manager.serializers.v0x04.FlowSerializer13.'
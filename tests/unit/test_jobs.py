@@ -0,0 +1,144 @@
+"""Test the jobs of asynchronous requests."""
+import time
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from napps.kytos.flow_manager.jobs import (FAILED, FINISHED, QUEUED, RUNNING,
+                                           Job, JobManager)
+
+
+class TestJobManager(TestCase):
+    """Test the JobManager class."""
+
+    def setUp(self):
+        """Execute steps before each tests."""
+        self.handler = MagicMock()
+        self.manager = JobManager(self.handler, max_jobs=2, max_xids=2)
+        self.addCleanup(self.manager.stop)
+
+    @staticmethod
+    def wait_job(job):
+        """Wait until the worker runs the job."""
+        for _ in range(100):
+            if job.finished_at is not None:
+                return
+            time.sleep(0.01)
+
+    def test_run_job(self):
+        """Test that the worker runs the handler of a job."""
+        job = Job('add', '00:01', 2)
+        self.assertEqual(job.status, QUEUED)
+
+        def send_flows(command, flows_dict, switches, job):
+            for xid in (1, 2):
+                self.manager.flow_mod_sent(job, xid)
+        self.handler.side_effect = send_flows
+        self.manager.submit(job, 'add', {'flows': [{}]}, ['switch'])
+        self.wait_job(job)
+        self.manager.flow_mod_errored(2)
+        self.manager.flow_mod_errored(3)
+
+        self.handler.assert_called_once_with('add', {'flows': [{}]},
+                                             ['switch'], job=job)
+        status = job.as_dict()
+        self.assertEqual(status['status'], FINISHED)
+        self.assertEqual(status['queued'], 0)
+        self.assertEqual(status['sent'], 2)
+        self.assertEqual(status['errored'], 1)
+
+    def test_failed_job(self):
+        """Test a job whose handler raises an exception."""
+        self.handler.side_effect = ValueError('invalid flow')
+        job = Job('add', None, 1)
+
+        self.manager.submit(job)
+        self.wait_job(job)
+
+        self.assertEqual(job.status, FAILED)
+        self.assertEqual(job.error, 'invalid flow')
+        self.assertEqual(job.as_dict()['queued'], 1)
+
+    def test_skipped_flow_mods(self):
+        """Test that skipped FlowMods are not queued."""
+        job = Job('add', None, 3)
+
+        self.manager.flow_mod_sent(job, 1)
+        self.manager.flow_mods_skipped(job, 2)
+
+        status = job.as_dict()
+        self.assertEqual(status['queued'], 0)
+        self.assertEqual(status['skipped'], 2)
+
+    def test_max_jobs(self):
+        """Test that only the last jobs are kept."""
+        jobs = [Job('add', None, 0) for _ in range(3)]
+        for job in jobs:
+            self.manager.submit(job)
+
+        self.assertIsNone(self.manager.get(jobs[0].id))
+        self.assertIs(self.manager.get(jobs[2].id), jobs[2])
+
+    def test_barrier_replied(self):
+        """Test the FlowMods confirmed by the reply to a BarrierRequest."""
+        job = Job('add', '00:01', 3)
+        for xid in (1, 2):
+            self.manager.flow_mod_sent(job, xid)
+        self.manager.barrier_request_sent(job, 10)
+        self.manager.flow_mod_sent(job, 3)
+        self.manager.flow_mod_errored(2)
+
+        self.assertTrue(self.manager.barrier_replied(10))
+        self.assertFalse(self.manager.barrier_replied(10))
+
+        status = job.as_dict()
+        self.assertEqual(status['sent'], 3)
+        self.assertEqual(status['confirmed'], 1)
+        self.assertEqual(status['errored'], 1)
+        self.assertEqual(set(status['latency']), {'p50', 'p90', 'p99',
+                                                  'p100'})
+        self.assertEqual(job.unconfirmed[0][0], 3)
+
+    def test_error_after_barrier_reply(self):
+        """Test that an error handled after the barrier reply is counted."""
+        job = Job('add', '00:01', 2)
+        for xid in (1, 2):
+            self.manager.flow_mod_sent(job, xid)
+        self.manager.barrier_request_sent(job, 10)
+
+        self.manager.barrier_replied(10)
+        self.manager.flow_mod_errored(2)
+
+        status = job.as_dict()
+        self.assertEqual(status['confirmed'], 1)
+        self.assertEqual(status['errored'], 1)
+        self.assertEqual(list(job.latencies), [1])
+
+    def test_running(self):
+        """Test the status of a job run by the caller."""
+        job_1 = Job('add', None, 0)
+        job_2 = Job('add', None, 0)
+
+        with self.manager.running(job_1):
+            self.manager.flows_queued(job_1, 2)
+            self.assertEqual(job_1.status, RUNNING)
+        with self.assertRaises(ValueError):
+            with self.manager.running(job_2):
+                raise ValueError('invalid flow')
+
+        self.assertEqual(job_1.status, FINISHED)
+        self.assertEqual(job_1.flows, 2)
+        self.assertIs(self.manager.get(job_1.id), job_1)
+        self.assertEqual(job_2.status, FAILED)
+        self.assertEqual(job_2.error, 'invalid flow')
+        self.handler.assert_not_called()
+
+    def test_run_error(self):
+        """Test that the errors of jobs run synchronously are raised."""
+        self.handler.side_effect = ValueError('invalid flow')
+        job = Job('add', None, 1)
+
+        with self.assertRaises(ValueError):
+            self.manager.run(job)
+
+        self.assertEqual(job.status, FAILED)
+        self.assertIs(self.manager.get(job.id), job)
@@ -0,0 +1,25 @@
+"""Test the locks of the state of each switch."""
+from unittest import TestCase
+
+from napps.kytos.flow_manager.locks import SwitchLocks
+
+
+class TestSwitchLocks(TestCase):
+    """Test the SwitchLocks class."""
+
+    def setUp(self):
+        """Execute steps before each tests."""
+        self.locks = SwitchLocks()
+
+    def test_get(self):
+        """Test that each dpid has a single lock."""
+        lock_1 = self.locks.get('00:01')
+
+        self.assertIs(self.locks.get('00:01'), lock_1)
+        self.assertIsNot(self.locks.get('00:02'), lock_1)
+
+    def test_reentrant(self):
+        """Test that the lock of a dpid can be acquired again by a thread."""
+        with self.locks.get('00:01'):
+            self.assertTrue(self.locks.get('00:01').acquire(blocking=False))
+            self.locks.get('00:01').release()
@@ -1,10 +1,52 @@
 """Test Main methods."""
+import gzip
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
 from unittest import TestCase
-from unittest.mock import MagicMock, patch
+from unittest.mock import MagicMock, call, patch
+
+from pyof.v0x01.asynchronous.error_msg import BadActionCode
+from pyof.v0x04.controller2switch.flow_mod import FlowMod as FlowMod13
+from pyof.v0x04.controller2switch.flow_mod import FlowModCommand
 
 from kytos.lib.helpers import (get_connection_mock, get_controller_mock,
                                get_kytos_event_mock, get_switch_mock,
                                get_test_client)
+from napps.kytos.flow_manager.encoding import encode_flow_list
+from napps.kytos.flow_manager.metrics import CONSISTENCY_REPAIRS_AVOIDED
+from napps.kytos.flow_manager.stored_flow import (stored_flows_as_dict,
+                                                  stored_flows_from_dict)
+from napps.kytos.flow_manager.workers import SwitchWorkers
+
+
+class FlowStub:
+    """Flow object created from a flow dictionary, compared by its fields."""
+
+    def __init__(self, flow_dict, switch):
+        self.flow_dict = flow_dict
+        self.switch = switch
+
+    def __eq__(self, other):
+        return self.flow_dict == other.flow_dict
+
+    __hash__ = None
+
+    @staticmethod
+    def as_of_add_flow_mod():
+        """Return a FlowMod to add the flow."""
+        return FlowMod13(command=FlowModCommand.OFPFC_ADD)
+
+    @staticmethod
+    def as_of_delete_flow_mod():
+        """Return a FlowMod to delete the flow."""
+        return FlowMod13(command=FlowModCommand.OFPFC_DELETE)
+
+    @staticmethod
+    def as_of_strict_delete_flow_mod():
+        """Return a FlowMod to delete the flow strictly."""
+        return FlowMod13(command=FlowModCommand.OFPFC_DELETE_STRICT)
 
 
 # pylint: disable=protected-access, too-many-public-methods
@@ -87,6 +129,52 @@ class TestMain(TestCase):
         self.assertEqual(response.json, expected)
         self.assertEqual(response.status_code, 200)
 
+    def test_rest_list_gzip(self):
+        """Test the flows listed with gzip when the client accepts it."""
+        flow_dict = {"priority": 13, "match": {"dl_dst": "00:15:af:d5:38:98"}}
+        flow_1 = MagicMock()
+        flow_1.as_dict.return_value = flow_dict
+        self.switch_01.flows.append(flow_1)
+        api = get_test_client(self.napp.controller, self.napp)
+        url = f'{self.API_URL}/v2/flows'
+
+        response_1 = api.get(url, headers={'Accept-Encoding': 'gzip'})
+        response_2 = api.get(url, headers={'Accept-Encoding': 'gzip;q=0'})
+
+        expected = {'00:00:00:00:00:00:00:01': {'flows': [flow_dict]},
+                    '00:00:00:00:00:00:00:02': {'flows': []}}
+        self.assertEqual(response_1.status_code, 200)
+        self.assertEqual(response_1.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(response_1.data)),
+                         expected)
+        self.assertNotIn('Content-Encoding', response_2.headers)
+        self.assertEqual(response_2.json, expected)
+
+    @patch('napps.kytos.flow_manager.main.LIST_SECONDS')
+    def test_rest_list_gzip_seconds(self, mock_list_seconds):
+        """Test that the time to list the flows includes streaming them."""
+        flow = MagicMock()
+        self.switch_01.flows.append(flow)
+        api = get_test_client(self.napp.controller, self.napp)
+        url = f'{self.API_URL}/v2/flows'
+
+        observed = []
+
+        def as_dict():
+            observed.append(mock_list_seconds.observe.call_count)
+            return {"priority": 13, "match": {}}
+
+        flow.as_dict.side_effect = as_dict
+        response_1 = api.get(url, headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(mock_list_seconds.observe.call_count, 0)
+        self.assertTrue(response_1.data)
+        response_2 = api.get(url)
+
+        self.assertEqual(response_1.status_code, 200)
+        self.assertEqual(response_2.status_code, 200)
+        self.assertEqual(observed, [0, 1])
+        self.assertEqual(mock_list_seconds.observe.call_count, 2)
+
     def test_list_flows_fail_case(self):
         """Test the failure case to recover all flows from a switch by dpid.
 
@@ -97,6 +185,56 @@ class TestMain(TestCase):
         response = api.get(url)
         self.assertEqual(response.status_code, 404)
 
+    def test_rest_metrics(self):
+        """Test the metrics in the Prometheus text format."""
+        api = get_test_client(self.napp.controller, self.napp)
+        api.get(f'{self.API_URL}/v2/flows')
+
+        response = api.get(f'{self.API_URL}/v2/metrics')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'text/plain')
+        body = response.get_data(as_text=True)
+        self.assertIn('# TYPE flow_manager_list_seconds histogram', body)
+        self.assertIn('flow_manager_list_seconds_count', body)
+
+    def test_rest_consistency_schedule(self):
+        """Test the next consistency checks of the switches."""
+        self.napp.consistency_scheduler.checked(self.switch_01.dpid, 0.5,
+                                                10, 0)
+        api = get_test_client(self.napp.controller, self.napp)
+
+        response = api.get(f'{self.API_URL}/v2/consistency/schedule')
+
+        self.assertEqual(response.status_code, 200)
+        switch = response.json['switches'][self.switch_01.dpid]
+        self.assertEqual(switch['cost'], 0.5)
+        self.assertIn('next_check', switch)
+
+    def test_rest_profiler(self):
+        """Test the endpoints to start and stop the profiler."""
+        api = get_test_client(self.napp.controller, self.napp)
+        start_url = f'{self.API_URL}/v2/profiler/start'
+        stop_url = f'{self.API_URL}/v2/profiler/stop'
+
+        response_1 = api.post(stop_url)
+        response_2 = api.post(start_url, json={'interval': 'fast'})
+        response_3 = api.post(start_url, json={'interval': 0.01,
+                                               'duration': 1000})
+        response_4 = api.post(start_url)
+        response_5 = api.post(stop_url)
+        response_6 = api.post(f'{stop_url}?format=collapsed')
+
+        self.assertEqual(response_1.status_code, 404)
+        self.assertEqual(response_2.status_code, 400)
+        self.assertEqual(response_3.status_code, 200)
+        self.assertEqual(response_3.json['duration'], 60)
+        self.assertEqual(response_4.status_code, 409)
+        self.assertEqual(response_5.status_code, 200)
+        self.assertIn('functions', response_5.json)
+        self.assertEqual(response_6.status_code, 200)
+        self.assertEqual(response_6.mimetype, 'text/plain')
+
     @patch('napps.kytos.flow_manager.main.Main._install_flows')
     def test_rest_add_and_delete_without_dpid(self, mock_install_flows):
         """Test add and delete rest method without dpid."""
@@ -113,6 +251,59 @@ class TestMain(TestCase):
 
         self.assertEqual(mock_install_flows.call_count, 2)
 
+    @patch('napps.kytos.flow_manager.main.Main._install_flows')
+    def test_rest_add_gzip(self, mock_install_flows):
+        """Test the flows of a request body compressed with gzip."""
+        api = get_test_client(self.napp.controller, self.napp)
+        url = f'{self.API_URL}/v2/flows/00:00:00:00:00:00:00:01'
+        flows_dict = {'flows': [{"priority": 25}]}
+        body = gzip.compress(json.dumps(flows_dict).encode())
+        ndjson_body = gzip.compress(b'{"priority": 25}\n')
+
+        response_1 = api.post(url, data=body, content_type='application/json',
+                              headers={'Content-Encoding': 'gzip'})
+        response_2 = api.post(url, data=ndjson_body,
+                              content_type='application/x-ndjson',
+                              headers={'Content-Encoding': 'gzip'})
+        response_3 = api.post(url, data=b'{}',
+                              content_type='application/json',
+                              headers={'Content-Encoding': 'gzip'})
+        response_4 = api.post(url, data=body, content_type='application/json',
+                              headers={'Content-Encoding': 'br'})
+
+        self.assertEqual(response_1.status_code, 200)
+        self.assertEqual(response_2.status_code, 200)
+        self.assertEqual(mock_install_flows.call_args_list, [
+            call('add', flows_dict, [self.switch_01]),
+            call('add', flows_dict, [self.switch_01], None)])
+        self.assertEqual(response_3.status_code, 400)
+        self.assertEqual(response_4.status_code, 415)
+
+    @patch('napps.kytos.flow_manager.main.NDJSON_BATCH_SIZE', 1)
+    @patch('napps.kytos.flow_manager.main.GZIP_MAX_DECOMPRESSED_SIZE', 100)
+    @patch('napps.kytos.flow_manager.main.Main._install_flows')
+    def test_rest_add_gzip_too_large(self, mock_install_flows):
+        """Test the gzip bodies larger than the limit once decompressed."""
+        api = get_test_client(self.napp.controller, self.napp)
+        url = f'{self.API_URL}/v2/flows/00:00:00:00:00:00:00:01'
+        flows_dict = {'flows': [{"priority": 25}] * 100}
+        body = gzip.compress(json.dumps(flows_dict).encode())
+        ndjson_body = gzip.compress(b'{"priority": 25}\n'
+                                    + b' ' * 200 + b'{}\n')
+
+        response_1 = api.post(url, data=body, content_type='application/json',
+                              headers={'Content-Encoding': 'gzip'})
+        response_2 = api.post(url, data=ndjson_body,
+                              content_type='application/x-ndjson',
+                              headers={'Content-Encoding': 'gzip'})
+
+        self.assertLess(len(body), 100)
+        self.assertEqual(response_1.status_code, 413)
+        self.assertEqual(response_2.status_code, 413)
+        self.assertEqual(response_2.json['flows'], 1)
+        mock_install_flows.assert_called_once_with(
+            'add', {'flows': [{"priority": 25}]}, [self.switch_01], None)
+
     @patch('napps.kytos.flow_manager.main.Main._install_flows')
     def test_rest_add_and_delete_with_dpid(self, mock_install_flows):
         """Test add and delete rest method with dpid."""
@@ -153,6 +344,54 @@ class TestMain(TestCase):
 
         self.assertEqual(mock_install_flows.call_count, 0)
 
+    def test_rest_add_async(self):
+        """Test the add rest method with a background job."""
+        self.napp.jobs = MagicMock()
+        api = get_test_client(self.napp.controller, self.napp)
+        url = f'{self.API_URL}/v2/flows/00:00:00:00:00:00:00:01?async=true'
+        flows_dict = {'flows': [{"priority": 25}, {"priority": 30}]}
+
+        response = api.post(url, json=flows_dict)
+
+        self.assertEqual(response.status_code, 202)
+        job, *args = self.napp.jobs.submit.call_args[0]
+        self.assertEqual(response.json['job_id'], job.id)
+        self.assertEqual(job.flows, 2)
+        self.assertEqual(args, ['add', flows_dict, [self.switch_01]])
+
+    def test_rest_get_job(self):
+        """Test the progress of a job."""
+        job = MagicMock()
+        job.as_dict.return_value = {'id': '1234', 'sent': 2}
+        self.napp.jobs = MagicMock()
+        self.napp.jobs.get.side_effect = {'1234': job}.get
+        api = get_test_client(self.napp.controller, self.napp)
+
+        response_1 = api.get(f'{self.API_URL}/v2/jobs/1234')
+        response_2 = api.get(f'{self.API_URL}/v2/jobs/5678')
+
+        self.assertEqual(response_1.status_code, 200)
+        self.assertEqual(response_1.json, {'id': '1234', 'sent': 2})
+        self.assertEqual(response_2.status_code, 404)
+
+    @patch('napps.kytos.flow_manager.main.ENABLE_BARRIER_TRACKING', True)
+    def test_rest_add_barrier_tracking(self):
+        """Test the job returned by a request with barrier tracking."""
+        # The job manager keeps the _install_flows bound in setup
+        mock_install_flows = MagicMock()
+        self.napp.jobs._handler = mock_install_flows
+        api = get_test_client(self.napp.controller, self.napp)
+        url = f'{self.API_URL}/v2/flows/00:00:00:00:00:00:00:01'
+
+        response = api.post(url, json={'flows': [{"priority": 25}]})
+
+        self.assertEqual(response.status_code, 200)
+        job = self.napp.jobs.get(response.json['job_id'])
+        self.assertEqual(job.status, 'finished')
+        mock_install_flows.assert_called_with('add',
+                                              {'flows': [{"priority": 25}]},
+                                              [self.switch_01], job=job)
+
     def test_get_all_switches_enabled(self):
         """Test _get_all_switches_enabled method."""
         switches = self.napp._get_all_switches_enabled()
@@ -212,6 +451,298 @@ class TestMain(TestCase):
         mock_send_napp_event.assert_called_with(self.switch_01, flow,
                                                 'delete_strict')
 
+    @patch('napps.kytos.flow_manager.main.BULK_PACKING_MIN_FLOWS', 2)
+    @patch('napps.kytos.flow_manager.main.ENABLE_BULK_PACKING', True)
+    @patch('napps.kytos.flow_manager.main.Main._store_changed_flows')
+    @patch('napps.kytos.flow_manager.main.Main._send_napp_event')
+    @patch('napps.kytos.flow_manager.main.Main._send_flow_mod')
+    @patch('napps.kytos.flow_manager.main.FlowFactory.get_class')
+    def test_install_packed_flows(self, *args):
+        """Test _install_flows method packing FlowMods in bulk."""
+        (mock_flow_factory, mock_send_flow_mod, mock_send_napp_event,
+         mock_store_changed_flows) = args
+        serializer = MagicMock()
+        flow = MagicMock(priority=10, cookie=0, idle_timeout=0,
+                         hard_timeout=0)
+        serializer.from_dict.return_value = flow
+        mock_flow_factory.return_value = serializer
+        flows = [{'priority': 10, 'match': {'in_port': port}}
+                 for port in (1, 2)]
+
+        self.napp._install_flows('add', {'flows': flows}, [self.switch_01])
+
+        mock_send_flow_mod.assert_called_once()
+        flow_mods = mock_send_flow_mod.call_args[0][1]
+        self.assertEqual(len(flow_mods.xids), 2)
+        for xid in flow_mods.xids:
+            self.assertEqual(self.napp._flow_mods_sent[xid][:2],
+                             (flow, 'add'))
+        self.assertEqual(mock_send_napp_event.call_count, 2)
+        mock_store_changed_flows.assert_called_with('add', flows[1],
+                                                    self.switch_01)
+
+    @patch('napps.kytos.flow_manager.main.ENABLE_BATCHED_NAPP_EVENTS', True)
+    @patch('napps.kytos.flow_manager.main.ENABLE_FLOW_NAPP_EVENTS', False)
+    @patch('napps.kytos.flow_manager.main.Main._store_changed_flows')
+    @patch('napps.kytos.flow_manager.main.Main._send_flow_mod')
+    @patch('napps.kytos.flow_manager.main.FlowFactory.get_class')
+    def test_install_flows_batched_napp_event(self, *args):
+        """Test a single napp event with the flows sent to a switch."""
+        (mock_flow_factory, _, _) = args
+        serializer = MagicMock()
+        serializer.from_dict.side_effect = FlowStub
+        mock_flow_factory.return_value = serializer
+        self.napp.controller.buffers.app = MagicMock()
+        flows = [{'match': {'in_port': 1}}, {'match': {'in_port': 2}}]
+
+        self.napp._install_flows('delete', {'flows': flows},
+                                 [self.switch_01])
+
+        self.napp.controller.buffers.app.put.assert_called_once()
+        event = self.napp.controller.buffers.app.put.call_args[0][0]
+        self.assertEqual(event.name, 'kytos/flow_manager.flows.removed')
+        self.assertEqual(event.content['datapath'], self.switch_01)
+        self.assertEqual([flow.flow_dict for flow in event.content['flows']],
+                         flows)
+
+    @patch('napps.kytos.flow_manager.main.ENABLE_IDEMPOTENT_ADD', True)
+    @patch('napps.kytos.flow_manager.main.Main._install_flow_mods')
+    @patch('napps.kytos.flow_manager.main.FlowFactory.get_class')
+    def test_install_flows_idempotent_add(self, *args):
+        """Test that flows installed and stored are not sent again."""
+        (mock_flow_factory, mock_install_flow_mods) = args
+        flows = [{'priority': 10, 'match': {'in_port': port}}
+                 for port in (1, 2, 3)]
+        serializer = MagicMock()
+        serializer.from_dict.side_effect = (
+            lambda flow_dict, switch: MagicMock(
+                **{'as_dict.return_value': flow_dict}))
+        mock_flow_factory.return_value = serializer
+        self.switch_01.id = self.switch_01.dpid
+        self.switch_01.flows = [MagicMock(**{'as_dict.return_value': flow})
+                                for flow in flows[:2]]
+        self.napp.stored_flows = stored_flows_from_dict(
+            {self.switch_01.id: {'flow_list': [
+                {'command': 'add', 'flow': flow} for flow in flows[1:]]}})
+        job = MagicMock()
+        self.napp.jobs = MagicMock()
+
+        self.napp._install_flows('add', {'flows': flows}, [self.switch_01],
+                                 job)
+
+        mock_install_flow_mods.assert_called_once()
+        self.assertEqual(mock_install_flow_mods.call_args[0][1],
+                         [flows[0], flows[2]])
+        self.napp.jobs.flow_mods_skipped.assert_called_once_with(job, 1)
+
+    @patch('napps.kytos.flow_manager.main.ENABLE_CONSISTENCY_CHECK', False)
+    @patch('napps.kytos.flow_manager.main.ENABLE_IDEMPOTENT_ADD', True)
+    @patch('napps.kytos.flow_manager.main.Main._install_flow_mods')
+    @patch('napps.kytos.flow_manager.main.FlowFactory.get_class')
+    def test_resend_stored_flows_idempotent_add(self, *args):
+        """Test that stored flows are resent until new flow stats arrive."""
+        (mock_flow_factory, mock_install_flow_mods) = args
+        flows = [{'priority': 10, 'match': {'in_port': port}}
+                 for port in (1, 2)]
+        serializer = MagicMock()
+        serializer.from_dict.side_effect = (
+            lambda flow_dict, switch: MagicMock(
+                **{'as_dict.return_value': flow_dict}))
+        mock_flow_factory.return_value = serializer
+        self.switch_01.id = self.switch_01.dpid
+        self.switch_01.flows = [MagicMock(**{'as_dict.return_value': flow})
+                                for flow in flows]
+        self.napp.stored_flows = stored_flows_from_dict(
+            {self.switch_01.id: {'flow_list': [
+                {'command': 'add', 'flow': flow} for flow in flows]}})
+        event = MagicMock(content={'switch': self.switch_01})
+
+        self.napp.resend_stored_flows(event)
+
+        self.assertEqual([call_args[0][1] for call_args
+                          in mock_install_flow_mods.call_args_list],
+                         [[flow] for flow in flows])
+
+        mock_install_flow_mods.reset_mock()
+        self.switch_01.flows = list(self.switch_01.flows)
+        self.napp._install_flows('add', {'flows': flows}, [self.switch_01])
+
+        mock_install_flow_mods.assert_called_once()
+        self.assertEqual(mock_install_flow_mods.call_args[0][1], [])
+
+    @patch('napps.kytos.flow_manager.main.Main._send_flows')
+    @patch('napps.kytos.flow_manager.main.StoreHouse.save_flow')
+    @patch('napps.kytos.flow_manager.main.FlowFactory.get_class')
+    def test_rest_replace(self, *args):
+        """Test that only the difference to the requested flows is sent."""
+        (mock_flow_factory, mock_save_flow, mock_send_flows) = args
+        flows = [{'priority': 10, 'match': {'in_port': port}}
+                 for port in (1, 2, 3, 4)]
+        serializer = MagicMock()
+        serializer.from_dict.side_effect = (
+            lambda flow_dict, switch: MagicMock(
+                **{'as_dict.return_value': flow_dict}))
+        mock_flow_factory.return_value = serializer
+        self.switch_01.id = self.switch_01.dpid
+        self.switch_01.flows = [MagicMock(**{'as_dict.return_value': flow})
+                                for flow in flows[:2]]
+        self.napp.stored_flows = stored_flows_from_dict(
+            {self.switch_01.id: {'flow_list': [
+                {'command': 'add', 'flow': flow} for flow in flows[1:3]]}})
+        api = get_test_client(self.napp.controller, self.napp)
+        url = f'{self.API_URL}/v2/flows/{self.switch_01.dpid}'
+
+        response = api.put(url, json={'flows': [flows[1], flows[3]]})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json['added'], 1)
+        self.assertEqual(response.json['deleted'], 2)
+        self.assertEqual(response.json['unchanged'], 1)
+        mock_send_flows.assert_has_calls([
+            call('delete_strict', [flows[2], flows[0]], self.switch_01),
+            call('add', [flows[3]], self.switch_01)])
+        mock_save_flow.assert_called_once()
+        self.assertEqual(
+            stored_flows_as_dict(self.napp.stored_flows)
+            [self.switch_01.id]['flow_list'],
+            [{'command': 'add', 'flow': flows[1]},
+             {'command': 'add', 'flow': flows[3]}])
+
+    @patch('napps.kytos.flow_manager.main.Main._send_flows')
+    @patch('napps.kytos.flow_manager.main.StoreHouse.save_flow')
+    @patch('napps.kytos.flow_manager.main.FlowFactory.get_class')
+    def test_rest_replace_timeouts(self, *args):
+        """Test that a flow with new timeouts is sent again."""
+        (mock_flow_factory, _, mock_send_flows) = args
+        flow = {'priority': 10, 'match': {'in_port': 1}}
+        new_flow = dict(flow, idle_timeout=30, hard_timeout=60)
+        serializer = MagicMock()
+        serializer.from_dict.side_effect = (
+            lambda flow_dict, switch: MagicMock(
+                **{'as_dict.return_value': flow_dict}))
+        mock_flow_factory.return_value = serializer
+        self.switch_01.id = self.switch_01.dpid
+        self.switch_01.flows = [MagicMock(**{'as_dict.return_value': flow})]
+        self.napp.stored_flows = stored_flows_from_dict(
+            {self.switch_01.id: {'flow_list': [{'command': 'add',
+                                                'flow': flow}]}})
+        api = get_test_client(self.napp.controller, self.napp)
+        url = f'{self.API_URL}/v2/flows/{self.switch_01.dpid}'
+
+        response = api.put(url, json={'flows': [new_flow]})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json['added'], 1)
+        self.assertEqual(response.json['deleted'], 1)
+        self.assertEqual(response.json['unchanged'], 0)
+        mock_send_flows.assert_has_calls([
+            call('delete_strict', [flow], self.switch_01),
+            call('add', [new_flow], self.switch_01)])
+        self.assertEqual(
+            stored_flows_as_dict(self.napp.stored_flows)
+            [self.switch_01.id]['flow_list'],
+            [{'command': 'add', 'flow': new_flow}])
+
+    def test_rest_replace_errors(self):
+        """Test the requests to replace flows that are rejected."""
+        api = get_test_client(self.napp.controller, self.napp)
+        url = f'{self.API_URL}/v2/flows/{self.switch_01.dpid}'
+
+        response_1 = api.put(url, json={})
+        response_2 = api.put(
+            f'{self.API_URL}/v2/flows/00:00:00:00:00:00:00:99',
+            json={'flows': []})
+
+        self.assertEqual(response_1.status_code, 400)
+        self.assertEqual(response_2.status_code, 404)
+
+    @patch('napps.kytos.flow_manager.main.NDJSON_BATCH_SIZE', 2)
+    @patch('napps.kytos.flow_manager.main.Main._install_flows')
+    def test_rest_add_ndjson(self, mock_install_flows):
+        """Test the flows of an NDJSON body installed in batches."""
+        api = get_test_client(self.napp.controller, self.napp)
+        url = f'{self.API_URL}/v2/flows/{self.switch_01.dpid}'
+        flows = [{'priority': priority} for priority in (10, 20, 30)]
+        body = ''.join(json.dumps(flow) + '\n' for flow in flows)
+
+        response_1 = api.post(url, data=body,
+                              content_type='application/x-ndjson')
+        response_2 = api.post(url, data=body + '[40]\n',
+                              content_type='application/x-ndjson')
+        response_3 = api.post(f'{url}?async=true', data=body,
+                              content_type='application/x-ndjson')
+
+        self.assertEqual(response_1.status_code, 200)
+        self.assertEqual(response_1.json['flows'], 3)
+        self.assertEqual(mock_install_flows.call_args_list[:2], [
+            call('add', {'flows': flows[:2]}, [self.switch_01], None),
+            call('add', {'flows': flows[2:]}, [self.switch_01], None)])
+        self.assertEqual(response_2.status_code, 400)
+        self.assertEqual(response_2.json['flows'], 2)
+        self.assertEqual(response_3.status_code, 400)
+
+    @patch('napps.kytos.flow_manager.main.NDJSON_BATCH_SIZE', 2)
+    @patch('napps.kytos.flow_manager.main.ENABLE_BARRIER_TRACKING', True)
+    @patch('napps.kytos.flow_manager.main.Main._send_flow_mod')
+    @patch('napps.kytos.flow_manager.main.StoreHouse.save_flow')
+    @patch('napps.kytos.flow_manager.main.FlowFactory.get_class')
+    def test_rest_add_ndjson_barrier_tracking(self, *args):
+        """Test that the batches of an NDJSON body are tracked by a job."""
+        (mock_flow_factory, _, _) = args
+        serializer = MagicMock()
+        serializer.from_dict.side_effect = FlowStub
+        mock_flow_factory.return_value = serializer
+        self.switch_01.id = self.switch_01.dpid
+        self.napp.controller.buffers.msg_out = MagicMock()
+        api = get_test_client(self.napp.controller, self.napp)
+        url = f'{self.API_URL}/v2/flows/{self.switch_01.dpid}'
+        flows = [{'priority': priority} for priority in (10, 20, 30)]
+        body = ''.join(json.dumps(flow) + '\n' for flow in flows)
+
+        response_1 = api.post(url, data=body,
+                              content_type='application/x-ndjson')
+        response_2 = api.post(url, data=body + '[40]\n',
+                              content_type='application/x-ndjson')
+
+        self.assertEqual(response_1.status_code, 200)
+        job_1 = self.napp.jobs.get(response_1.json['job_id'])
+        self.assertEqual(job_1.as_dict()['status'], 'finished')
+        self.assertEqual(job_1.flows, 3)
+        self.assertEqual(job_1.sent, 3)
+        # A BarrierRequest for each batch installed by both requests
+        self.assertEqual(
+            self.napp.controller.buffers.msg_out.put.call_count, 3)
+        self.assertEqual(response_2.status_code, 400)
+        job_2 = self.napp.jobs.get(response_2.json['job_id'])
+        self.assertEqual(job_2.as_dict()['status'], 'failed')
+        self.assertEqual(job_2.sent, 2)
+
+    @patch('napps.kytos.flow_manager.main.NDJSON_BATCH_SIZE', 2)
+    @patch('napps.kytos.flow_manager.main.read_ndjson_flows')
+    @patch('napps.kytos.flow_manager.main.Main._install_flows')
+    def test_rest_add_ndjson_deferred_saves(self, *args):
+        """Test that saves are deferred only while a batch is installed."""
+        (mock_install_flows, mock_read_ndjson_flows) = args
+        deferred_batches = []
+
+        def read_ndjson_flows(*_):
+            for priority in (10, 20, 30):
+                deferred_batches.append(self.napp._deferred_batches)
+                yield {'priority': priority}
+
+        mock_read_ndjson_flows.side_effect = read_ndjson_flows
+        mock_install_flows.side_effect = (
+            lambda *_: deferred_batches.append(self.napp._deferred_batches))
+        api = get_test_client(self.napp.controller, self.napp)
+        url = f'{self.API_URL}/v2/flows/{self.switch_01.dpid}'
+
+        response = api.post(url, data='{}\n',
+                            content_type='application/x-ndjson')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mock_install_flows.call_count, 2)
+        self.assertEqual(deferred_batches, [0, 0, 1, 0, 1])
+
     @patch('napps.kytos.flow_manager.main.Main._install_flows')
     def test_event_add_flow(self, mock_install_flows):
         """Test method for installing flows on the switches through events."""
@@ -239,6 +770,156 @@ class TestMain(TestCase):
         mock_install_flows.assert_called_with('delete', mock_flow_dict,
                                               [switch])
 
+    @patch('napps.kytos.flow_manager.main.Main._send_napp_event')
+    @patch('napps.kytos.flow_manager.main.Main._send_flow_mod')
+    @patch('napps.kytos.flow_manager.main.StoreHouse.save_flow')
+    @patch('napps.kytos.flow_manager.main.FlowFactory.get_class')
+    def test_event_flows_batch_install(self, *args):
+        """Test the flows of many switches installed through one event."""
+        (mock_flow_factory, mock_save_flow, mock_send_flow_mod, _) = args
+        serializer = MagicMock()
+        serializer.from_dict.side_effect = FlowStub
+        mock_flow_factory.return_value = serializer
+        self.switch_01.id = self.switch_01.dpid
+        self.switch_02.id = self.switch_02.dpid
+        self.napp.controller.switches = {
+            self.switch_01.dpid: self.switch_01,
+            self.switch_02.dpid: self.switch_02}
+        self.napp.controller.buffers.app = MagicMock()
+        callback = MagicMock()
+        flow_dicts = {
+            self.switch_01.dpid: {'flows': [{'match': {'in_port': 1}},
+                                            {'match': {'in_port': 2}}]},
+            self.switch_02.dpid: {'flows': [{'match': {'in_port': 3}}]},
+            '00:00:00:00:00:00:00:03': {'flows': [{'match': {}}]}}
+        event = get_kytos_event_mock(
+            name='kytos.flow_manager.flows.batch.install',
+            content={'flow_dicts': flow_dicts, 'id': 'circuit',
+                     'callback': callback, 'reply_event': 'app.reply'})
+
+        self.napp.event_flows_batch_install_delete(event)
+
+        self.assertEqual(mock_send_flow_mod.call_count, 3)
+        mock_save_flow.assert_called_once()
+        for dpid in (self.switch_01.dpid, self.switch_02.dpid):
+            self.assertEqual(
+                len(self.napp.stored_flows[dpid]['flow_list']),
+                len(flow_dicts[dpid]['flows']))
+        result = {'id': 'circuit', 'command': 'add',
+                  'flows': {self.switch_01.dpid: 2, self.switch_02.dpid: 1},
+                  'missing': ['00:00:00:00:00:00:00:03'], 'error': None}
+        callback.assert_called_once_with(result)
+        reply = self.napp.controller.buffers.app.put.call_args[0][0]
+        self.assertEqual(reply.name, 'app.reply')
+        self.assertEqual(reply.content, result)
+
+    @patch('napps.kytos.flow_manager.main.FlowFactory.get_class')
+    def test_event_flows_batch_install_errors(self, mock_flow_factory):
+        """Test that the batches that fail are replied with the error."""
+        serializer = MagicMock()
+        serializer.from_dict.side_effect = ValueError('invalid flow')
+        mock_flow_factory.return_value = serializer
+        self.napp.controller.switches = {self.switch_01.dpid: self.switch_01}
+        callback = MagicMock()
+        contents = [{'flow_dicts': {self.switch_01.dpid: {'flows': [{}]}}},
+                    {'flow_dicts': {self.switch_01.dpid: ['flows']}},
+                    {}]
+
+        for content in contents:
+            event = get_kytos_event_mock(
+                name='kytos.flow_manager.flows.batch.install',
+                content=dict(content, callback=callback))
+            self.napp.event_flows_batch_install_delete(event)
+
+        self.assertEqual(callback.call_count, 3)
+        errors = [call_args[0][0]['error']
+                  for call_args in callback.call_args_list]
+        self.assertEqual(errors[0], 'invalid flow')
+        self.assertTrue(all(errors))
+
+    @patch('napps.kytos.flow_manager.main.Main._install_switch_flows')
+    def test_install_flows_switch_workers(self, mock_install_switch_flows):
+        """Test the flows installed in parallel by the switch workers."""
+        self.napp.switch_workers = SwitchWorkers(2)
+        self.addCleanup(self.napp.switch_workers.shutdown)
+        switches = [self.switch_01, self.switch_02]
+        flows_dict = {'flows': [MagicMock()]}
+
+        self.napp._install_flows('add', flows_dict, switches)
+
+        mock_install_switch_flows.assert_any_call('add', flows_dict['flows'],
+                                                  self.switch_01, None, {})
+        mock_install_switch_flows.assert_any_call('add', flows_dict['flows'],
+                                                  self.switch_02, None, {})
+
+    @patch('napps.kytos.flow_manager.main.ENABLE_FAN_OUT', True)
+    @patch('napps.kytos.flow_manager.main.Main._store_changed_flows')
+    @patch('napps.kytos.flow_manager.main.Main._send_napp_event')
+    @patch('napps.kytos.flow_manager.main.Main._send_flow_mod')
+    @patch('napps.kytos.flow_manager.main.FlowFactory.get_class')
+    def test_install_flows_fan_out(self, *args):
+        """Test the FlowMods built once and sent to many switches."""
+        (mock_flow_factory, mock_send_flow_mod, mock_send_napp_event,
+         mock_store_changed_flows) = args
+        flow_mod = FlowMod13(command=FlowModCommand.OFPFC_ADD, priority=10)
+        flow = SimpleNamespace(switch=self.switch_01,
+                               as_of_add_flow_mod=lambda: flow_mod)
+        serializer = MagicMock()
+        serializer.from_dict.return_value = flow
+        mock_flow_factory.return_value = serializer
+        flows = [{'priority': 10}]
+        switches = [self.switch_01, self.switch_02]
+
+        self.napp._install_flows('add', {'flows': flows}, switches)
+
+        serializer.from_dict.assert_called_once()
+        self.assertEqual(mock_send_flow_mod.call_count, 2)
+        (switch_01, flow_mods_01), _ = mock_send_flow_mod.call_args_list[0]
+        (switch_02, flow_mods_02), _ = mock_send_flow_mod.call_args_list[1]
+        self.assertEqual((switch_01, switch_02), tuple(switches))
+        self.assertNotEqual(flow_mods_01.xids, flow_mods_02.xids)
+        flow_mod.header.xid = flow_mods_02.xids[0]
+        self.assertEqual(flow_mods_02.pack(), flow_mod.pack())
+        flow_02 = self.napp._flow_mods_sent[flow_mods_02.xids[0]][0]
+        self.assertIs(flow_02.switch, self.switch_02)
+        mock_send_napp_event.assert_called_with(self.switch_02, flow_02,
+                                                'add')
+        mock_store_changed_flows.assert_called_with('add', flows[0],
+                                                    self.switch_02)
+
+    @patch('napps.kytos.flow_manager.main.ENABLE_BARRIER_TRACKING', True)
+    @patch('napps.kytos.flow_manager.main.Main._install_flow_mods')
+    @patch('napps.kytos.flow_manager.main.FlowFactory.get_class')
+    def test_install_flows_barrier_request(self, *args):
+        """Test the BarrierRequest sent after the FlowMods of a job."""
+        (_, mock_install_flow_mods) = args
+        self.napp.jobs = MagicMock()
+        self.napp.controller.buffers.msg_out = MagicMock()
+        job = MagicMock()
+        flows_dict = {'flows': [MagicMock()]}
+
+        self.napp._install_flows('add', flows_dict, [self.switch_01], job)
+
+        mock_install_flow_mods.assert_called_once()
+        xid = self.napp.jobs.barrier_request_sent.call_args[0][1]
+        self.napp.jobs.barrier_request_sent.assert_called_with(job, xid)
+        event = self.napp.controller.buffers.msg_out.put.call_args[0][0]
+        self.assertEqual(event.name, 'kytos/flow_manager.messages.out.'
+                                     'ofpt_barrier_request')
+        self.assertEqual(event.content['message'].header.xid, xid)
+
+    def test_handle_barrier_reply(self):
+        """Test that the replies to BarrierRequests confirm FlowMods."""
+        self.napp.jobs = MagicMock()
+        message = MagicMock()
+        message.header.xid.value = 42
+        event = get_kytos_event_mock(name='.*.of_core.*.ofpt_barrier_reply',
+                                     content={'message': message})
+
+        self.napp.handle_barrier_reply(event)
+
+        self.napp.jobs.barrier_replied.assert_called_with(42)
+
     def test_add_flow_mod_sent(self):
         """Test _add_flow_mod_sent method."""
         xid = 0
@@ -246,7 +927,7 @@ class TestMain(TestCase):
 
         self.napp._add_flow_mod_sent(xid, flow, 'add')
 
-        self.assertEqual(self.napp._flow_mods_sent[xid], (flow, 'add'))
+        self.assertEqual(self.napp._flow_mods_sent[xid][:2], (flow, 'add'))
 
     @patch('kytos.core.buffers.KytosEventBuffer.put')
     def test_send_flow_mod(self, mock_buffers_put):
@@ -273,7 +954,7 @@ class TestMain(TestCase):
     def test_handle_errors(self, mock_send_napp_event):
         """Test handle_errors method."""
         flow = MagicMock()
-        self.napp._flow_mods_sent[0] = (flow, 'add')
+        self.napp._flow_mods_sent[0] = (flow, 'add', 0)
 
         switch = get_switch_mock("00:00:00:00:00:00:00:01")
         switch.connection = get_connection_mock(
@@ -297,25 +978,168 @@ class TestMain(TestCase):
                                                 error_command='add',
                                                 error_code=5, error_type=2)
 
+    def test_handle_errors_aggregated(self):
+        """Test the errors of a switch handled together."""
+        self.napp.error_aggregator.window = 60
+        self.napp.controller.buffers.app = MagicMock()
+        flows = [MagicMock(), MagicMock()]
+        switch = get_switch_mock("00:00:00:00:00:00:00:01")
+        switch.connection = get_connection_mock(0x04, switch)
+        switch.connection.protocol = MagicMock()
+        error_packet = MagicMock(spec=['instructions'])
+        error_packet.instructions = [MagicMock(actions=[MagicMock(port=3)])]
+        switch.connection.protocol.unpack.return_value = error_packet
+        for xid, flow in enumerate(flows):
+            self.napp._flow_mods_sent[xid] = (flow, 'add', 0)
+            message = MagicMock()
+            message.header.xid.value = xid
+            message.error_type = 2
+            message.code = BadActionCode.OFPBAC_BAD_OUT_PORT
+            message.data.pack.return_value = bytes([4, 14, 0, 16, 0, 0, 0,
+                                                    xid]) + b'flow_mod'
+            event = get_kytos_event_mock(name='.*.of_core.*.ofpt_error',
+                                         content={'message': message,
+                                                  'source': switch.connection})
+            self.napp.handle_errors(event)
+
+        self.napp.controller.buffers.app.put.assert_not_called()
+        self.napp.error_aggregator.flush()
+
+        switch.connection.protocol.unpack.assert_called_once()
+        switch.get_interface_by_port_no.assert_called_once_with(3)
+        event = self.napp.controller.buffers.app.put.call_args[0][0]
+        self.assertEqual(event.name, 'kytos/flow_manager.flows.error')
+        self.assertEqual(event.content['errors'], 2)
+        self.assertEqual([flow['flow'] for flow in event.content['flows']],
+                         flows)
+
     @patch("napps.kytos.flow_manager.main.StoreHouse.get_data")
     def test_load_flows(self, mock_storehouse):
         """Test load flows."""
         self.napp._load_flows()
         mock_storehouse.assert_called()
 
+    @patch("napps.kytos.flow_manager.main.StoreHouse.get_data")
+    def test_load_flows_encoded(self, mock_get_data):
+        """Test load flows saved with the zlib_json encoding."""
+        dpid = "00:00:00:00:00:00:00:01"
+        flow_list = [{"command": "add", "flow": {"priority": 10}}]
+        mock_get_data.return_value = {
+            "flow_persistence": {
+                "id": "flow_persistence",
+                dpid: encode_flow_list(flow_list, "zlib_json")}}
+
+        self.napp._load_flows()
+
+        self.assertEqual(stored_flows_as_dict(self.napp.stored_flows),
+                         {dpid: {"flow_list": flow_list}})
+
+    @patch("napps.kytos.flow_manager.main.StoreHouse.get_data")
+    def test_load_flows_from_snapshot(self, mock_get_data):
+        """Test load flows from an outdated local snapshot."""
+        dpid = "00:00:00:00:00:00:00:01"
+        snapshot_flows = {dpid: {"flow_list": []}}
+        stored_flows = {dpid: {"flow_list": [{"command": "add",
+                                              "flow": {"priority": 10}}]}}
+        self.napp.snapshot = MagicMock()
+        self.napp.snapshot.load.return_value = (1, 123, snapshot_flows)
+        mock_get_data.return_value = {
+            "flow_persistence": {"id": "flow_persistence",
+                                 "generation": 2, "checksum": 456,
+                                 **stored_flows}}
+
+        self.napp._load_flows()
+
+        self.assertEqual(self.napp.generation, 2)
+        self.assertEqual(stored_flows_as_dict(self.napp.stored_flows),
+                         stored_flows)
+        self.napp.snapshot.save.assert_called_with(2, stored_flows)
+
+    @patch("napps.kytos.flow_manager.main.StoreHouse.get_data")
+    def test_load_flows_from_valid_snapshot(self, mock_get_data):
+        """Test load flows from a snapshot consistent with storehouse."""
+        dpid = "00:00:00:00:00:00:00:01"
+        snapshot_flows = {dpid: {"flow_list": []}}
+        self.napp.snapshot = MagicMock()
+        self.napp.snapshot.load.return_value = (2, 456, snapshot_flows)
+        mock_get_data.return_value = {
+            "flow_persistence": {"id": "flow_persistence",
+                                 "generation": 2, "checksum": 456,
+                                 **snapshot_flows}}
+
+        self.napp._load_flows()
+
+        self.assertEqual(stored_flows_as_dict(self.napp.stored_flows),
+                         snapshot_flows)
+        self.napp.snapshot.save.assert_not_called()
+
+    @patch("napps.kytos.flow_manager.main.StoreHouse.save_flow")
+    @patch("napps.kytos.flow_manager.main.StoreHouse.get_data")
+    def test_reconcile_snapshot_switch_locks(self, mock_get_data, _):
+        """Test that the flows saved while reconciling are not replaced."""
+        dpid = "00:00:00:00:00:00:00:01"
+        self.napp.snapshot = MagicMock()
+        self.napp.generation = 1
+        self.napp.stored_flows = stored_flows_from_dict(
+            {dpid: {"flow_list": []}})
+        mock_get_data.return_value = {
+            "flow_persistence": {"id": "flow_persistence",
+                                 "generation": 5, "checksum": 456,
+                                 dpid: {"flow_list": []}}}
+        flow_list = stored_flows_from_dict(
+            {dpid: {"flow_list": [{"command": "add",
+                                   "flow": {"priority": 10}}]}}
+        )[dpid]["flow_list"]
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            with self.napp.switch_locks.get(dpid):
+                future = executor.submit(self.napp._reconcile_snapshot, 1,
+                                         123)
+                time.sleep(0.1)
+                self.assertFalse(future.done())
+                self.napp._save_switch_flows(dpid, flow_list)
+            future.result()
+
+        self.assertEqual(self.napp.stored_flows[dpid]["flow_list"], flow_list)
+        self.assertEqual(self.napp.generation, 2)
+
+    @patch("napps.kytos.flow_manager.main.StoreHouse.save_flow")
+    @patch("napps.kytos.flow_manager.main.StoreHouse.get_data")
+    def test_reconcile_snapshot_deferred_save(self, mock_get_data, _):
+        """Test that the flows of a batch not saved yet are not replaced."""
+        dpid = "00:00:00:00:00:00:00:01"
+        self.napp.snapshot = MagicMock()
+        self.napp.generation = 1
+        mock_get_data.return_value = {
+            "flow_persistence": {"id": "flow_persistence",
+                                 "generation": 5, "checksum": 456,
+                                 dpid: {"flow_list": []}}}
+        flow_list = stored_flows_from_dict(
+            {dpid: {"flow_list": [{"command": "add",
+                                   "flow": {"priority": 10}}]}}
+        )[dpid]["flow_list"]
+
+        with self.napp._deferred_saves():
+            self.napp._save_switch_flows(dpid, flow_list)
+            self.napp._reconcile_snapshot(1, 123)
+
+        self.assertEqual(self.napp.stored_flows[dpid]["flow_list"], flow_list)
+        self.assertEqual(self.napp.generation, 2)
+
     @patch("napps.kytos.flow_manager.main.ENABLE_CONSISTENCY_CHECK", False)
     @patch("napps.kytos.flow_manager.main.Main._install_flows")
     def test_resend_stored_flows(self, mock_install_flows):
         """Test resend stored flows."""
         dpid = "00:00:00:00:00:00:00:01"
         switch = get_switch_mock(dpid, 0x04)
+        switch.flows = []
         mock_event = MagicMock()
         flow = {"command": "add", "flow": MagicMock()}
 
         flows = {"flow_list": [flow]}
         mock_event.content = {"switch": switch}
         self.napp.controller.switches = {dpid: switch}
-        self.napp.stored_flows = {dpid: flows}
+        self.napp.stored_flows = stored_flows_from_dict({dpid: flows})
         self.napp.resend_stored_flows(mock_event)
         mock_install_flows.assert_called()
 
@@ -347,7 +1171,7 @@ class TestMain(TestCase):
                  "flow": flow}
             ]
         }
-        self.napp.stored_flows = {dpid: flow_list}
+        self.napp.stored_flows = stored_flows_from_dict({dpid: flow_list})
         self.napp._store_changed_flows(command, flows, switch)
         mock_save_flow.assert_called()
 
@@ -355,7 +1179,159 @@ class TestMain(TestCase):
         self.napp._store_changed_flows(command, flows, switch)
         mock_save_flow.assert_called()
 
-    @patch('napps.kytos.flow_manager.main.Main._install_flows')
+    @patch('napps.kytos.flow_manager.main.ENABLE_CONSISTENCY_CHECK', True)
+    @patch('napps.kytos.flow_manager.main.Main._send_napp_event')
+    @patch('napps.kytos.flow_manager.main.Main._send_flow_mod')
+    @patch('napps.kytos.flow_manager.main.StoreHouse.save_flow')
+    @patch('napps.kytos.flow_manager.main.FlowFactory.get_class')
+    def test_stored_flows_stress(self, *args):
+        """Test installs, deletes and consistency checks in parallel."""
+        (mock_flow_factory, mock_save_flow, _, _) = args
+
+        def from_dict(flow_dict, switch):
+            # Lets the other threads run while a switch is checked
+            time.sleep(0.0001)
+            return FlowStub(flow_dict, switch)
+
+        serializer = MagicMock()
+        serializer.from_dict.side_effect = from_dict
+        mock_flow_factory.return_value = serializer
+        self.napp._flow_mods_sent_max_size = 10
+        switches = []
+        for number in range(8):
+            dpid = f'00:00:00:00:00:00:00:{number:02x}'
+            switch = get_switch_mock(dpid, 0x04)
+            switch.id = dpid
+            switch.flows = []
+            switches.append(switch)
+
+        def install(switch, ports):
+            for port in ports:
+                flow = {'priority': 10, 'match': {'in_port': port}}
+                self.napp._install_flows('add', {'flows': [flow]}, [switch])
+                if port % 2 == 0:
+                    self.napp._install_flows('delete_strict',
+                                             {'flows': [flow]}, [switch])
+
+        def check_consistency(switch, checks=5):
+            event = get_kytos_event_mock(
+                name='kytos/of_core.flow_stats.received',
+                content={'switch': switch})
+            for _ in range(checks):
+                self.napp.on_flow_stats_check_consistency(event)
+
+        repairs = []
+        repair_flows = self.napp._repair_flows
+
+        def check_repair(command, flows, switch, check):
+            # The stored flows of the switch must not change during a check
+            stored_flows = [stored_flow.as_dict() for stored_flow in
+                            self.napp.stored_flows[switch.id]['flow_list']]
+            repairs.extend({'command': command, 'flow': flow_dict}
+                           in stored_flows for flow_dict in flows
+                           if check == 'switch' and command == 'add')
+            repair_flows(command, flows, switch, check)
+
+        self.napp._repair_flows = check_repair
+        with ThreadPoolExecutor(max_workers=24) as executor:
+            futures = []
+            for switch in switches:
+                futures.append(executor.submit(install, switch, range(10)))
+                futures.append(executor.submit(install, switch,
+                                               range(10, 20)))
+                futures.append(executor.submit(check_consistency, switch))
+            for future in futures:
+                future.result()
+        for switch in switches:
+            # The added flows are not installed, so they are all repaired
+            check_consistency(switch, checks=1)
+
+        self.assertGreaterEqual(len(repairs), 10 * len(switches))
+        self.assertTrue(all(repairs))
+        for switch in switches:
+            stored_flows = self.napp.stored_flows[switch.id]['flow_list']
+            commands = sorted((stored_flow.flow['match']['in_port'],
+                               stored_flow.command)
+                              for stored_flow in stored_flows)
+            expected = [(port, 'delete_strict' if port % 2 == 0 else 'add')
+                        for port in range(20)]
+            self.assertEqual(commands, expected)
+        self.assertEqual(self.napp.generation, mock_save_flow.call_count)
+        self.assertEqual(len(self.napp._flow_mods_sent), 10)
+
+    @patch('napps.kytos.flow_manager.main.ENABLE_CONSISTENCY_CHECK', True)
+    @patch('napps.kytos.flow_manager.main.Main.check_switch_consistency')
+    @patch('napps.kytos.flow_manager.main.Main.check_storehouse_consistency')
+    def test_consistency_schedule(self, *args):
+        """Test that the switches are checked when they are due."""
+        (mock_check_storehouse, mock_check_switch) = args
+        mock_check_storehouse.return_value = 0
+        mock_check_switch.return_value = 0
+        self.napp.consistency_scheduler.enabled = True
+        self.napp.stored_flows = {self.switch_01.dpid: {'flow_list': []}}
+        event = get_kytos_event_mock(name='kytos/of_core.flow_stats.received',
+                                     content={'switch': self.switch_01})
+
+        self.napp.on_flow_stats_check_consistency(event)
+        self.napp.on_flow_stats_check_consistency(event)
+
+        mock_check_storehouse.assert_called_once_with(self.switch_01)
+        mock_check_switch.assert_called_once_with(self.switch_01)
+        self.napp.consistency_scheduler.changed(self.switch_01.dpid)
+        self.napp.on_flow_stats_check_consistency(event)
+        self.assertEqual(mock_check_storehouse.call_count, 2)
+
+    @patch('napps.kytos.flow_manager.main.Main._store_changed_flows')
+    @patch('napps.kytos.flow_manager.main.Main._send_napp_event')
+    @patch('napps.kytos.flow_manager.main.Main._send_flow_mod')
+    @patch('napps.kytos.flow_manager.main.FlowFactory.get_class')
+    def test_repair_flows(self, *args):
+        """Test the repairs sent together without storing the flows."""
+        (mock_flow_factory, mock_send_flow_mod, mock_send_napp_event,
+         mock_store_changed_flows) = args
+        serializer = MagicMock()
+        serializer.from_dict.side_effect = FlowStub
+        mock_flow_factory.return_value = serializer
+        flows = [{'match': {'in_port': 1}}, {'match': {'in_port': 2}}]
+
+        self.napp._repair_flows('add', flows, self.switch_01, 'switch')
+        self.napp._send_flows('add', [], self.switch_01)
+
+        self.assertEqual(mock_send_flow_mod.call_count, 2)
+        for call_args in mock_send_flow_mod.call_args_list:
+            self.assertIsInstance(call_args[0][1], FlowMod13)
+        self.assertEqual(mock_send_napp_event.call_count, 2)
+        mock_store_changed_flows.assert_not_called()
+
+    @patch('napps.kytos.flow_manager.main.CONSISTENCY_GRACE_WINDOW', 10)
+    @patch('napps.kytos.flow_manager.main.Main._repair_flows')
+    @patch('napps.kytos.flow_manager.main.FlowFactory.get_class')
+    def test_check_switch_consistency_grace_window(self, *args):
+        """Test that the flows sent recently are not repaired."""
+        (mock_flow_factory, mock_repair_flows) = args
+        serializer = MagicMock()
+        serializer.from_dict.side_effect = FlowStub
+        mock_flow_factory.return_value = serializer
+        dpid = self.switch_01.dpid
+        flows = [{'match': {'in_port': 1}}, {'match': {'in_port': 2}}]
+        self.napp.stored_flows = stored_flows_from_dict(
+            {dpid: {'flow_list': [{'command': 'add', 'flow': flow}
+                                  for flow in flows]}})
+        self.napp._add_flow_mod_sent(1, FlowStub(flows[0], self.switch_01),
+                                     'add')
+        self.napp._add_flow_mod_sent(2, FlowStub(flows[1], self.switch_02),
+                                     'add')
+        avoided = CONSISTENCY_REPAIRS_AVOIDED.get(check='switch', dpid=dpid)
+
+        self.napp.check_switch_consistency(self.switch_01)
+
+        mock_repair_flows.assert_called_once_with('add', [flows[1]],
+                                                  self.switch_01, 'switch')
+        self.assertEqual(
+            CONSISTENCY_REPAIRS_AVOIDED.get(check='switch', dpid=dpid),
+            avoided + 1)
+
+    @patch('napps.kytos.flow_manager.main.Main._repair_flows')
     @patch('napps.kytos.flow_manager.main.FlowFactory.get_class')
     def test_check_switch_consistency_add(self, *args):
         """Test check_switch_consistency method.
@@ -363,7 +1339,7 @@ class TestMain(TestCase):
         This test checks the case when a flow is missing in switch and have the
         ADD command.
         """
-        (mock_flow_factory, mock_install_flows) = args
+        (mock_flow_factory, mock_repair_flows) = args
         dpid = "00:00:00:00:00:00:00:01"
         switch = get_switch_mock(dpid, 0x04)
         switch.flows = []
@@ -378,11 +1354,12 @@ class TestMain(TestCase):
         serializer.flow.cookie.return_value = 0
 
         mock_flow_factory.return_value = serializer
-        self.napp.stored_flows = {dpid: {"flow_list": flow_list}}
+        self.napp.stored_flows = stored_flows_from_dict(
+            {dpid: {"flow_list": flow_list}})
         self.napp.check_switch_consistency(switch)
-        mock_install_flows.assert_called()
+        mock_repair_flows.assert_called()
 
-    @patch('napps.kytos.flow_manager.main.Main._install_flows')
+    @patch('napps.kytos.flow_manager.main.Main._repair_flows')
     @patch('napps.kytos.flow_manager.main.FlowFactory.get_class')
     def test_check_switch_consistency_delete(self, *args):
         """Test check_switch_consistency method.
@@ -390,7 +1367,7 @@ class TestMain(TestCase):
         This test checks the case when a flow is missing in switch and have the
         DELETE command.
         """
-        (mock_flow_factory, mock_install_flows) = args
+        (mock_flow_factory, mock_repair_flows) = args
         dpid = "00:00:00:00:00:00:00:01"
         switch = get_switch_mock(dpid, 0x04)
 
@@ -406,18 +1383,53 @@ class TestMain(TestCase):
         switch.flows = [flow_1]
 
         mock_flow_factory.return_value = serializer
-        self.napp.stored_flows = {dpid: {"flow_list": flow_list}}
+        self.napp.stored_flows = stored_flows_from_dict(
+            {dpid: {"flow_list": flow_list}})
         self.napp.check_switch_consistency(switch)
-        mock_install_flows.assert_called()
+        mock_repair_flows.assert_called()
 
-    @patch('napps.kytos.flow_manager.main.Main._install_flows')
+    @patch('napps.kytos.flow_manager.main.vectorized_flows_in')
+    def test_flows_in_vectorized_fallback(self, mock_vectorized_flows_in):
+        """Test the flows that can not be compared with arrays."""
+        mock_vectorized_flows_in.side_effect = ValueError('priority')
+        self.napp.vectorized_consistency = True
+
+        result = self.napp._flows_in(['flow_1', 'flow_2'], ['flow_2'])
+
+        self.assertEqual(result, [False, True])
+        mock_vectorized_flows_in.assert_called_once()
+
+    @patch('napps.kytos.flow_manager.main.vectorized_flows_in')
+    @patch('napps.kytos.flow_manager.main.Main._repair_flows')
+    @patch('napps.kytos.flow_manager.main.FlowFactory.get_class')
+    def test_check_switch_consistency_vectorized(self, *args):
+        """Test check_switch_consistency method with NumPy arrays."""
+        (mock_flow_factory, mock_repair_flows, mock_flows_in) = args
+        dpid = "00:00:00:00:00:00:00:01"
+        switch = get_switch_mock(dpid, 0x04)
+        switch.flows = [MagicMock()]
+        flow_list = [{"command": "add", "flow": {'flow_1': 'data'}},
+                     {"command": "add", "flow": {'flow_2': 'data'}}]
+        mock_flow_factory.return_value = MagicMock()
+        mock_flows_in.return_value = [True, False]
+        self.napp.vectorized_consistency = True
+        self.napp.stored_flows = stored_flows_from_dict(
+            {dpid: {"flow_list": flow_list}})
+
+        self.napp.check_switch_consistency(switch)
+
+        mock_flows_in.assert_called()
+        mock_repair_flows.assert_called_once_with(
+            'add', [{'flow_2': 'data'}], switch, 'switch')
+
+    @patch('napps.kytos.flow_manager.main.Main._repair_flows')
     @patch('napps.kytos.flow_manager.main.FlowFactory.get_class')
     def test_check_storehouse_consistency(self, *args):
         """Test check_storehouse_consistency method.
 
         This test checks the case when a flow is missing in storehouse.
         """
-        (mock_flow_factory, mock_install_flows) = args
+        (mock_flow_factory, mock_repair_flows) = args
         cookie_exception_interval = [(0x2b00000000000011, 0x2b000000000000ff)]
         self.napp.cookie_exception_range = cookie_exception_interval
         dpid = "00:00:00:00:00:00:00:01"
@@ -434,9 +1446,10 @@ class TestMain(TestCase):
         serializer = flow_1
 
         mock_flow_factory.return_value = serializer
-        self.napp.stored_flows = {dpid: {"flow_list": flow_list}}
+        self.napp.stored_flows = stored_flows_from_dict(
+            {dpid: {"flow_list": flow_list}})
         self.napp.check_storehouse_consistency(switch)
-        mock_install_flows.assert_called()
+        mock_repair_flows.assert_called()
 
     @patch('napps.kytos.flow_manager.main.Main._install_flows')
     @patch('napps.kytos.flow_manager.main.FlowFactory.get_class')
@@ -472,7 +1485,7 @@ class TestMain(TestCase):
         }
         flow_list = {"flow_list": [stored_flow, stored_flow2]}
         command = "delete"
-        self.napp.stored_flows = {dpid: flow_list}
+        self.napp.stored_flows = stored_flows_from_dict({dpid: flow_list})
 
         self.napp._store_changed_flows(command, flow_to_install, switch)
         mock_save_flow.assert_called()
@@ -513,7 +1526,7 @@ class TestMain(TestCase):
         flow_to_install = {"match": {"ipv4_src": '192.168.1.1/24'}}
         flow_list = {"flow_list": [stored_flow, stored_flow2]}
         command = "delete"
-        self.napp.stored_flows = {dpid: flow_list}
+        self.napp.stored_flows = stored_flows_from_dict({dpid: flow_list})
 
         self.napp._store_changed_flows(command, flow_to_install, switch)
         mock_save_flow.assert_called()
@@ -554,7 +1567,7 @@ class TestMain(TestCase):
         flow_to_install = {"match": {"ipv4_src": '192.168.1.1/24'}}
         flow_list = {"flow_list": [stored_flow, stored_flow2]}
         command = "delete"
-        self.napp.stored_flows = {dpid: flow_list}
+        self.napp.stored_flows = stored_flows_from_dict({dpid: flow_list})
 
         self.napp._store_changed_flows(command, flow_to_install, switch)
         mock_save_flow.assert_called()
@@ -621,17 +1634,17 @@ class TestMain(TestCase):
         flow_to_install = {"match": {"in_port": 80, "wildcards": 4194303}}
         flow_list = {"flow_list": [stored_flow, stored_flow2]}
         command = "delete"
-        self.napp.stored_flows = {dpid: flow_list}
+        self.napp.stored_flows = stored_flows_from_dict({dpid: flow_list})
 
         self.napp._store_changed_flows(command, flow_to_install, switch)
         mock_save_flow.assert_called()
         self.assertEqual(len(self.napp.stored_flows[dpid]['flow_list']), 1)
 
-    @patch('napps.kytos.flow_manager.main.Main._install_flows')
+    @patch('napps.kytos.flow_manager.main.Main._repair_flows')
     @patch('napps.kytos.flow_manager.main.FlowFactory.get_class')
     def test_consistency_cookie_ignored_range(self, *args):
         """Test the consistency `cookie` ignored range."""
-        (mock_flow_factory, mock_install_flows) = args
+        (mock_flow_factory, mock_repair_flows) = args
         dpid = "00:00:00:00:00:00:00:01"
         switch = get_switch_mock(dpid, 0x04)
         cookie_ignored_interval = [(0x2b00000000000011,
@@ -645,7 +1658,7 @@ class TestMain(TestCase):
                     {'cookie': 0x2b00000000000101, 'called': 1}]
         # ignored flow
         for i in expected:
-            mock_install_flows.call_count = 0
+            mock_repair_flows.call_count = 0
             cookie = i['cookie']
             called = i['called']
             flow.cookie = cookie
@@ -654,13 +1667,13 @@ class TestMain(TestCase):
             mock_flow_factory.return_value = flow
             self.napp.stored_flows = {dpid: {"flow_list": flow}}
             self.napp.check_storehouse_consistency(switch)
-            self.assertEqual(mock_install_flows.call_count, called)
+            self.assertEqual(mock_repair_flows.call_count, called)
 
-    @patch('napps.kytos.flow_manager.main.Main._install_flows')
+    @patch('napps.kytos.flow_manager.main.Main._repair_flows')
     @patch('napps.kytos.flow_manager.main.FlowFactory.get_class')
     def test_consistency_table_id_ignored_range(self, *args):
         """Test the consistency `table_id` ignored range."""
-        (mock_flow_factory, mock_install_flows) = args
+        (mock_flow_factory, mock_repair_flows) = args
         dpid = "00:00:00:00:00:00:00:01"
         switch = get_switch_mock(dpid, 0x04)
         table_id_ignored_interval = [(1, 2), 3]
@@ -674,11 +1687,11 @@ class TestMain(TestCase):
         for i in expected:
             table_id = i['table_id']
             called = i['called']
-            mock_install_flows.call_count = 0
+            mock_repair_flows.call_count = 0
             flow.table_id = table_id
             flow.as_dict.return_value = {'flow_1': 'data', 'cookie': table_id}
             switch.flows = [flow]
             mock_flow_factory.return_value = flow
             self.napp.stored_flows = {dpid: {"flow_list": flow}}
             self.napp.check_storehouse_consistency(switch)
-            self.assertEqual(mock_install_flows.call_count, called)
+            self.assertEqual(mock_repair_flows.call_count, called)
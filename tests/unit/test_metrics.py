@@ -0,0 +1,72 @@
+"""Test the metrics of the flow_manager hot paths."""
+from unittest import TestCase
+
+from napps.kytos.flow_manager.metrics import Registry
+
+
+class TestMetrics(TestCase):
+    """Test the counters, histograms and their rendering."""
+
+    def setUp(self):
+        """Execute steps before each tests."""
+        self.registry = Registry()
+        self.counter = self.registry.counter('flows_total', 'Flows sent.',
+                                             ('dpid', 'command'))
+        self.histogram = self.registry.histogram('time_seconds', 'Time.',
+                                                 ('dpid',), (0.1, 1.0))
+
+    def test_counter(self):
+        """Test that the counters are increased by labels."""
+        self.counter.inc(dpid='00:01', command='add')
+        self.counter.inc(2, dpid='00:01', command='add')
+        self.counter.inc(dpid='00:02', command='delete')
+
+        self.assertEqual(self.counter.get(dpid='00:01', command='add'), 3)
+        self.assertEqual(self.counter.get(dpid='00:02', command='add'), 0)
+
+    def test_invalid_labels(self):
+        """Test that the labels must match the label names."""
+        with self.assertRaises(ValueError):
+            self.counter.inc(dpid='00:01')
+
+    def test_histogram_time(self):
+        """Test the histogram used as context manager and decorator."""
+        @self.histogram.time(dpid='00:01')
+        def decorated():
+            return 'result'
+
+        with self.histogram.time(dpid='00:01'):
+            pass
+        result = decorated()
+
+        self.assertEqual(result, 'result')
+        self.assertEqual(self.histogram.get_count(dpid='00:01'), 2)
+
+    def test_render(self):
+        """Test the metrics in the Prometheus text format."""
+        self.counter.inc(dpid='00:"01', command='add')
+        self.histogram.observe(0.5, dpid='00:01')
+        self.histogram.observe(2, dpid='00:01')
+
+        expected = '\n'.join([
+            '# HELP flows_total Flows sent.',
+            '# TYPE flows_total counter',
+            'flows_total{dpid="00:\\"01",command="add"} 1',
+            '# HELP time_seconds Time.',
+            '# TYPE time_seconds histogram',
+            'time_seconds_bucket{dpid="00:01",le="0.1"} 0',
+            'time_seconds_bucket{dpid="00:01",le="1.0"} 1',
+            'time_seconds_bucket{dpid="00:01",le="+Inf"} 2',
+            'time_seconds_sum{dpid="00:01"} 2.5',
+            'time_seconds_count{dpid="00:01"} 2',
+        ]) + '\n'
+        self.assertEqual(self.registry.render(), expected)
+
+    def test_clear(self):
+        """Test that clear removes the values of all metrics."""
+        self.counter.inc(dpid='00:01', command='add')
+        self.histogram.observe(0.5, dpid='00:01')
+
+        self.registry.clear()
+
+        self.assertEqual(self.registry.render().count('\n'), 4)
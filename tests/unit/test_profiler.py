@@ -0,0 +1,59 @@
+"""Test the sampling profiler."""
+import os
+import time
+from threading import Event, Thread
+from unittest import TestCase
+
+from napps.kytos.flow_manager.profiler import SamplingProfiler
+
+
+def busy_handler(stop_event):
+    """Keep a thread running code of the profiled path."""
+    while not stop_event.is_set():
+        sum(range(1000))
+
+
+# pylint: disable=protected-access
+class TestSamplingProfiler(TestCase):
+    """Test the SamplingProfiler class."""
+
+    def setUp(self):
+        """Execute steps before each tests."""
+        self.profiler = SamplingProfiler(os.path.dirname(__file__))
+        self.stop_event = Event()
+        self.thread = Thread(target=busy_handler, args=(self.stop_event,))
+        self.thread.start()
+        self.addCleanup(self.thread.join)
+        self.addCleanup(self.stop_event.set)
+        self.addCleanup(self.profiler.stop)
+
+    def test_sample_threads(self):
+        """Test the stacks sampled from the threads of the profiled path."""
+        self.assertTrue(self.profiler.start(0.001, 10))
+        while self.profiler.samples < 5:
+            time.sleep(0.01)
+        self.profiler.stop()
+
+        self.assertFalse(self.profiler.is_running())
+        stats = self.profiler.stats()
+        names = [function['function'] for function in stats['functions']]
+        self.assertTrue(any(name.startswith('busy_handler (test_profiler.py')
+                            for name in names))
+        self.assertGreaterEqual(stats['samples'], 5)
+        lines = [line.rsplit(' ', 1)
+                 for line in self.profiler.collapsed().splitlines()]
+        self.assertTrue(any(';busy_handler (test_profiler.py' in stack
+                            and int(count) > 0 for stack, count in lines))
+
+    def test_start_while_running(self):
+        """Test that a running profiler is not restarted."""
+        self.assertTrue(self.profiler.start(0.01, 10))
+        self.assertFalse(self.profiler.start(0.01, 10))
+
+    def test_duration(self):
+        """Test that the profiler stops after its duration."""
+        self.profiler.start(0.001, 0.01)
+        self.profiler._thread.join(1)
+
+        self.assertFalse(self.profiler.is_running())
+        self.assertIsNotNone(self.profiler.stopped_at)
@@ -0,0 +1,94 @@
+"""Test the adaptive scheduling of the consistency checks."""
+from unittest import TestCase
+
+from napps.kytos.flow_manager.scheduler import ConsistencyScheduler
+
+
+class TestConsistencyScheduler(TestCase):
+    """Test the ConsistencyScheduler class."""
+
+    def setUp(self):
+        """Execute steps before each tests."""
+        self.now = 1000.0
+        self.scheduler = ConsistencyScheduler(30, 240, 1000, 0,
+                                              clock=lambda: self.now)
+
+    def test_new_switch_is_due(self):
+        """Test that a switch never checked is due."""
+        self.assertTrue(self.scheduler.is_due('00:01'))
+
+    def test_stable_switch_backoff(self):
+        """Test that the interval doubles after each stable check."""
+        intervals = []
+        for _ in range(5):
+            self.scheduler.checked('00:01', 0.1, 10, 0)
+            intervals.append(self.scheduler.as_dict()
+                             ['switches']['00:01']['interval'])
+        self.assertEqual(intervals, [60, 120, 240, 240, 240])
+
+        self.now += 60
+        self.assertFalse(self.scheduler.is_due('00:01'))
+        self.now += 180
+        self.assertTrue(self.scheduler.is_due('00:01'))
+
+    def test_large_switch(self):
+        """Test that large switches are checked less often."""
+        self.scheduler.checked('00:01', 0.1, 10, 0)
+        self.scheduler.checked('00:02', 0.1, 2000, 0)
+
+        switches = self.scheduler.as_dict()['switches']
+        self.assertEqual(switches['00:01']['interval'], 60)
+        self.assertEqual(switches['00:02']['interval'], 180)
+
+    def test_changed_and_repaired_switch(self):
+        """Test that changes and repairs reset the interval."""
+        self.scheduler.checked('00:01', 0.1, 10, 0)
+        self.scheduler.checked('00:01', 0.1, 10, 0)
+        self.scheduler.changed('00:01')
+
+        self.assertTrue(self.scheduler.is_due('00:01'))
+        self.scheduler.checked('00:01', 0.1, 10, 0)
+        switch = self.scheduler.as_dict()['switches']['00:01']
+        self.assertEqual(switch['interval'], 30)
+        self.assertEqual(switch['changes'], 0)
+
+        self.scheduler.checked('00:01', 0.1, 10, 0)
+        self.scheduler.checked('00:01', 0.1, 10, 3)
+        switch = self.scheduler.as_dict()['switches']['00:01']
+        self.assertEqual(switch['interval'], 30)
+
+    def test_budget(self):
+        """Test that the checks stop when the budget is spent."""
+        self.scheduler.budget = 1
+        self.scheduler.checked('00:01', 1.5, 10, 0)
+
+        self.assertFalse(self.scheduler.is_due('00:02'))
+        self.now += 30
+        self.assertTrue(self.scheduler.is_due('00:02'))
+
+    def test_budget_deferred_first(self):
+        """Test that the switches skipped for the budget are checked first."""
+        self.scheduler.budget = 1
+        self.scheduler.checked('00:02', 0.5, 10, 1)
+        self.now += 30
+        self.scheduler.checked('00:01', 1.5, 10, 1)
+        self.assertFalse(self.scheduler.is_due('00:02'))
+
+        self.now += 30
+        self.scheduler.checked('00:03', 0.6, 10, 1)
+        self.assertEqual(self.scheduler.as_dict()['deferred'], ['00:02'])
+        self.assertFalse(self.scheduler.is_due('00:01'))
+        self.assertTrue(self.scheduler.is_due('00:02'))
+
+        self.scheduler.checked('00:02', 0.2, 10, 1)
+        self.assertEqual(self.scheduler.as_dict()['deferred'], [])
+        self.now += 30
+        self.assertTrue(self.scheduler.is_due('00:01'))
+        self.assertEqual(self.scheduler.as_dict()['deferred'], ['00:01'])
+
+    def test_disabled(self):
+        """Test that every switch is due when the scheduler is disabled."""
+        self.scheduler.enabled = False
+        self.scheduler.checked('00:01', 0.1, 10, 0)
+
+        self.assertTrue(self.scheduler.is_due('00:01'))
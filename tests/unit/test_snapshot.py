@@ -0,0 +1,56 @@
+"""Test the local snapshot of stored flows."""
+import os
+import tempfile
+from unittest import TestCase
+
+from napps.kytos.flow_manager.snapshot import FlowSnapshot
+
+
+class TestFlowSnapshot(TestCase):
+    """Test the FlowSnapshot class."""
+
+    def setUp(self):
+        """Execute steps before each tests."""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.path = os.path.join(self.tmp_dir.name, 'flows.snapshot')
+        self.snapshot = FlowSnapshot(self.path)
+        self.stored_flows = {
+            '00:00:00:00:00:00:00:01': {'flow_list': [
+                {'command': 'add',
+                 'flow': {'priority': 10, 'match': {'in_port': 1}}}]}}
+
+    def test_save_and_load(self):
+        """Test the round trip of a snapshot."""
+        checksum = self.snapshot.save(7, self.stored_flows)
+
+        self.assertEqual(checksum, FlowSnapshot.checksum(self.stored_flows))
+        self.assertEqual(self.snapshot.load(),
+                         (7, checksum, self.stored_flows))
+        self.assertFalse(os.path.exists(f'{self.path}.tmp'))
+
+    def test_load_missing_file(self):
+        """Test loading a snapshot that does not exist."""
+        self.assertIsNone(self.snapshot.load())
+
+    def test_load_empty_file(self):
+        """Test loading an empty snapshot file."""
+        open(self.path, 'wb').close()
+
+        self.assertIsNone(self.snapshot.load())
+
+    def test_load_corrupted_file(self):
+        """Test that a snapshot with an invalid checksum is ignored."""
+        self.snapshot.save(1, self.stored_flows)
+        with open(self.path, 'r+b') as snapshot_file:
+            snapshot_file.seek(-2, os.SEEK_END)
+            snapshot_file.write(b'{}')
+
+        self.assertIsNone(self.snapshot.load())
+
+    def test_load_invalid_magic(self):
+        """Test that a file that is not a snapshot is ignored."""
+        with open(self.path, 'wb') as snapshot_file:
+            snapshot_file.write(b'x' * 64)
+
+        self.assertIsNone(self.snapshot.load())
@@ -0,0 +1,84 @@
+"""Test the StoredFlow class."""
+from unittest import TestCase
+
+from napps.kytos.flow_manager.stored_flow import (StoredFlow,
+                                                  stored_flows_as_dict,
+                                                  stored_flows_from_dict)
+
+
+# pylint: disable=protected-access
+class TestStoredFlow(TestCase):
+    """Test the StoredFlow class."""
+
+    def setUp(self):
+        """Execute steps before each tests."""
+        self.flow_dict = {'command': 'add',
+                          'flow': {'priority': 10,
+                                   'match': {'in_port': 1},
+                                   'actions': [{'action_type': 'output',
+                                                'port': 2}]}}
+
+    def test_round_trip(self):
+        """Test the conversion from and to the persisted dictionary."""
+        stored_flow = StoredFlow.from_dict(self.flow_dict)
+
+        self.assertEqual(stored_flow.command, 'add')
+        self.assertEqual(stored_flow.as_dict(), self.flow_dict)
+        self.assertFalse(hasattr(stored_flow, '__dict__'))
+
+    def test_interned_keys(self):
+        """Test that the keys of different flows are the same objects."""
+        flow_1 = StoredFlow('add', {''.join(['mat', 'ch']): {}})
+        flow_2 = StoredFlow('add', {''.join(['ma', 'tch']): {}})
+
+        key_1, = flow_1.flow.keys()
+        key_2, = flow_2.flow.keys()
+        self.assertIs(key_1, key_2)
+
+    def test_interned_values(self):
+        """Test that the string values of different flows are shared."""
+        flow_1 = StoredFlow('add', {'actions': [
+            {'action_type': ''.join(['out', 'put'])}]})
+        flow_2 = StoredFlow('add', {'actions': [
+            {'action_type': ''.join(['ou', 'tput'])}]})
+
+        self.assertIs(flow_1.flow['actions'][0]['action_type'],
+                      flow_2.flow['actions'][0]['action_type'])
+
+    def test_equality_and_hash(self):
+        """Test the equality and hash of stored flows."""
+        stored_flow = StoredFlow.from_dict(self.flow_dict)
+        same_flow = StoredFlow('add', dict(self.flow_dict['flow']))
+        delete_flow = StoredFlow('delete', self.flow_dict['flow'])
+
+        self.assertEqual(stored_flow, same_flow)
+        self.assertEqual(hash(stored_flow), hash(same_flow))
+        self.assertNotEqual(stored_flow, delete_flow)
+        self.assertEqual(len({stored_flow, same_flow, delete_flow}), 2)
+
+    def test_stored_flows_conversion(self):
+        """Test the conversion of the stored flows of all switches."""
+        data = {'00:00:00:00:00:00:00:01': {'flow_list': [self.flow_dict]}}
+
+        stored_flows = stored_flows_from_dict(data)
+
+        flow_list = stored_flows['00:00:00:00:00:00:00:01']['flow_list']
+        self.assertIsInstance(flow_list[0], StoredFlow)
+        self.assertEqual(stored_flows_as_dict(stored_flows), data)
+
+    def test_lazy_hash(self):
+        """Test that the hash is computed when first needed."""
+        stored_flow = StoredFlow.from_dict(self.flow_dict)
+
+        self.assertIsNone(stored_flow._hash)
+        self.assertEqual(hash(stored_flow), stored_flow._hash)
+
+    def test_invalid_fields(self):
+        """Test the hash of flows with fields that are not integers."""
+        flow = {'priority': 'high', 'cookie': None, 'idle_timeout': [1],
+                'match': {'in_port': 1}}
+        stored_flow = StoredFlow('add', flow)
+        same_flow = StoredFlow('add', dict(flow))
+
+        self.assertEqual(hash(stored_flow), hash(same_flow))
+        self.assertEqual(len({stored_flow, same_flow}), 1)
@@ -84,3 +84,17 @@ class TestStoreHouse(TestCase):
         self.napp.save_flow(mock_status)
         mock_event.assert_called()
         mock_buffers_put.assert_called()
+
+    @patch('napps.kytos.flow_manager.storehouse.KytosEvent')
+    @patch('kytos.core.buffers.KytosEventBuffer.put')
+    def test_save_flow_without_box(self, *args):
+        """Test that the flows are not saved until the box is retrieved."""
+        (mock_buffers_put, mock_event) = args
+        self.addCleanup(setattr, self.napp, 'box', self.napp.box)
+        self.napp.box = None
+        self.napp.box_restore_timer = 0
+
+        self.napp.save_flow({'id': 'flow_persistence'})
+
+        mock_event.assert_not_called()
+        mock_buffers_put.assert_not_called()
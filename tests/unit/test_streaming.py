@@ -0,0 +1,109 @@
+"""Test the incremental reading of the flows of a request body."""
+import gzip
+import json
+from io import BytesIO
+from unittest import TestCase
+
+from napps.kytos.flow_manager.exceptions import (BodyTooLargeError,
+                                                 InvalidFlowStreamError)
+from napps.kytos.flow_manager.streaming import (GZIP_ERRORS, batches,
+                                                decoded_stream, gzip_chunks,
+                                                json_object_chunks,
+                                                read_limited,
+                                                read_ndjson_flows)
+
+
+class TestStreaming(TestCase):
+    """Test the functions of the streaming module."""
+
+    def test_read_ndjson_flows(self):
+        """Test that the flow of each non-empty line is read."""
+        stream = BytesIO(b'{"priority": 10}\n\n{"priority": 20}\n')
+
+        flows = list(read_ndjson_flows(stream))
+
+        self.assertEqual(flows, [{'priority': 10}, {'priority': 20}])
+
+    def test_read_ndjson_flows_lazily(self):
+        """Test that the lines after an invalid line are read only later."""
+        stream = BytesIO(b'{"priority": 10}\n[10]\n{"priority": 30\n')
+        flows = read_ndjson_flows(stream)
+
+        self.assertEqual(next(flows), {'priority': 10})
+        with self.assertRaisesRegex(InvalidFlowStreamError, 'line 2'):
+            next(flows)
+
+    def test_read_ndjson_flows_invalid_json(self):
+        """Test the line number of a line that is not JSON."""
+        stream = BytesIO(b'{"priority": 10}\n{"priority": 30\n')
+
+        with self.assertRaisesRegex(InvalidFlowStreamError, 'line 2'):
+            list(read_ndjson_flows(stream))
+
+    def test_read_ndjson_flows_max_line_size(self):
+        """Test that a line larger than the maximum size is not read."""
+        stream = BytesIO(b'{"priority": 10}\n{"priority": 200}\n')
+        flows = read_ndjson_flows(stream, max_line_size=17)
+
+        self.assertEqual(next(flows), {'priority': 10})
+        with self.assertRaisesRegex(BodyTooLargeError, 'line 2'):
+            next(flows)
+
+    def test_read_limited(self):
+        """Test that a stream is read only up to the maximum size."""
+        content = b'x' * 10
+
+        self.assertEqual(read_limited(BytesIO(content), 10), content)
+        with self.assertRaises(BodyTooLargeError):
+            read_limited(BytesIO(content), 9)
+
+    def test_read_limited_gzip(self):
+        """Test that a gzip stream is not decompressed past the limit."""
+        compressed = gzip.compress(b'\0' * (10 * 1024 * 1024))
+        stream = decoded_stream(BytesIO(compressed), 'gzip')
+
+        with self.assertRaises(BodyTooLargeError):
+            read_limited(stream, 1024 * 1024)
+        self.assertLess(stream.tell(), 2 * 1024 * 1024)
+
+    def test_batches(self):
+        """Test that the items are split in lists of a maximum size."""
+        self.assertEqual(list(batches(iter(range(5)), 2)),
+                         [[0, 1], [2, 3], [4]])
+        self.assertEqual(list(batches([], 2)), [])
+
+    def test_decoded_stream(self):
+        """Test the streams of the bodies of each content encoding."""
+        stream = BytesIO(gzip.compress(b'{"priority": 10}\n'))
+        plain_stream = BytesIO(b'{}')
+
+        self.assertEqual(list(read_ndjson_flows(decoded_stream(stream,
+                                                               'GZIP'))),
+                         [{'priority': 10}])
+        self.assertIs(decoded_stream(plain_stream, None), plain_stream)
+        self.assertIs(decoded_stream(plain_stream, 'identity'), plain_stream)
+        with self.assertRaises(ValueError):
+            decoded_stream(plain_stream, 'br')
+
+    def test_decoded_stream_invalid_gzip(self):
+        """Test that a body that is not gzip data can not be read."""
+        stream = decoded_stream(BytesIO(b'{"priority": 10}'), 'gzip')
+
+        with self.assertRaises(GZIP_ERRORS):
+            stream.read()
+
+    def test_json_object_chunks(self):
+        """Test the JSON of an object generated by chunks."""
+        items = [('00:01', {'flows': [{'priority': 10}]}), ('00:02', {})]
+
+        self.assertEqual(json.loads(''.join(json_object_chunks(items))),
+                         dict(items))
+        self.assertEqual(''.join(json_object_chunks([])), '{}')
+
+    def test_gzip_chunks(self):
+        """Test that the compressed chunks are a single gzip member."""
+        chunks = ['{"flows": ', '[', '{"priority": 10}' * 1000, ']}']
+
+        data = b''.join(gzip_chunks(iter(chunks), 6))
+
+        self.assertEqual(gzip.decompress(data).decode(), ''.join(chunks))
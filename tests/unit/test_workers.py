@@ -0,0 +1,64 @@
+"""Test the worker queues of the switches."""
+from threading import Event
+from unittest import TestCase
+
+from napps.kytos.flow_manager.workers import SwitchWorkers
+
+
+class TestSwitchWorkers(TestCase):
+    """Test the SwitchWorkers class."""
+
+    def setUp(self):
+        """Execute steps before each tests."""
+        self.workers = SwitchWorkers(2)
+        self.addCleanup(self.workers.shutdown)
+
+    def test_order_by_dpid(self):
+        """Test that the tasks of a dpid run in the order they were queued."""
+        results = []
+        futures = [self.workers.submit('00:01', results.append, i)
+                   for i in range(100)]
+
+        for future in futures:
+            future.result(timeout=5)
+
+        self.assertEqual(results, list(range(100)))
+
+    def test_parallel_dpids(self):
+        """Test that the tasks of different dpids run in parallel."""
+        started = Event()
+        release = Event()
+
+        def blocked():
+            started.set()
+            return release.wait(5)
+
+        future_1 = self.workers.submit('00:01', blocked)
+        started.wait(5)
+        future_2 = self.workers.submit('00:02', lambda: 'done')
+
+        self.assertEqual(future_2.result(timeout=5), 'done')
+        self.assertFalse(future_1.done())
+        release.set()
+        self.assertTrue(future_1.result(timeout=5))
+
+    def test_nested_task(self):
+        """Test that a task can wait for a task of the same dpid."""
+        def nested():
+            return self.workers.submit('00:01', lambda: 'nested').result(5)
+
+        future = self.workers.submit('00:01', nested)
+
+        self.assertEqual(future.result(timeout=5), 'nested')
+
+    def test_exception(self):
+        """Test that the exceptions of the tasks are kept in the futures."""
+        def fail():
+            raise ValueError('invalid flow')
+
+        future_1 = self.workers.submit('00:01', fail)
+        future_2 = self.workers.submit('00:01', lambda: 'done')
+
+        with self.assertRaises(ValueError):
+            future_1.result(timeout=5)
+        self.assertEqual(future_2.result(timeout=5), 'done')
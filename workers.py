@@ -0,0 +1,74 @@
+"""Worker queues to run the tasks of each switch in order.
+
+The tasks of different switches run in parallel in a bounded pool of threads,
+while the tasks of the same switch run one at a time, in the order they were
+submitted.
+"""
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Lock, local
+
+
+class SwitchWorkers:
+    """Run the tasks submitted for each dpid in order, in a thread pool."""
+
+    def __init__(self, max_workers):
+        """Create a pool of at most ``max_workers`` threads."""
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix='flow_manager_worker')
+        # Queue of pending tasks of the dpids being run by a worker
+        self._queues = {}
+        self._lock = Lock()
+        self._local = local()
+
+    def submit(self, dpid, func, *args, **kwargs):
+        """Queue ``func`` to be run after the other tasks of ``dpid``.
+
+        Return a Future with the result of the task. Tasks submitted by a task
+        of the same dpid are run immediately, since the worker is busy.
+        """
+        future = Future()
+        if getattr(self._local, 'dpid', None) == dpid:
+            self._run(future, func, args, kwargs)
+            return future
+        with self._lock:
+            queue = self._queues.get(dpid)
+            start_worker = queue is None
+            if start_worker:
+                queue = self._queues[dpid] = deque()
+            queue.append((future, func, args, kwargs))
+        if start_worker:
+            self._executor.submit(self._run_queue, dpid)
+        return future
+
+    def shutdown(self):
+        """Stop the threads after the tasks already queued."""
+        self._executor.shutdown(wait=False)
+
+    def _run_queue(self, dpid):
+        """Run the tasks of a dpid until its queue is empty."""
+        self._local.dpid = dpid
+        try:
+            while True:
+                with self._lock:
+                    queue = self._queues[dpid]
+                    if not queue:
+                        del self._queues[dpid]
+                        return
+                    task = queue.popleft()
+                self._run(*task)
+        finally:
+            self._local.dpid = None
+
+    @staticmethod
+    def _run(future, func, args, kwargs):
+        """Run a task and set its result or exception in the future."""
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            result = func(*args, **kwargs)
+        # pylint: disable=broad-except
+        except BaseException as error:
+            future.set_exception(error)
+        else:
+            future.set_result(result)